@@ -0,0 +1,119 @@
+"""
+Backend API client for the Streamlit frontend
+
+Streamlit re-runs app.py on every widget interaction, but imported modules stay
+loaded, so the client below lives for the whole process:
+- one requests.Session shared by all reruns and browser sessions (keep-alive pool)
+- list pages are cached under the catalog version (the list ETag); within
+  CACHE_TTL seconds they are returned without any request, after that a single
+  conditional request revalidates them and a 304 reuses the cached data
+- requests run outside the cache lock, so sessions fetching different pages
+  use the connection pool in parallel
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuration
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+CACHE_TTL = float(os.getenv("FRONTEND_CACHE_TTL", "5"))  # Seconds cached data is used without revalidating
+POOL_SIZE = int(os.getenv("FRONTEND_POOL_SIZE", "10"))  # Keep-alive connections to the backend
+REQUEST_TIMEOUT = 10
+PAGE_SIZE = 200  # Largest page the list endpoint allows
+MAX_CACHED_PAGES = 256  # Oldest list pages are dropped beyond this
+
+class _Entry(NamedTuple):
+    etag: Optional[str]
+    data: Any
+    checked_at: float  # time.monotonic() of the last successful fetch or revalidation
+
+class ApiClient:
+    """Pooled, caching client for the podcast API (thread-safe)"""
+
+    def __init__(self, base_url: str = API_BASE_URL, ttl: float = CACHE_TTL, pool_size: int = POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._cache: Dict[str, _Entry] = {}
+        self._pending: Dict[str, Future] = {}  # Page key -> request in flight
+        self._lock = threading.Lock()
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None, etag: Optional[str] = None) -> requests.Response:
+        headers = {"If-None-Match": etag} if etag else {}
+        return self.session.get(f"{self.base_url}{path}", params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    def list_page(self, limit: int, cursor: Optional[str] = None) -> dict:
+        """
+        One page of episodes: {"items", "next_cursor", "total"}
+
+        total is always filled in (the count is cached with the page).
+        The returned dict is shared between callers and must not be modified.
+        Raises requests.RequestException when the backend is unreachable or errors.
+        """
+        key = f"page:{limit}:{cursor or ''}"
+        params = {"limit": limit, "include_total": "true"}
+        if cursor:
+            params["cursor"] = cursor
+        # The lock only guards the cache; requests run outside it. Concurrent
+        # callers for the same page wait for the one request already in flight.
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.monotonic() - entry.checked_at < self.ttl:
+                return entry.data
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+        if not owner:
+            return pending.result()
+
+        try:
+            data = self._fetch_page(key, params, entry)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(data)
+            return data
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _fetch_page(self, key: str, params: Dict[str, Any], entry: Optional[_Entry]) -> dict:
+        response = self._get("/api/episodes", params, etag=entry.etag if entry else None)
+        if entry and response.status_code == 304:
+            with self._lock:
+                self._cache[key] = entry._replace(checked_at=time.monotonic())
+            return entry.data
+
+        response.raise_for_status()
+        entry = _Entry(response.headers.get("ETag"), response.json(), time.monotonic())
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = entry
+            pages = [k for k in self._cache if k.startswith("page:")]
+            for stale in pages[:-MAX_CACHED_PAGES]:
+                del self._cache[stale]
+        return entry.data
+
+    def close(self):
+        self.session.close()
+
+_client: Optional[ApiClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> ApiClient:
+    """Process-wide client shared by all Streamlit sessions"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient()
+        return _client
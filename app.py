@@ -1,14 +1,152 @@
 """
 Streamlit Frontend - AI-Powered Podcast Platform
 """
+import html
 import streamlit as st
 import requests
-from typing import Optional
-import os
 from datetime import datetime
 
-# Configuration
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+from api_client import API_BASE_URL, get_client
+
+# Cover is displayed 300px wide
+COVER_DISPLAY_WIDTH = 300
+
+def cover_image_html(episode: dict) -> str:
+    """Build a lazy-loading <picture> for the cover, preferring small WebP thumbnails"""
+    image_url = f"{API_BASE_URL}{episode['image_url']}"
+    style = "width: 100%; height: auto; border-radius: 20px; box-shadow: 0 12px 48px rgba(0, 0, 0, 0.8); border: 1px solid #1a1a1a;"
+    variants = episode.get("image_variants") or []
+    sizes = f"{COVER_DISPLAY_WIDTH}px"
+    
+    webp = [v for v in variants if v["format"] == "webp"]
+    fallback = [v for v in variants if v["format"] != "webp"]
+    
+    def srcset(items):
+        return ", ".join(f"{API_BASE_URL}{v['url']} {v['width']}w" for v in sorted(items, key=lambda v: v["width"]))
+    
+    # Smallest fallback thumbnail that still covers the display width
+    src = image_url
+    for v in sorted(fallback, key=lambda v: v["width"]):
+        if v["width"] >= COVER_DISPLAY_WIDTH:
+            src = f"{API_BASE_URL}{v['url']}"
+            break
+    
+    source_tag = f'<source type="image/webp" srcset="{srcset(webp)}" sizes="{sizes}">' if webp else ""
+    img_srcset = f' srcset="{srcset(fallback)}" sizes="{sizes}"' if fallback else ""
+    return f'<picture>{source_tag}<img src="{src}"{img_srcset} loading="lazy" decoding="async" style="{style}"></picture>'
+
+# Episodes rendered per library page
+LIBRARY_PAGE_SIZE = 10
+
+DOWNLOAD_LINK_STYLE = "display: inline-block; margin-top: 1.5rem; padding: 0.8rem 2rem; background: rgba(10, 10, 10, 0.6); border: none; border-radius: 14px; color: #aaa; text-decoration: none; font-weight: 600; font-size: 0.95rem; transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1); backdrop-filter: blur(10px); box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);"
+DOWNLOAD_LINK_HOVER = "onmouseover=\"this.style.background='rgba(102, 126, 234, 0.3)'; this.style.color='#ddd'; this.style.transform='translateY(-2px)'; this.style.boxShadow='0 8px 25px rgba(102, 126, 234, 0.3)';\" onmouseout=\"this.style.background='rgba(10, 10, 10, 0.6)'; this.style.color='#aaa'; this.style.transform='translateY(0)'; this.style.boxShadow='0 4px 15px rgba(0, 0, 0, 0.2)';\""
+
+def episode_card_html(episode: dict, number: int) -> str:
+    """Build one episode card as a single HTML fragment (user text escaped)"""
+    try:
+        created_at = datetime.fromisoformat(episode['created_at'])
+        formatted_date = created_at.strftime("%B %d, %Y • %H:%M")
+    except (TypeError, ValueError):
+        formatted_date = episode['created_at']
+    
+    audio_url = html.escape(f"{API_BASE_URL}{episode['audio_url']}")
+    title = html.escape(episode["title"])
+    description = html.escape(episode["description"])
+    
+    # Native player with preload="none": no audio is fetched until the user presses play
+    return (
+        '<div class="episode-card">'
+        '<div style="display: flex; gap: 2.5rem; align-items: flex-start;">'
+        f'<div style="flex: 0 0 {COVER_DISPLAY_WIDTH}px;">{cover_image_html(episode)}</div>'
+        '<div style="flex: 1;">'
+        f'<div style="margin-bottom: 1rem;"><span class="stat-badge" style="margin-right: 0.5rem;">Episode #{number}</span><span class="stat-badge">ID: {html.escape(str(episode["id"]))}</span></div>'
+        f'<h3 style="font-size: 1.8rem; font-weight: 700; color: #fff; margin-bottom: 0.8rem; letter-spacing: -0.5px;">{title}</h3>'
+        f'<p style="color: #555; font-size: 0.9rem; margin-bottom: 1.5rem;">{html.escape(formatted_date)}</p>'
+        f'<p style="color: #888; font-size: 1.05rem; line-height: 1.6; margin-bottom: 2rem;">{description}</p>'
+        '</div>'
+        '</div>'
+        f'<audio controls preload="none" src="{audio_url}" style="width: 100%; margin-top: 1.5rem;"></audio>'
+        f'<a href="{audio_url}" download style="{DOWNLOAD_LINK_STYLE}" {DOWNLOAD_LINK_HOVER}>⬇️ Download Audio</a>'
+        '</div>'
+        '<br><br>'
+    )
+
+# st.fragment (st.experimental_fragment before 1.37) reruns only the library when paging;
+# on older Streamlit releases paging falls back to a full script rerun
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+@_fragment
+def render_library():
+    """Render one page of the episode library, paged with the backend cursor"""
+    # Cursors of the pages before the current one (None = first page)
+    cursors = st.session_state.setdefault("library_cursors", [None])
+    
+    try:
+        # Shared client: each page is cached by catalog version, unchanged reruns cost at most one 304 request
+        page = get_client().list_page(LIBRARY_PAGE_SIZE, cursors[-1])
+        if not page["items"] and len(cursors) > 1:
+            # Catalog shrank under the current page: start over
+            cursors[:] = [None]
+            page = get_client().list_page(LIBRARY_PAGE_SIZE)
+        
+        if not page["items"]:
+            st.markdown(
+                """
+                <div style='text-align: center; padding: 8rem 3rem; background: transparent; position: relative; z-index: 2;'>
+                    <div style='font-size: 5rem; margin-bottom: 2rem; opacity: 0.7;'>🎙️</div>
+                    <h3 style='color: #fff; font-weight: 700; font-size: 2rem; margin-bottom: 1rem; letter-spacing: -1px;'>No Episodes Yet</h3>
+                    <p style='color: #888; font-size: 1.15rem; line-height: 1.6; margin-bottom: 3rem;'>
+                        Use the API to upload your first podcast episode
+                    </p>
+                    <div style='color: #aaa; font-size: 0.95rem;'>POST /api/episodes</div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+            return
+        
+        offset = (len(cursors) - 1) * LIBRARY_PAGE_SIZE
+        total = page["total"]
+        st.markdown(
+            "".join(episode_card_html(episode, total - offset - idx) for idx, episode in enumerate(page["items"])),
+            unsafe_allow_html=True
+        )
+        
+        # Pager (the click callbacks move the cursor stack before the library reruns)
+        pages = max(1, -(-total // LIBRARY_PAGE_SIZE))
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            st.button("← Newer", disabled=len(cursors) == 1, on_click=cursors.pop, use_container_width=True)
+        with info_col:
+            st.markdown(
+                f"<p style='text-align: center; color: #666; margin-top: 0.6rem;'>Page {len(cursors)} of {pages} • {total} episodes</p>",
+                unsafe_allow_html=True
+            )
+        with next_col:
+            st.button("Older →", disabled=not page["next_cursor"], on_click=cursors.append, args=(page["next_cursor"],), use_container_width=True)
+    except requests.exceptions.HTTPError:
+        st.error("❌ Failed to load episode library")
+    except requests.exceptions.ConnectionError:
+        st.markdown(
+            """
+            <div style='text-align: center; padding: 6rem 3rem; background: transparent; position: relative; z-index: 2;'>
+                <div style='font-size: 5rem; margin-bottom: 2rem; opacity: 0.7;'>⚠️</div>
+                <h3 style='color: #f87171; font-weight: 700; font-size: 2rem; margin-bottom: 1.5rem; letter-spacing: -1px;'>Connection Error</h3>
+                <p style='color: #888; font-size: 1.1rem; margin-bottom: 2rem; line-height: 1.6;'>
+                    Cannot connect to backend server
+                </p>
+                <code style='background: rgba(0, 0, 0, 0.4); padding: 0.8rem 1.5rem; border-radius: 12px; color: #aaa; font-size: 1rem; border: none;'>
+                    http://localhost:8000
+                </code>
+                <p style='color: #999; font-size: 0.95rem; margin-top: 2rem;'>
+                    Please ensure FastAPI service is running
+                </p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+    except Exception as e:
+        st.error(f"❌ Error occurred: {str(e)}")
 
 # Custom CSS for Zeabur-inspired Theme
 def load_custom_css():
@@ -651,120 +789,7 @@ def main():
         unsafe_allow_html=True
     )
     
-    try:
-        # Fetch all episodes
-        response = requests.get(f"{API_BASE_URL}/api/episodes", timeout=10)
-        
-        if response.status_code == 200:
-            episodes = response.json()
-            
-            if not episodes:
-                st.markdown(
-                    """
-                    <div style='text-align: center; padding: 8rem 3rem; background: transparent; position: relative; z-index: 2;'>
-                        <div style='font-size: 5rem; margin-bottom: 2rem; opacity: 0.7;'>🎙️</div>
-                        <h3 style='color: #fff; font-weight: 700; font-size: 2rem; margin-bottom: 1rem; letter-spacing: -1px;'>No Episodes Yet</h3>
-                        <p style='color: #888; font-size: 1.15rem; line-height: 1.6; margin-bottom: 3rem;'>
-                            Use the API to upload your first podcast episode
-                        </p>
-                        <div style='color: #aaa; font-size: 0.95rem;'>POST /api/episodes</div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            else:
-                # Display each episode (Pure HTML Layout - No Streamlit Columns)
-                for idx, episode in enumerate(episodes):
-                    # Format date
-                    try:
-                        created_at = datetime.fromisoformat(episode['created_at'])
-                        formatted_date = created_at.strftime("%B %d, %Y • %H:%M")
-                    except:
-                        formatted_date = episode['created_at']
-                    
-                    # Audio URL
-                    audio_url = f"{API_BASE_URL}{episode['audio_url']}"
-                    image_url = f"{API_BASE_URL}{episode['image_url']}"
-                    
-                    # Episode card - start
-                    st.markdown(f'<div class="episode-card">', unsafe_allow_html=True)
-                    st.markdown(f'<div style="display: flex; gap: 2.5rem; align-items: flex-start;">', unsafe_allow_html=True)
-                    
-                    # Cover image
-                    st.markdown(
-                        f'<div style="flex: 0 0 300px;"><img src="{image_url}" style="width: 100%; height: auto; border-radius: 20px; box-shadow: 0 12px 48px rgba(0, 0, 0, 0.8); border: 1px solid #1a1a1a;"></div>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Content section
-                    st.markdown(f'<div style="flex: 1;">', unsafe_allow_html=True)
-                    
-                    # Badges
-                    st.markdown(
-                        f'<div style="margin-bottom: 1rem;"><span class="stat-badge" style="margin-right: 0.5rem;">Episode #{len(episodes) - idx}</span><span class="stat-badge">ID: {episode["id"]}</span></div>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Title
-                    st.markdown(
-                        f'<h3 style="font-size: 1.8rem; font-weight: 700; color: #fff; margin-bottom: 0.8rem; letter-spacing: -0.5px;">{episode["title"]}</h3>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Date
-                    st.markdown(
-                        f'<p style="color: #555; font-size: 0.9rem; margin-bottom: 1.5rem;">{formatted_date}</p>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Description
-                    st.markdown(
-                        f'<p style="color: #888; font-size: 1.05rem; line-height: 1.6; margin-bottom: 2rem;">{episode["description"]}</p>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Close content div
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Close flex container
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Audio player
-                    st.audio(audio_url)
-                    
-                    # Download button
-                    st.markdown(
-                        f'<a href="{audio_url}" download style="display: inline-block; margin-top: 1.5rem; padding: 0.8rem 2rem; background: rgba(10, 10, 10, 0.6); border: none; border-radius: 14px; color: #aaa; text-decoration: none; font-weight: 600; font-size: 0.95rem; transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1); backdrop-filter: blur(10px); box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);" onmouseover="this.style.background=\'rgba(102, 126, 234, 0.3)\'; this.style.color=\'#ddd\'; this.style.transform=\'translateY(-2px)\'; this.style.boxShadow=\'0 8px 25px rgba(102, 126, 234, 0.3)\';" onmouseout="this.style.background=\'rgba(10, 10, 10, 0.6)\'; this.style.color=\'#aaa\'; this.style.transform=\'translateY(0)\'; this.style.boxShadow=\'0 4px 15px rgba(0, 0, 0, 0.2)\';">⬇️ Download Audio</a>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Close episode card
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    st.markdown('<br><br>', unsafe_allow_html=True)
-        else:
-            st.error("❌ Failed to load episode library")
-    
-    except requests.exceptions.ConnectionError:
-        st.markdown(
-            """
-            <div style='text-align: center; padding: 6rem 3rem; background: transparent; position: relative; z-index: 2;'>
-                <div style='font-size: 5rem; margin-bottom: 2rem; opacity: 0.7;'>⚠️</div>
-                <h3 style='color: #f87171; font-weight: 700; font-size: 2rem; margin-bottom: 1.5rem; letter-spacing: -1px;'>Connection Error</h3>
-                <p style='color: #888; font-size: 1.1rem; margin-bottom: 2rem; line-height: 1.6;'>
-                    Cannot connect to backend server
-                </p>
-                <code style='background: rgba(0, 0, 0, 0.4); padding: 0.8rem 1.5rem; border-radius: 12px; color: #aaa; font-size: 1rem; border: none;'>
-                    http://localhost:8000
-                </code>
-                <p style='color: #999; font-size: 0.95rem; margin-top: 2rem;'>
-                    Please ensure FastAPI service is running
-                </p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-    except Exception as e:
-        st.error(f"❌ Error occurred: {str(e)}")
+    render_library()
     
     # Footer (Zeabur Pure Black Style)
     st.markdown("<br><br><br><br>", unsafe_allow_html=True)
@@ -0,0 +1,305 @@
+"""
+音频元数据提取
+
+只读取文件头，不解码任何采样：
+- MP3: ID3v2 标签之后的第一个帧头，以及 Xing/Info 或 VBRI 头（VBR 文件的总帧数）
+- WAV: RIFF 的 fmt 和 data 块
+- M4A: moov 原子中的 mvhd / mdhd / stsd
+即使是 50MB 的文件，也只需要读取几 KB。
+"""
+import os
+import struct
+from typing import BinaryIO, NamedTuple, Optional
+
+MP3_SYNC_SEARCH_BYTES = 64 * 1024  # 查找第一个 MP3 帧的范围
+
+class AudioMetadata(NamedTuple):
+    """音频元数据"""
+    duration_seconds: Optional[float]  # 时长（秒）
+    bitrate_kbps: Optional[int]  # 平均码率（kbps）
+    sample_rate: Optional[int]  # 采样率（Hz）
+    channels: Optional[int]  # 声道数
+
+# ==================== MP3 ====================
+
+_MP3_BITRATES = {
+    # (MPEG-1?, layer) -> kbps，索引 1-14
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),  # MPEG-2.5
+}
+
+class _Mp3Frame(NamedTuple):
+    version_id: int
+    layer: int
+    bitrate_kbps: int
+    sample_rate: int
+    channels: int
+    samples_per_frame: int
+    frame_length: int
+
+def _parse_mp3_header(header: bytes) -> Optional[_Mp3Frame]:
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version_id = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version_id == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    
+    mpeg1 = version_id == 3
+    bitrate_kbps = _MP3_BITRATES[(mpeg1, layer)][bitrate_index - 1]
+    sample_rate = _MP3_SAMPLE_RATES[version_id][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    channels = 1 if (header[3] >> 6) == 3 else 2
+    
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate_kbps * 1000 // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if (layer == 2 or mpeg1) else 576
+        frame_length = (samples_per_frame // 8) * bitrate_kbps * 1000 // sample_rate + padding
+    return _Mp3Frame(version_id, layer, bitrate_kbps, sample_rate, channels, samples_per_frame, frame_length)
+
+def _id3v2_size(f: BinaryIO) -> int:
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+def _probe_mp3(f: BinaryIO, file_size: int) -> Optional[AudioMetadata]:
+    audio_start = _id3v2_size(f)
+    f.seek(audio_start)
+    window = f.read(MP3_SYNC_SEARCH_BYTES)
+    
+    # 找到第一个帧头，并用下一个帧头确认不是误匹配
+    offset = window.find(b"\xff")
+    frame = None
+    while offset != -1 and offset + 4 <= len(window):
+        candidate = _parse_mp3_header(window[offset:offset + 4])
+        if candidate:
+            next_offset = offset + candidate.frame_length
+            if next_offset + 4 > len(window) or _parse_mp3_header(window[next_offset:next_offset + 4]):
+                frame = candidate
+                break
+        offset = window.find(b"\xff", offset + 1)
+    if frame is None:
+        return None
+    
+    frame_start = audio_start + offset
+    frame_data = window[offset:offset + min(frame.frame_length, 256)]
+    
+    # Xing/Info 头位于 side info 之后
+    if frame.version_id == 3:
+        side_info = 17 if frame.channels == 1 else 32
+    else:
+        side_info = 9 if frame.channels == 1 else 17
+    total_frames = None
+    xing = frame_data[4 + side_info:4 + side_info + 12]
+    if xing[:4] in (b"Xing", b"Info") and len(xing) >= 12:
+        flags = struct.unpack(">I", xing[4:8])[0]
+        if flags & 0x01:
+            total_frames = struct.unpack(">I", xing[8:12])[0]
+    elif frame_data[36:40] == b"VBRI" and len(frame_data) >= 36 + 18:
+        total_frames = struct.unpack(">I", frame_data[36 + 14:36 + 18])[0]
+    
+    # 去掉末尾的 ID3v1 标签
+    audio_end = file_size
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b"TAG":
+            audio_end -= 128
+    audio_bytes = max(0, audio_end - frame_start)
+    
+    if total_frames:
+        duration = total_frames * frame.samples_per_frame / frame.sample_rate
+        bitrate_kbps = round(audio_bytes * 8 / duration / 1000) if duration > 0 else frame.bitrate_kbps
+    else:
+        # CBR：按首帧码率估算
+        duration = audio_bytes * 8 / (frame.bitrate_kbps * 1000)
+        bitrate_kbps = frame.bitrate_kbps
+    
+    return AudioMetadata(
+        duration_seconds=round(duration, 3),
+        bitrate_kbps=bitrate_kbps,
+        sample_rate=frame.sample_rate,
+        channels=frame.channels
+    )
+
+# ==================== WAV ====================
+
+def _probe_wav(f: BinaryIO, file_size: int) -> Optional[AudioMetadata]:
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    
+    channels = sample_rate = byte_rate = data_size = None
+    position = 12
+    while position + 8 <= file_size:
+        f.seek(position)
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id = chunk_header[:4]
+        chunk_size = struct.unpack("<I", chunk_header[4:8])[0]
+        
+        if chunk_id == b"fmt ":
+            fmt = f.read(16)
+            if len(fmt) < 16:
+                return None
+            _, channels, sample_rate, byte_rate = struct.unpack("<HHII", fmt[:12])
+        elif chunk_id == b"data":
+            # 流式写入的 WAV 可能把 data 大小写成 0 或 0xFFFFFFFF
+            data_size = min(chunk_size, file_size - position - 8) if chunk_size not in (0, 0xFFFFFFFF) else file_size - position - 8
+            if byte_rate is not None:
+                break
+        position += 8 + chunk_size + (chunk_size & 1)
+    
+    if not sample_rate:
+        return None
+    duration = data_size / byte_rate if data_size is not None and byte_rate else None
+    return AudioMetadata(
+        duration_seconds=round(duration, 3) if duration is not None else None,
+        bitrate_kbps=round(byte_rate * 8 / 1000) if byte_rate else None,
+        sample_rate=sample_rate,
+        channels=channels
+    )
+
+# ==================== M4A / MP4 ====================
+
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+def _iter_atoms(f: BinaryIO, start: int, end: int):
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return
+        yield atom_type, position + header_size, position + size
+        position += size
+
+def _parse_mvhd_like(data: bytes) -> Optional[float]:
+    # mvhd 和 mdhd 的时间字段布局相同
+    if not data:
+        return None
+    if data[0] == 1:
+        if len(data) < 32:
+            return None
+        timescale, duration = struct.unpack(">IQ", data[20:32])
+    else:
+        if len(data) < 20:
+            return None
+        timescale, duration = struct.unpack(">II", data[12:20])
+    return duration / timescale if timescale else None
+
+def _probe_mp4(f: BinaryIO, file_size: int) -> Optional[AudioMetadata]:
+    f.seek(4)
+    if f.read(4) != b"ftyp":
+        return None
+    
+    movie_duration = None
+    track = {}
+    
+    def walk(start: int, end: int, state: dict):
+        nonlocal movie_duration
+        for atom_type, body_start, body_end in _iter_atoms(f, start, end):
+            if atom_type == b"trak":
+                trak_state = {}
+                walk(body_start, body_end, trak_state)
+                if trak_state.get("handler") == b"soun" and not track:
+                    track.update(trak_state)
+            elif atom_type in _MP4_CONTAINERS:
+                walk(body_start, body_end, state)
+            elif atom_type == b"mvhd":
+                f.seek(body_start)
+                movie_duration = _parse_mvhd_like(f.read(32))
+            elif atom_type == b"mdhd":
+                f.seek(body_start)
+                state["duration"] = _parse_mvhd_like(f.read(32))
+            elif atom_type == b"hdlr":
+                f.seek(body_start + 8)
+                state["handler"] = f.read(4)
+            elif atom_type == b"stsd":
+                # 跳过 version/flags 和 entry_count，读取第一个 sample entry
+                f.seek(body_start + 8)
+                entry = f.read(36)
+                if len(entry) >= 36:
+                    state["channels"] = struct.unpack(">H", entry[24:26])[0]
+                    state["sample_rate"] = struct.unpack(">I", entry[32:36])[0] >> 16
+    
+    for atom_type, body_start, body_end in _iter_atoms(f, 0, file_size):
+        if atom_type == b"moov":
+            walk(body_start, body_end, {})
+            break
+    
+    duration = track.get("duration") or movie_duration
+    if duration is None and not track:
+        return None
+    return AudioMetadata(
+        duration_seconds=round(duration, 3) if duration else None,
+        bitrate_kbps=round(file_size * 8 / duration / 1000) if duration else None,
+        sample_rate=track.get("sample_rate"),
+        channels=track.get("channels")
+    )
+
+# ==================== 入口 ====================
+
+def probe_audio(path: str) -> Optional[AudioMetadata]:
+    """
+    读取音频文件头，提取时长、码率、采样率和声道数（同步）
+    
+    依次尝试 WAV、M4A、MP3；无法识别或文件损坏时返回 None。
+    
+    参数:
+        path: 音频文件路径
+    
+    返回:
+        AudioMetadata 或 None
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            return probe_audio_file(f, file_size)
+    except OSError:
+        return None
+
+def probe_audio_file(f: BinaryIO, file_size: int) -> Optional[AudioMetadata]:
+    """
+    与 probe_audio 相同，读取已打开的可定位文件对象（例如对象存储的范围读取流）
+    
+    参数:
+        f: 以二进制模式打开的文件对象
+        file_size: 文件大小（字节）
+    """
+    try:
+        for probe in (_probe_wav, _probe_mp4, _probe_mp3):
+            metadata = probe(f, file_size)
+            if metadata is not None:
+                return metadata
+    except (OSError, struct.error, ZeroDivisionError):
+        return None
+    return None
@@ -0,0 +1,286 @@
+"""
+进程内播客目录缓存
+
+读远多于写：列表和详情请求直接从内存中的不可变快照返回，不再访问 SQLite。
+每次读取前轮询目录连接的 PRAGMA data_version 检测提交（包括本进程经连接池完成的写入），
+发现变化时增量同步：新记录按主键范围读取（id 大于已加载的序列值），删除按 episode_deletions 的序号读取；
+只有首次加载，或删除记录已被清理到已同步的位置之后，才读取整张表。
+读取从不等待：其他线程正在同步时直接使用当前快照。写入在连接池的连接上提交，
+随后等待同步完成，因此写入返回时本进程的快照已包含这次变化。
+"""
+import bisect
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from backend import repository
+from backend.audio_meta import AudioMetadata
+from backend.db import get_db_connection
+from backend.models import EpisodeResponse, encode_episode, episode_from_row, episode_json_from_row, episode_page_json
+from backend.storage import SavedFile
+
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE", "1") != "0"  # 设为 0 时直接查询数据库
+
+class CatalogVersion(NamedTuple):
+    """
+    目录版本
+    
+    tag 由 (播客总数, AUTOINCREMENT 序列值) 组成：每次插入序列值加一，每次删除总数减一，
+    因此任何变化都会产生新值，且所有 worker 对同一数据库状态算出相同的 tag。
+    """
+    tag: str
+    last_modified: Optional[datetime]  # 最近一次插入或删除的时间（记录在数据库中，所有 worker 相同）
+
+class _Snapshot(NamedTuple):
+    by_id: Dict[int, EpisodeResponse]
+    order: List[Tuple[str, int]]  # (created_at, id) 升序
+    seq: int  # episodes 表的 AUTOINCREMENT 序列值，ID 不大于它的记录都已加载
+    deletion_seq: int  # 已同步的 episode_deletions 序号
+    modified_at: Optional[float]  # 数据库记录的目录修改时间（Unix 时间戳）
+    encoded: Dict[int, bytes]  # 各播客的 JSON 编码，首次读取时填充
+
+def _from_timestamp(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp is not None else None
+
+def _encoded(snapshot: _Snapshot, episode: EpisodeResponse) -> bytes:
+    # 并发读取可能重复编码同一个播客，结果相同，不需要加锁
+    data = snapshot.encoded.get(episode.id)
+    if data is None:
+        data = snapshot.encoded[episode.id] = encode_episode(episode)
+    return data
+
+class EpisodeCatalog:
+    """
+    播客目录缓存
+    
+    快照整体替换（写时复制），读取无需加锁；锁只用于同步（保护目录连接，合并并发的同步）。
+    """
+    
+    def __init__(self):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # 保护 _conn 的使用，同时合并并发同步
+        self._snapshot = _Snapshot({}, [], 0, 0, None, {})
+        self._data_version: Optional[int] = None  # None 表示尚未加载
+        self.version = 0  # 每次内容变化时递增
+    
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = get_db_connection()
+        return self._conn
+    
+    def _bump(self, snapshot: _Snapshot):
+        self._snapshot = snapshot
+        self.version += 1
+    
+    def refresh(self, wait: bool = False):
+        """
+        同步数据库的变化（同步，在线程池中调用）
+        
+        参数:
+            wait: 其他线程正在同步时是否等待。读取时为 False，直接使用当前快照；
+                写入提交后为 True，返回时快照一定包含这次写入。首次加载完成前总是等待
+        """
+        if not self._lock.acquire(blocking=wait or self._data_version is None):
+            return
+        try:
+            conn = self._connection()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            # 在一个读事务中完成，各查询看到同一个数据库状态
+            conn.execute("BEGIN")
+            try:
+                snapshot = self._sync(conn)
+            finally:
+                conn.rollback()
+            self._data_version = data_version
+            if snapshot is not None:
+                self._bump(snapshot)
+        finally:
+            self._lock.release()
+    
+    def _load(self, conn: sqlite3.Connection) -> _Snapshot:
+        rows = repository.select_all_episodes(conn)
+        by_id = {}
+        order = []
+        for row in rows:
+            by_id[row["id"]] = episode_from_row(row)
+            order.append((row["created_at"], row["id"]))
+        order.reverse()
+        return _Snapshot(
+            by_id, order, repository.select_episode_seq(conn), repository.select_deletion_seq(conn),
+            repository.select_modified_at(conn), {}
+        )
+    
+    def _sync(self, conn: sqlite3.Connection) -> Optional[_Snapshot]:
+        # 返回新快照；没有变化时为 None
+        snapshot = self._snapshot
+        if self._data_version is None:
+            return self._load(conn)
+        
+        first, deleted = repository.select_deletions_after(conn, snapshot.deletion_seq)
+        if deleted and first > snapshot.deletion_seq + 1:
+            # 中间的删除记录已被清理，无法增量同步
+            return self._load(conn)
+        rows = repository.select_episodes_after(conn, snapshot.seq)
+        seq = repository.select_episode_seq(conn)
+        deletion_seq = repository.select_deletion_seq(conn)
+        modified_at = repository.select_modified_at(conn)
+        
+        deleted = [episode_id for episode_id in deleted if episode_id in snapshot.by_id]
+        if not rows and not deleted:
+            if (seq, deletion_seq) == (snapshot.seq, snapshot.deletion_seq):
+                return None
+            # 插入后又被删除的记录只改变序列值（tag 仍需与其他 worker 一致）
+            return snapshot._replace(seq=seq, deletion_seq=deletion_seq, modified_at=modified_at)
+        
+        # 整批只复制一次快照
+        by_id = dict(snapshot.by_id)
+        order = list(snapshot.order)
+        encoded = dict(snapshot.encoded)
+        for episode_id in deleted:
+            episode = by_id.pop(episode_id)
+            order.pop(bisect.bisect_left(order, (episode.created_at, episode_id)))
+            encoded.pop(episode_id, None)
+        for row in rows:
+            episode = episode_from_row(row)
+            by_id[episode.id] = episode
+            bisect.insort(order, (episode.created_at, episode.id))
+        return _Snapshot(by_id, order, seq, deletion_seq, modified_at, encoded)
+    
+    def current_version(self) -> CatalogVersion:
+        """当前快照的版本"""
+        snapshot = self._snapshot
+        return CatalogVersion(
+            tag=f"{len(snapshot.order)}-{snapshot.seq}",
+            last_modified=_from_timestamp(snapshot.modified_at)
+        )
+    
+    def get_json(self, episode_id: int) -> Optional[Tuple[EpisodeResponse, bytes]]:
+        """按 ID 获取播客及其 JSON 编码"""
+        snapshot = self._snapshot
+        episode = snapshot.by_id.get(episode_id)
+        if episode is None:
+            return None
+        return episode, _encoded(snapshot, episode)
+    
+    def page_json(self, limit: int, after: Optional[Tuple[str, int]] = None) -> Tuple[List[bytes], Optional[Tuple[str, int]]]:
+        """
+        按 (created_at, id) 倒序取一页，返回各播客的 JSON 编码（每个播客只编码一次，之后直接复用）
+        
+        参数:
+            limit: 每页条数
+            after: 上一页最后一条的 (created_at, id)
+        
+        返回:
+            (各播客的 JSON 编码, 下一页起点；没有更多时为 None)
+        """
+        snapshot = self._snapshot
+        end = len(snapshot.order) if after is None else bisect.bisect_left(snapshot.order, after)
+        start = max(0, end - limit)
+        keys = snapshot.order[start:end]
+        keys.reverse()
+        next_key = keys[-1] if start > 0 and keys else None
+        return [_encoded(snapshot, snapshot.by_id[key[1]]) for key in keys], next_key
+    
+    def __len__(self) -> int:
+        return len(self._snapshot.order)
+    
+    def close(self):
+        """关闭目录连接并清空缓存"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._data_version = None
+            self._bump(_Snapshot({}, [], 0, 0, None, {}))
+
+_catalog = EpisodeCatalog()
+
+def get_catalog() -> EpisodeCatalog:
+    """获取全局播客目录"""
+    return _catalog
+
+# ==================== 异步接口 ====================
+# 与 repository 的接口对应，但直接返回响应模型；缓存关闭时回退到数据库查询。
+# 写入都经过 repository（连接池），提交后等待目录同步
+
+async def get_version() -> CatalogVersion:
+    """
+    获取目录当前版本（用于 ETag / Last-Modified）
+    
+    缓存关闭时直接查询数据库。
+    """
+    if not CATALOG_CACHE_ENABLED:
+        count, seq, modified_at = await repository.run_db("count", repository.count_episodes_and_seq)
+        return CatalogVersion(tag=f"{count}-{seq}", last_modified=_from_timestamp(modified_at))
+    
+    await repository.run_db("refresh", _catalog.refresh)
+    return _catalog.current_version()
+
+async def list_episodes_json(limit: int, cursor: Optional[str] = None, include_total: bool = False) -> bytes:
+    """
+    分页获取播客，直接返回 EpisodePage 的 JSON
+    
+    缓存开启时复用各播客编码好的 JSON，关闭时将数据库记录直接编码，都不构建响应模型。
+    
+    异常:
+        ValueError: 游标无效
+    """
+    if not CATALOG_CACHE_ENABLED:
+        rows, next_cursor, total = await repository.list_episodes(limit, cursor, include_total)
+        return episode_page_json([episode_json_from_row(row) for row in rows], next_cursor, total)
+    
+    after = repository.decode_episode_cursor(cursor) if cursor else None
+    await repository.run_db("refresh", _catalog.refresh)
+    items, next_key = _catalog.page_json(limit, after)
+    next_cursor = repository.encode_cursor(*next_key) if next_key else None
+    total = len(_catalog) if include_total else None
+    return episode_page_json(items, next_cursor, total)
+
+async def get_episode_json(episode_id: int) -> Optional[Tuple[EpisodeResponse, bytes]]:
+    """获取单个播客及其 JSON 编码，不存在时为 None"""
+    if not CATALOG_CACHE_ENABLED:
+        row = await repository.get_episode(episode_id)
+        if row is None:
+            return None
+        episode = episode_from_row(row)
+        return episode, encode_episode(episode)
+    
+    await repository.run_db("refresh", _catalog.refresh)
+    return _catalog.get_json(episode_id)
+
+async def create_episode(
+    title: str,
+    description: str,
+    audio: SavedFile,
+    image: SavedFile,
+    created_at: str,
+    audio_meta: Optional[AudioMetadata] = None
+) -> EpisodeResponse:
+    """插入播客记录并放置文件，返回创建的播客"""
+    row = await repository.insert_episode(title, description, audio, image, created_at, audio_meta)
+    if CATALOG_CACHE_ENABLED:
+        await repository.run_db("refresh", _catalog.refresh, True)
+    return episode_from_row(row)
+
+async def create_episodes(episodes: List[repository.NewEpisode]) -> List[Union[EpisodeResponse, Exception]]:
+    """
+    在一个事务中批量插入播客记录并放置文件
+    
+    返回:
+        与 episodes 一一对应的列表：成功为创建的播客，失败为异常
+    """
+    results = await repository.insert_episodes(episodes)
+    if CATALOG_CACHE_ENABLED:
+        await repository.run_db("refresh", _catalog.refresh, True)
+    return [row if isinstance(row, Exception) else episode_from_row(row) for row in results]
+
+async def delete_episode(episode_id: int) -> Optional[List[str]]:
+    """删除播客记录，返回提交后需要删除的文件，不存在时为 None"""
+    files = await repository.delete_episode(episode_id)
+    if CATALOG_CACHE_ENABLED and files is not None:
+        await repository.run_db("refresh", _catalog.refresh, True)
+    return files
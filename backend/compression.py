@@ -0,0 +1,247 @@
+"""
+响应压缩
+
+- CompressionMiddleware: 按 Accept-Encoding 协商 zstd / br / gzip，压缩 JSON、文本、XML 等响应；
+  小于 COMPRESSION_MIN_BYTES、分多段发送（流式、文件）、已经带有 Content-Encoding 的响应，
+  以及音频和支持 Range 的媒体响应原样发送
+- 预压缩: 可压缩的存储文件（例如 WAV）在写入时生成一次 .zst / .br / .gz 变体，
+  请求时只按 Accept-Encoding 选择已有的文件，不再消耗 CPU
+MP3、M4A、JPEG、PNG、WebP 本身已经压缩，不在可压缩类型中，自动跳过。
+
+brotli 和 zstd 依赖 brotli 包和 zstandard 包（或 Python 3.14 的 compression.zstd），缺少时不提供该编码，gzip 始终可用。
+"""
+import os
+import zlib
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.http_cache import parse_accept_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))  # 小于此大小的响应不压缩
+PRECOMPRESS_MIN_SAVING = 0.1  # 预压缩至少节省 10% 才保留变体
+PRECOMPRESS_CHUNK_SIZE = 1024 * 1024
+
+# 可压缩的内容类型（不含参数）；其余 image/*、audio/*、video/* 视为已压缩
+_COMPRESSIBLE_TYPES = {
+    "application/json", "application/xml", "application/javascript", "application/rss+xml",
+    "application/atom+xml", "image/svg+xml", "audio/wav", "audio/x-wav", "audio/wave",
+}
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """内容类型是否值得压缩"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE_TYPES
+        or media_type.endswith("+json")
+        or media_type.endswith("+xml")
+    )
+
+# ==================== 编码 ====================
+
+class Codec(NamedTuple):
+    """一种内容编码"""
+    name: str  # Content-Encoding 的值
+    suffix: str  # 预压缩文件的扩展名
+    compressor: Callable[[int], object]  # compressor(level) -> 带 compress() / flush() 的对象
+    dynamic_level: int  # 压缩响应时的级别（速度优先）
+    static_level: int  # 预压缩文件的级别（只压缩一次，压缩率优先）
+
+def _gzip_compressor(level: int):
+    return zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip 格式
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+def _zstd_compressor(level: int):
+    if zstd is not None:
+        return zstd.ZstdCompressor(level)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+GZIP = Codec("gzip", ".gz", _gzip_compressor, 6, 9)
+BROTLI = Codec("br", ".br", _BrotliCompressor, 5, 9)
+ZSTD = Codec("zstd", ".zst", _zstd_compressor, 3, 12)
+
+ALL_CODECS = (ZSTD, BROTLI, GZIP)  # 客户端同样接受时的优先顺序
+CODECS = tuple(codec for codec in ALL_CODECS if (
+    codec is GZIP
+    or (codec is BROTLI and brotli is not None)
+    or (codec is ZSTD and (zstd is not None or zstandard is not None))
+))
+
+def compress(codec: Codec, data: bytes, level: int) -> bytes:
+    """一次性压缩"""
+    compressor = codec.compressor(level)
+    return compressor.compress(data) + compressor.flush()
+
+def negotiate(accept_encoding: Optional[str], codecs: Iterable[Codec] = CODECS) -> Optional[Codec]:
+    """
+    选择客户端接受的编码
+
+    q 值最高者优先，q 值相同时按 codecs 的顺序；都不接受时为 None（发送原始内容）。
+    """
+    accepted = parse_accept_encoding(accept_encoding or "")
+    best, best_quality = None, 0.0
+    for codec in codecs:
+        quality = accepted.get(codec.name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
+
+# ==================== 预压缩文件 ====================
+
+def precompress_file(path: str, codecs: Iterable[Codec] = CODECS) -> List[str]:
+    """
+    为文件生成各编码的压缩变体 path + suffix（同步，在线程池中调用）
+
+    只读取一遍原文件，同时送入所有压缩器；节省不足 PRECOMPRESS_MIN_SAVING 的变体不保留。
+
+    返回:
+        保留了变体的编码名称
+    """
+    size = os.path.getsize(path)
+    outputs = []
+    try:
+        for codec in codecs:
+            outputs.append((codec, codec.compressor(codec.static_level), open(f"{path}{codec.suffix}.part", "wb")))
+        with open(path, "rb") as src:
+            while True:
+                chunk = src.read(PRECOMPRESS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                for _, compressor, dst in outputs:
+                    dst.write(compressor.compress(chunk))
+        for _, compressor, dst in outputs:
+            dst.write(compressor.flush())
+            dst.close()
+
+        kept = []
+        for codec, _, dst in outputs:
+            if os.path.getsize(dst.name) <= size * (1 - PRECOMPRESS_MIN_SAVING):
+                os.replace(dst.name, f"{path}{codec.suffix}")
+                kept.append(codec.name)
+            else:
+                os.remove(dst.name)
+        return kept
+    except BaseException:
+        for _, _, dst in outputs:
+            dst.close()
+            if os.path.exists(dst.name):
+                os.remove(dst.name)
+        raise
+
+def precompressed_variants(path: str) -> Dict[str, str]:
+    """已存在的预压缩变体 {编码名称: 文件路径}"""
+    return {codec.name: f"{path}{codec.suffix}" for codec in ALL_CODECS if os.path.exists(f"{path}{codec.suffix}")}
+
+def select_precompressed(path: str, accept_encoding: Optional[str]) -> Optional[Codec]:
+    """按 Accept-Encoding 选择一个已存在的预压缩变体，没有合适的变体时为 None"""
+    available = precompressed_variants(path)
+    if not available:
+        return None
+    return negotiate(accept_encoding, [codec for codec in ALL_CODECS if codec.name in available])
+
+def variant_suffixes() -> List[str]:
+    """所有可能的预压缩文件扩展名（清理文件时使用，与可选依赖是否安装无关）"""
+    return [codec.suffix for codec in ALL_CODECS]
+
+# ==================== 中间件 ====================
+
+def _compress_dynamically(headers: Headers) -> bool:
+    # 媒体文件（支持 Range 的响应、音频）只发送预压缩变体，不在请求时压缩：
+    # 小文件也会一次性发送，否则每次请求都要重新压缩
+    content_type = headers.get("content-type") or ""
+    return (
+        is_compressible(content_type)
+        and not content_type.lower().startswith("audio/")
+        and "accept-ranges" not in headers
+        and "content-range" not in headers
+    )
+
+class CompressionMiddleware:
+    """
+    压缩一次性发送的可压缩响应
+
+    压缩后的 ETag 改为弱 ETag（同一资源的不同表示），Vary 加上 Accept-Encoding；
+    If-None-Match 使用弱比较，客户端带回弱 ETag 时仍能得到 304。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if passthrough or start_message is None:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # 其他消息（例如 http.response.zerocopy）原样发送，先补上暂存的响应头
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or start_message["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not _compress_dynamically(headers)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(codec, body, codec.dynamic_level)
+            headers["Content-Encoding"] = codec.name
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
@@ -3,9 +3,44 @@ SQLite 数据库管理
 """
 import sqlite3
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from backend.metrics import DB_CONNECTION_WAIT
 
 DATABASE_PATH = "podcasts.db"
 
+# 连接池配置
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # 池中最多保留的连接数
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # 等待空闲连接的秒数
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))  # 写锁冲突时的等待毫秒数
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))  # 内存映射读取的字节数
+DELETION_LOG_SIZE = 10000  # episode_deletions 保留的最近删除记录数
+UNIX_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"  # 当前 Unix 时间戳（秒，带小数）的 SQL 表达式
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """
+    为连接设置 PRAGMA
+    
+    WAL 让读写互不阻塞，synchronous=NORMAL 在 WAL 下仍能保证一致性且减少 fsync，
+    busy_timeout 让写锁冲突时等待而不是立即报错，mmap_size 减少读取时的系统调用。
+    
+    参数:
+        conn: 数据库连接
+    
+    返回:
+        sqlite3.Connection: 配置后的连接
+    """
+    conn.row_factory = sqlite3.Row  # 允许通过列名访问
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    return conn
+
 def get_db_connection():
     """
     获取数据库连接
@@ -13,15 +48,167 @@ def get_db_connection():
     返回:
         sqlite3.Connection: 数据库连接对象
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # 允许通过列名访问
-    return conn
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+    return configure_connection(conn)
+
+class ConnectionPool:
+    """
+    SQLite 连接池
+    
+    连接按需创建，最多 max_size 个；归还时回滚未提交的事务后放回池中复用。
+    连接可能在不同线程间传递，但同一时间只由一个使用者持有。
+    """
+    
+    def __init__(self, max_size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> sqlite3.Connection:
+        """
+        取出一个连接，池空且未达上限时新建，否则等待其他使用者归还
+        
+        返回:
+            sqlite3.Connection: 数据库连接
+        """
+        try:
+            conn = self._idle.get_nowait()
+            DB_CONNECTION_WAIT.observe(0)
+            return conn
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        
+        if create:
+            DB_CONNECTION_WAIT.observe(0)
+            try:
+                return get_db_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        
+        start = time.perf_counter()
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待数据库连接超时 ({self.timeout}s)")
+        finally:
+            DB_CONNECTION_WAIT.observe(time.perf_counter() - start)
+    
+    def release(self, conn: sqlite3.Connection):
+        """
+        归还连接
+        
+        参数:
+            conn: 由 acquire 取出的连接
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # 连接已损坏，丢弃并允许重新创建
+            with self._lock:
+                self._created -= 1
+            conn.close()
+            return
+        self._idle.put(conn)
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        上下文管理器：无论是否抛出异常，连接都会归还到池中
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            conn.close()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """
+    获取全局连接池（首次调用时创建）
+    
+    返回:
+        ConnectionPool: 连接池
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def db_connection():
+    """
+    从全局连接池借出连接
+    
+    用法:
+        with db_connection() as conn:
+            conn.execute(...)
+    """
+    return get_pool().connection()
+
+def close_pool():
+    """关闭全局连接池中的空闲连接"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+# 建表之后新增的列：旧数据库在 init_db 时通过 ALTER TABLE 补齐
+EPISODE_ADDED_COLUMNS = {
+    "audio_size": "INTEGER",  # 音频文件字节数
+    "audio_sha256": "TEXT",  # 音频文件 SHA-256
+    "image_variants": "TEXT",  # 封面缩略图列表（JSON）
+    "duration_seconds": "REAL",  # 音频时长（秒）
+    "bitrate_kbps": "INTEGER",  # 平均码率
+    "sample_rate": "INTEGER",  # 采样率（Hz）
+    "channels": "INTEGER",  # 声道数
+}
+
+def ensure_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+    """
+    为已有表补齐缺失的列
+    
+    参数:
+        cursor: 数据库游标
+        table: 表名
+        columns: 列名 -> 列定义
+    """
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
 
 def init_db():
     """
     初始化数据库
     
-    创建 episodes 表（如果不存在）
+    创建 episodes 表、全文索引、删除记录、目录修改时间及其同步触发器（如果不存在）
     """
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -37,6 +224,97 @@ def init_db():
             created_at TEXT NOT NULL
         )
     """)
+    ensure_columns(cursor, "episodes", EPISODE_ADDED_COLUMNS)
+    
+    # 内容寻址文件的引用计数
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL
+        )
+    """)
+    
+    # 游标分页按 (created_at, id) 倒序扫描
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_episodes_created_at_id
+        ON episodes (created_at DESC, id DESC)
+    """)
+    
+    # 标题和描述的全文索引（外部内容表，不重复存储文本）
+    # trigram 分词按字符切分，中英文都能做子串匹配
+    fts_exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episodes_fts'"
+    ).fetchone()
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+            title,
+            description,
+            content = 'episodes',
+            content_rowid = 'id',
+            tokenize = 'trigram'
+        )
+    """)
+    
+    # 触发器保持索引与 episodes 同步
+    cursor.executescript("""
+        CREATE TRIGGER IF NOT EXISTS episodes_fts_insert AFTER INSERT ON episodes BEGIN
+            INSERT INTO episodes_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS episodes_fts_delete AFTER DELETE ON episodes BEGIN
+            INSERT INTO episodes_fts (episodes_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS episodes_fts_update AFTER UPDATE OF title, description ON episodes BEGIN
+            INSERT INTO episodes_fts (episodes_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO episodes_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END;
+    """)
+    
+    # 删除记录（只追加）：目录缓存按序号增量同步删除，不必重新加载整张表；
+    # 只保留最近 DELETION_LOG_SIZE 条，落后更多的缓存整体重新加载
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS episode_deletions (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            episode_id INTEGER NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS episodes_log_delete AFTER DELETE ON episodes BEGIN
+            INSERT INTO episode_deletions (episode_id) VALUES (old.id);
+            DELETE FROM episode_deletions
+            WHERE seq <= (SELECT MAX(seq) FROM episode_deletions) - {DELETION_LOG_SIZE};
+        END
+    """)
+    
+    # 目录最近一次变化的时间（Unix 时间戳），由触发器在写事务中更新：
+    # 所有 worker 从数据库读到同一个值，列表的 Last-Modified 因此一致
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            modified_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO catalog_state (id, modified_at) VALUES (1, ?)", (time.time(),))
+    cursor.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS episodes_touch_insert AFTER INSERT ON episodes BEGIN
+            UPDATE catalog_state SET modified_at = {UNIX_NOW_SQL} WHERE id = 1;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS episodes_touch_delete AFTER DELETE ON episodes BEGIN
+            UPDATE catalog_state SET modified_at = {UNIX_NOW_SQL} WHERE id = 1;
+        END;
+    """)
+    
+    # 已有数据库首次建立索引时，为现有记录补建
+    if not fts_exists:
+        cursor.execute("INSERT INTO episodes_fts (episodes_fts) VALUES ('rebuild')")
     
     conn.commit()
     conn.close()
@@ -49,14 +327,19 @@ def reset_db():
     
     警告：这会删除所有数据！
     """
+    close_pool()
     if os.path.exists(DATABASE_PATH):
         os.remove(DATABASE_PATH)
         print(f"🗑️  数据库已删除: {DATABASE_PATH}")
     
+    # WAL 模式下的附属文件
+    for path in (f"{DATABASE_PATH}-wal", f"{DATABASE_PATH}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    
     init_db()
     print("✅ 数据库已重置")
 
 if __name__ == "__main__":
     # 测试数据库初始化
     init_db()
-
@@ -0,0 +1,69 @@
+"""
+阻塞 I/O 线程池
+
+SQLite 和文件系统调用都是阻塞的，统一放到有界线程池中执行，
+避免一次慢速磁盘写入卡住同一 worker 上的所有请求。
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+IO_MAX_WORKERS = int(os.getenv("IO_MAX_WORKERS", "16"))  # 线程池最大线程数
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """
+    获取共享的 I/O 线程池（首次调用时创建）
+    
+    返回:
+        ThreadPoolExecutor: 线程池
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix="io")
+    return _executor
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在 I/O 线程池中执行阻塞函数并等待结果
+    
+    参数:
+        func: 阻塞函数
+        *args, **kwargs: 传给 func 的参数
+    
+    返回:
+        func 的返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(func, *args, **kwargs))
+
+async def run_io_to_completion(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    与 run_io 相同，但调用方被取消时先等线程中的函数执行完，再传递取消
+    
+    线程中的函数无法中途停止：创建、改名文件这类操作如果在取消之后才完成，
+    调用方的清理会先于它执行而留下残留。
+    """
+    future = asyncio.ensure_future(run_io(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+def shutdown_io_executor():
+    """关闭 I/O 线程池，等待进行中的任务完成"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
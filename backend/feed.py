@@ -0,0 +1,157 @@
+"""
+播客 RSS 订阅源
+
+渲染好的 XML（及其 gzip 压缩版本）按目录版本缓存：目录不变时（绝大多数抓取请求）
+只需比较版本号，直接返回缓存的字节或 304；创建或删除播客改变目录版本后，下一次请求才重新生成。
+重新生成时只查询最新的 FEED_MAX_ITEMS 条记录（索引范围扫描），
+每条 <item> 的 XML 按播客 ID 缓存，已有的条目不会重新渲染。
+"""
+import asyncio
+import gzip
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+from backend import repository
+from backend.executor import run_io
+from backend.http_cache import content_etag, format_http_date
+
+FEED_MAX_ITEMS = int(os.getenv("FEED_MAX_ITEMS", "300"))  # 订阅源中的最新播客数
+FEED_TITLE = os.getenv("FEED_TITLE", "AI Podcast")
+FEED_DESCRIPTION = os.getenv("FEED_DESCRIPTION", "AI 生成的播客节目")
+FEED_LANGUAGE = os.getenv("FEED_LANGUAGE", "zh-cn")
+FEED_AUTHOR = os.getenv("FEED_AUTHOR", "")
+FEED_IMAGE_URL = os.getenv("FEED_IMAGE_URL", "")  # 节目封面（itunes:image），为空时使用最新一集的封面
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")  # 订阅源中的绝对地址前缀，为空时使用请求的地址
+FEED_BASE_URLS_CACHED = 8  # 未设置 PUBLIC_BASE_URL 时，最多为几个不同的请求地址缓存订阅源
+
+# XML 1.0 不允许的控制字符
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+class RenderedFeed(NamedTuple):
+    """渲染好的订阅源"""
+    tag: str  # 生成时的目录版本
+    xml: bytes
+    gzipped: bytes
+    etag: str
+    gzip_etag: str  # 同一内容的 gzip 表示使用不同的强 ETag
+    last_modified: datetime
+
+def _text(value: Optional[str]) -> str:
+    return escape(_INVALID_XML_CHARS.sub("", value or ""))
+
+def _attr(value: str) -> str:
+    return quoteattr(_INVALID_XML_CHARS.sub("", value))
+
+def _rfc822(created_at: str) -> str:
+    try:
+        return format_http_date(datetime.fromisoformat(created_at))
+    except ValueError:
+        return ""
+
+def _audio_type(path: str) -> str:
+    return {".m4a": "audio/x-m4a", ".wav": "audio/wav"}.get(os.path.splitext(path)[1].lower()) or mimetypes.guess_type(path)[0] or "audio/mpeg"
+
+def render_item(row, base_url: str) -> bytes:
+    """一条播客的 <item>"""
+    episode_url = f"{base_url}/api/episodes/{row['id']}"
+    image_url = f"{base_url}/storage/{row['image_path']}"
+    parts = [
+        "<item>",
+        f"<title>{_text(row['title'])}</title>",
+        f"<description>{_text(row['description'])}</description>",
+        f"<guid isPermaLink=\"false\">{_text(episode_url)}</guid>",
+        f"<pubDate>{_rfc822(row['created_at'])}</pubDate>",
+        f"<enclosure url={_attr(episode_url + '/audio')} length=\"{row['audio_size'] or 0}\" type={_attr(_audio_type(row['audio_path']))}/>",
+        f"<itunes:image href={_attr(image_url)}/>",
+    ]
+    if row["duration_seconds"] is not None:
+        parts.append(f"<itunes:duration>{int(round(row['duration_seconds']))}</itunes:duration>")
+    parts.append("</item>")
+    return "".join(parts).encode()
+
+def render_channel(items: List[bytes], rows, base_url: str, last_modified: datetime) -> bytes:
+    """拼接完整的 RSS 文档"""
+    image_url = FEED_IMAGE_URL or (f"{base_url}/storage/{rows[0]['image_path']}" if rows else "")
+    head = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" xmlns:atom="http://www.w3.org/2005/Atom">',
+        "<channel>",
+        f"<title>{_text(FEED_TITLE)}</title>",
+        f"<link>{_text(base_url + '/')}</link>",
+        f"<description>{_text(FEED_DESCRIPTION)}</description>",
+        f"<language>{_text(FEED_LANGUAGE)}</language>",
+        f"<atom:link href={_attr(base_url + '/feed.xml')} rel=\"self\" type=\"application/rss+xml\"/>",
+        f"<lastBuildDate>{format_http_date(last_modified)}</lastBuildDate>",
+    ]
+    if FEED_AUTHOR:
+        head.append(f"<itunes:author>{_text(FEED_AUTHOR)}</itunes:author>")
+    if image_url:
+        head.append(f"<itunes:image href={_attr(image_url)}/>")
+    return b"".join(("".join(head).encode(), *items, b"</channel></rss>"))
+
+class FeedCache:
+    """
+    一个地址前缀下的订阅源缓存
+
+    并发请求在目录变化后同时到达时，只有一个执行重新生成，其余等待并复用结果。
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._items: Dict[int, bytes] = {}
+        self._rendered: Optional[RenderedFeed] = None
+        self._lock = asyncio.Lock()
+
+    def _render(self, tag: str, rows, last_modified: datetime) -> RenderedFeed:
+        # 同步，在线程池中执行（渲染和压缩）
+        items = {row["id"]: self._items.get(row["id"]) or render_item(row, self.base_url) for row in rows}
+        self._items = items
+        xml = render_channel(list(items.values()), rows, self.base_url, last_modified)
+        etag = content_etag(xml)
+        return RenderedFeed(
+            tag=tag,
+            xml=xml,
+            gzipped=gzip.compress(xml, compresslevel=9, mtime=0),
+            etag=etag,
+            gzip_etag=etag[:-1] + '-gz"',
+            last_modified=last_modified
+        )
+
+    async def get(self, tag: str, last_modified: Optional[datetime]) -> RenderedFeed:
+        """
+        获取目录版本 tag 对应的订阅源，版本变化时重新生成
+
+        参数:
+            tag: 当前目录版本
+            last_modified: 目录最近一次变化的时间，未知时使用生成时间
+        """
+        rendered = self._rendered
+        if rendered is not None and rendered.tag == tag:
+            return rendered
+        async with self._lock:
+            rendered = self._rendered
+            if rendered is not None and rendered.tag == tag:
+                return rendered
+            rows = await repository.latest_feed_episodes(FEED_MAX_ITEMS)
+            modified = (last_modified or datetime.now(timezone.utc)).replace(microsecond=0)
+            rendered = await run_io(self._render, tag, rows, modified)
+            self._rendered = rendered
+            return rendered
+
+_feeds: "OrderedDict[str, FeedCache]" = OrderedDict()
+
+def get_feed_cache(base_url: str) -> FeedCache:
+    """按地址前缀获取订阅源缓存（最近使用的 FEED_BASE_URLS_CACHED 个）"""
+    cache = _feeds.get(base_url)
+    if cache is None:
+        cache = _feeds[base_url] = FeedCache(base_url)
+        while len(_feeds) > FEED_BASE_URLS_CACHED:
+            _feeds.popitem(last=False)
+    else:
+        _feeds.move_to_end(base_url)
+    return cache
@@ -0,0 +1,138 @@
+"""
+HTTP 条件请求工具
+
+生成 ETag / Last-Modified 响应头，并根据 If-None-Match / If-Modified-Since 判断是否可以返回 304。
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+def make_etag(token: str) -> str:
+    """
+    生成强 ETag
+    
+    参数:
+        token: 版本标识（不含引号）
+    
+    返回:
+        带引号的 ETag
+    """
+    return f'"{token}"'
+
+def content_etag(data: bytes) -> str:
+    """根据内容哈希生成强 ETag"""
+    return make_etag(hashlib.blake2b(data, digest_size=12).hexdigest())
+
+def format_http_date(dt: datetime) -> str:
+    """格式化为 HTTP 日期（IMF-fixdate）"""
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    """解析 HTTP 日期，无效时返回 None"""
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    If-None-Match 弱比较
+    
+    参数:
+        header: If-None-Match 请求头
+        etag: 当前 ETag
+    """
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    判断客户端缓存是否仍然有效
+    
+    If-None-Match 存在时只看 ETag；否则比较 If-Modified-Since（精确到秒）。
+    
+    参数:
+        request: 当前请求
+        etag: 当前 ETag
+        last_modified: 当前资源的最后修改时间
+    
+    返回:
+        是否应该返回 304
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        since = parse_http_date(if_modified_since)
+        if since is not None:
+            return last_modified.replace(microsecond=0) <= since
+    return False
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None, cache_control: str = "no-cache") -> Dict[str, str]:
+    """
+    构造缓存相关响应头
+    
+    参数:
+        etag: ETag
+        last_modified: 最后修改时间
+        cache_control: Cache-Control 值，默认要求客户端每次重新验证
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """构造 304 响应"""
+    return Response(status_code=304, headers=headers)
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    解析 Accept-Encoding
+    
+    返回:
+        {编码名称（小写）: q 值}，无效的 q 值视为 0
+    """
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+def accepts_encoding(request: Request, coding: str) -> bool:
+    """
+    客户端是否接受某种内容编码（按 Accept-Encoding，q=0 表示拒绝）
+    
+    参数:
+        request: 当前请求
+        coding: 编码名称，例如 gzip
+    """
+    accepted = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+    return accepted.get(coding, accepted.get("*", 0.0)) > 0
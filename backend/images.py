@@ -0,0 +1,182 @@
+"""
+封面图片衍生图
+
+上传后按几个固定宽度生成缩略图（原格式 + WebP），供前端通过 srcset 按需加载小图。
+缩放和编码在进程池中执行，事件循环不做图片 CPU 计算。
+依赖 Pillow（pip install Pillow），未安装时跳过衍生图生成。
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from backend import s3
+from backend.executor import run_io
+from backend.metrics import STAGE_DURATION
+from backend.storage import STAGING_DIR, STORAGE_BASE_DIR, Derivative, SavedFile, derivative_path, uses_object_storage
+
+COVER_WIDTHS = tuple(int(w) for w in os.getenv("COVER_WIDTHS", "160,320,640").split(","))  # 缩略图宽度（像素）
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))  # 图片处理进程数
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+# 进程池在首次使用时创建，此时已有 uvicorn 和 I/O 线程池的线程，fork 可能在子进程中死锁
+IMAGE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def render_cover_variants(source_path: str, output_dir: str, widths: Tuple[int, ...]) -> List[Tuple[int, str, str]]:
+    """
+    生成缩略图（在子进程中执行）
+    
+    只缩小不放大；每个宽度输出原格式和 WebP 两个文件。
+    
+    参数:
+        source_path: 原图路径
+        output_dir: 输出目录
+        widths: 目标宽度
+    
+    返回:
+        [(宽度, 格式, 文件路径)]
+    """
+    from PIL import Image
+    
+    outputs = []
+    with Image.open(source_path) as image:
+        source_format = "png" if image.format == "PNG" else "jpeg"
+        image.load()
+        if source_format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        
+        for width in sorted(set(widths)):
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            
+            for file_format in ("webp", source_format):
+                out_path = os.path.join(output_dir, f"{uuid.uuid4().hex}.{file_format}")
+                if file_format == "webp":
+                    resized.save(out_path, "WEBP", quality=WEBP_QUALITY, method=4)
+                elif file_format == "jpeg":
+                    resized.save(out_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                else:
+                    resized.save(out_path, "PNG", optimize=True)
+                outputs.append((width, file_format, out_path))
+    return outputs
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """获取图片处理进程池（首次调用时创建）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_WORKERS,
+                    mp_context=multiprocessing.get_context(IMAGE_START_METHOD)
+                )
+    return _pool
+
+def shutdown_image_pool():
+    """关闭图片处理进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+def _stored_names(saved: SavedFile, prefix: str) -> List[str]:
+    # 与原文件同目录、以 prefix 开头的文件名；原文件不在最终位置时为空
+    directory = os.path.dirname(saved.path)
+    if uses_object_storage():
+        store = s3.get_store()
+        if not store.exists(saved.path):
+            return []
+        return [key.rsplit("/", 1)[-1] for key in store.list_keys(f"{directory}/{prefix}")]
+    if not os.path.exists(os.path.join(STORAGE_BASE_DIR, saved.path)):
+        return []
+    return [name for name in os.listdir(os.path.join(STORAGE_BASE_DIR, directory)) if name.startswith(prefix)]
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _existing_derivatives(saved: SavedFile) -> List[Derivative]:
+    # 相同内容之前上传过：衍生图已在最终位置，无需重新生成
+    subfolder = saved.path.split("/", 1)[0]
+    prefix = f"{saved.sha256}_w"
+    derivatives = []
+    for name in _stored_names(saved, prefix):
+        if not name.startswith(prefix) or ".deleted-" in name:
+            continue
+        width_text, _, file_format = name[len(prefix):].partition(".")
+        if width_text.isdigit():
+            width = int(width_text)
+            derivatives.append(Derivative(
+                path=derivative_path(subfolder, saved.sha256, width, file_format),
+                width=width,
+                format=file_format
+            ))
+    derivatives.sort(key=lambda d: (d.width, d.format))
+    return derivatives
+
+async def add_cover_variants(saved: SavedFile) -> SavedFile:
+    """
+    为暂存的封面图生成缩略图，返回附带衍生文件的 SavedFile
+    
+    生成失败（未安装 Pillow、图片损坏等）时原样返回，不影响上传。
+    已存储的封面（没有暂存文件）只附上已有的缩略图。
+    
+    参数:
+        saved: save_file 返回的封面图信息
+    """
+    with STAGE_DURATION.time(stage="cover_variants"):
+        return await _add_cover_variants(saved)
+
+async def _add_cover_variants(saved: SavedFile) -> SavedFile:
+    existing = await run_io(_existing_derivatives, saved)
+    if existing:
+        return saved._replace(derivatives=tuple(existing))
+    if saved.staged_path is None and saved.staged_key is None:
+        return saved
+    
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("⚠️  未安装 Pillow，跳过封面缩略图生成")
+        return saved
+    
+    loop = asyncio.get_running_loop()
+    source_path = saved.staged_path
+    try:
+        await run_io(os.makedirs, STAGING_DIR, exist_ok=True)
+        if source_path is None:
+            # 暂存在对象存储中：封面不大，先下载到本地暂存目录再处理
+            source_path = os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}.cover")
+            await run_io(s3.get_store().download_file, saved.staged_key, source_path)
+        outputs = await loop.run_in_executor(
+            get_image_pool(), render_cover_variants, source_path, STAGING_DIR, COVER_WIDTHS
+        )
+    except Exception as e:
+        print(f"⚠️ 警告: 无法生成封面缩略图: {str(e)}")
+        return saved
+    finally:
+        if source_path is not None and source_path != saved.staged_path:
+            await run_io(_remove_quietly, source_path)
+    
+    subfolder = saved.path.split("/", 1)[0]
+    derivatives = tuple(
+        Derivative(
+            path=derivative_path(subfolder, saved.sha256, width, file_format),
+            width=width,
+            format=file_format,
+            staged_path=staged_path
+        )
+        for width, file_format, staged_path in outputs
+    )
+    return saved._replace(derivatives=derivatives)
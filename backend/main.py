@@ -1,17 +1,50 @@
 """
 FastAPI 后端 - 播客上传和管理 API
 """
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
-from typing import Optional, List
+from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, PlainTextResponse
+from typing import Dict, Optional, List, Tuple
+import asyncio
 import os
-from datetime import datetime
+import mimetypes
+import re
+from datetime import datetime, timezone
 
-from backend.db import init_db, get_db_connection
-from backend.models import EpisodeResponse
-from backend.storage import save_file, validate_file
+from backend import catalog, feed, repository, s3
+from backend.audio_meta import AudioMetadata, probe_audio_file
+from backend.db import init_db, close_pool
+from backend.executor import run_io, shutdown_io_executor
+from backend.images import add_cover_variants, shutdown_image_pool
+from backend.metrics import REGISTRY, STAGE_DURATION, MetricsMiddleware
+from backend.compression import CompressionMiddleware, select_precompressed
+from backend.http_cache import make_etag, content_etag, is_not_modified, cache_headers, not_modified_response, accepts_encoding
+from backend.streaming import ClosingFileResponse, FileRangeResponse, RangeNotSatisfiable, parse_range, if_range_matches
+from backend.models import (
+    EpisodeResponse, EpisodePage, EpisodeSearchPage, BatchCreateResponse, BatchItemResult, BlobInfo,
+    UploadCreateRequest, UploadSession, DirectUploadCreateRequest, DirectUploadSession, DirectUploadFinalizeRequest,
+    UploadTarget, search_hit_from_row
+)
+from backend.validation import (
+    RequestSizeLimitMiddleware, EPISODE_UPLOAD_MAX_BYTES, BATCH_UPLOAD_MAX_BYTES, BATCH_MAX_ITEMS,
+    AUDIO_MAX_MB, IMAGE_MAX_MB, FORM_OVERHEAD_BYTES, SNIFF_BYTES, sniff_media_type
+)
+from backend.storage import (
+    SavedFile, FileTooLarge, UploadInfo, UploadOffsetMismatch, UPLOAD_EXPIRY_SECONDS,
+    save_file, save_files, validate_file, discard_staged, local_media_path, open_saved, uses_object_storage,
+    add_precompressed,
+    get_media_cache, lease_media_file,
+    create_upload, get_upload, append_upload, finish_upload, read_upload_head, abort_upload,
+    DirectUploadFile, UploadVerificationError, create_direct_upload, receive_direct_upload,
+    verify_direct_upload, direct_upload_lock, close_direct_upload, abort_direct_upload
+)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # 批量创建时同时写入暂存区的条目数
+MEDIA_URL_EXPIRY = int(os.getenv("MEDIA_URL_EXPIRY", "3600"))  # 对象存储临时下载地址的有效期（秒）
+FEED_MAX_AGE = int(os.getenv("FEED_MAX_AGE", "300"))  # 订阅源允许客户端和 CDN 缓存的秒数
+AUDIO_TYPES = ["audio/mpeg", "audio/wav", "audio/mp4"]  # 按文件头识别的类型
+IMAGE_TYPES = ["image/jpeg", "image/png"]
 
 # 创建 FastAPI 应用
 app = FastAPI(
@@ -20,6 +53,16 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 在读取请求体之前拒绝超过大小限制的上传
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/api/episodes": EPISODE_UPLOAD_MAX_BYTES,
+        "/api/episodes/batch": BATCH_UPLOAD_MAX_BYTES,
+        "/api/uploads/{upload_id}/finalize": IMAGE_MAX_MB * 1024 * 1024 + FORM_OVERHEAD_BYTES
+    }
+)
+
 # 配置 CORS
 app.add_middleware(
     CORSMiddleware,
@@ -29,16 +72,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按 Accept-Encoding 压缩 JSON、XML 等一次性发送的响应（小于 COMPRESSION_MIN_BYTES 的不压缩）
+app.add_middleware(CompressionMiddleware)
+
+# 最外层：记录所有请求（包括被大小限制拒绝的）的耗时和状态码
+app.add_middleware(MetricsMiddleware)
+
 # 初始化数据库
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化数据库"""
-    init_db()
+    await run_io(init_db)
     print("✅ 数据库已初始化")
 
-# 挂载静态文件目录
-if os.path.exists("./storage"):
-    app.mount("/storage", StaticFiles(directory="storage"), name="storage")
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放线程池、进程池和数据库连接池"""
+    catalog.get_catalog().close()
+    shutdown_image_pool()
+    shutdown_io_executor()
+    s3.shutdown_store()
+    close_pool()
+
+def _is_hidden_path(path: str) -> bool:
+    """路径中是否有以 . 开头的部分（存储目录中不对外提供的文件，例如旧版本留下的 .staging）"""
+    return any(part.startswith(".") for part in path.replace(os.sep, "/").split("/"))
+
+# 挂载静态文件目录；使用对象存储时经本地读穿缓存发送（缓存关闭时重定向到临时下载地址）
+if uses_object_storage():
+    @app.get("/storage/{path:path}")
+    async def get_stored_file(path: str):
+        """发送对象存储中的文件"""
+        if _is_hidden_path(path):
+            raise HTTPException(status_code=404, detail="文件不存在")
+        if get_media_cache() is None:
+            url = await run_io(s3.get_store().presigned_get_url, path, MEDIA_URL_EXPIRY)
+            return RedirectResponse(url, status_code=307)
+        try:
+            local_path, release = await lease_media_file(path)
+        except (FileNotFoundError, ValueError):
+            raise HTTPException(status_code=404, detail="文件不存在")
+        # 路径按内容哈希生成，内容不会变化；发送完后释放缓存租用
+        return ClosingFileResponse(local_path, release, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+elif os.path.exists("./storage"):
+    class PrecompressedStaticFiles(StaticFiles):
+        """存储目录的静态文件，有预压缩变体时按 Accept-Encoding 直接发送变体"""
+
+        async def get_response(self, path: str, scope):
+            if _is_hidden_path(path):
+                raise HTTPException(status_code=404, detail="文件不存在")
+            response = await super().get_response(path, scope)
+            if response.status_code != 200 or not isinstance(response, FileResponse):
+                return response
+            request_headers = Request(scope).headers
+            if "range" in request_headers:
+                return response
+            codec = await run_io(select_precompressed, response.path, request_headers.get("accept-encoding"))
+            if codec is None:
+                return response
+            headers = {"Content-Encoding": codec.name, "Vary": "Accept-Encoding"}
+            etag = response.headers.get("etag")
+            if etag:
+                headers["ETag"] = etag if etag.startswith("W/") else f"W/{etag}"
+            return FileResponse(response.path + codec.suffix, headers=headers, media_type=response.media_type)
+
+    app.mount("/storage", PrecompressedStaticFiles(directory="storage"), name="storage")
 
 @app.get("/")
 async def root():
@@ -49,12 +147,150 @@ async def root():
         "status": "healthy"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 格式的运行指标（本进程）"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def _validate_episode_form(audio_file: Optional[UploadFile], image_file: Optional[UploadFile], title: str, description: str):
+    """
+    验证一组上传文件和元数据
+    
+    文件为 None 时跳过（断点续传的音频在 finalize 时单独检查，按哈希引用的内容上传时已检查过）。
+    读取文件大小和文件头在 I/O 线程池中进行（上传的文件可能已溢出到磁盘）。
+
+    异常:
+        HTTPException: 400，detail 为失败原因
+    """
+    # 验证音频文件
+    if audio_file is not None:
+        with STAGE_DURATION.time(stage="validate_file"):
+            audio_valid, audio_error = await run_io(
+                validate_file,
+                audio_file,
+                allowed_types=AUDIO_TYPES,
+                max_size_mb=AUDIO_MAX_MB
+            )
+        if not audio_valid:
+            raise HTTPException(status_code=400, detail=f"音频文件无效: {audio_error}")
+    
+    # 验证图片文件
+    if image_file is not None:
+        with STAGE_DURATION.time(stage="validate_file"):
+            image_valid, image_error = await run_io(
+                validate_file,
+                image_file,
+                allowed_types=IMAGE_TYPES,
+                max_size_mb=IMAGE_MAX_MB
+            )
+        if not image_valid:
+            raise HTTPException(status_code=400, detail=f"图片文件无效: {image_error}")
+    
+    _validate_metadata(title, description)
+
+def _validate_metadata(title: str, description: str):
+    """验证标题和描述，失败时抛出 400"""
+    if not title or len(title.strip()) == 0:
+        raise HTTPException(status_code=400, detail="标题不能为空")
+    if not description or len(description.strip()) == 0:
+        raise HTTPException(status_code=400, detail="描述不能为空")
+
+async def _known_blob(sha256: Optional[str], file: Optional[UploadFile], subfolder: str, field: str) -> Optional[SavedFile]:
+    """
+    解析表单中按 SHA-256 对已存储内容的引用（GET /api/blobs/{sha256} 查询到的内容不必重新上传）
+    
+    返回:
+        没有暂存文件的 SavedFile，入库时只增加引用计数；上传了文件时为 None
+    
+    异常:
+        HTTPException: 400，文件和哈希都没有提供或同时提供，或服务器上没有该内容
+    """
+    if file is not None:
+        if sha256:
+            raise HTTPException(status_code=400, detail=f"{field}_file 和 {field}_sha256 只能提供一个")
+        return None
+    if not sha256:
+        raise HTTPException(status_code=400, detail=f"缺少 {field}_file 或 {field}_sha256")
+    if not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+        raise HTTPException(status_code=400, detail=f"{field}_sha256 格式无效")
+    row = await repository.get_blob(sha256.lower())
+    # 内容按子文件夹区分类型，不能把图片当作音频引用
+    if not row or not row["path"].startswith(f"{subfolder}/"):
+        raise HTTPException(status_code=400, detail=f"服务器上没有 {field}_sha256 对应的内容，请上传文件")
+    return SavedFile(path=row["path"], size=row["size"], sha256=row["sha256"])
+
+async def _stage_episode_files(
+    audio_file: Optional[UploadFile],
+    image_file: Optional[UploadFile],
+    staged: List[SavedFile],
+    audio_known: Optional[SavedFile] = None,
+    image_known: Optional[SavedFile] = None
+) -> Tuple[SavedFile, SavedFile, Optional[AudioMetadata]]:
+    """
+    将一组音频和封面写入暂存区，生成封面缩略图并读取音频信息
+
+    audio_known / image_known 为按哈希引用的已存储内容（见 _known_blob），此时对应的文件为 None。
+    写入暂存区的文件会追加到 staged，出错时由调用方清理。
+
+    返回:
+        (音频, 封面, 音频信息)
+    """
+    # 同时保存音频和图片（分块流式写入暂存区），任一失败时另一个会被取消并清理
+    uploads = [(file, subfolder) for file, subfolder in ((audio_file, "audio"), (image_file, "images")) if file is not None]
+    saved = iter(await save_files(uploads) if uploads else [])
+    audio_saved = audio_known or next(saved)
+    image_saved = image_known or next(saved)
+    staged.extend((audio_saved, image_saved))
+    
+    # 封面缩略图（进程池）和音频的预压缩、信息读取（线程池）互不依赖，同时进行；
+    # 已存储的内容不再生成衍生文件，只附上已有的缩略图、读取音频信息
+    image_saved, (audio_saved, audio_meta) = await asyncio.gather(
+        add_cover_variants(image_saved),
+        _process_staged_audio(audio_saved)
+    )
+    staged[-2:] = [audio_saved, image_saved]
+    return audio_saved, image_saved, audio_meta
+
+async def _stage_cover(image_file: UploadFile, staged: List[SavedFile]) -> SavedFile:
+    """将封面写入暂存区并生成缩略图，暂存的文件追加到 staged"""
+    # 保存图片文件（分块流式写入暂存区）
+    image_saved = await save_file(image_file, "images")
+    staged.append(image_saved)
+    
+    # 在进程池中生成封面缩略图
+    image_saved = await add_cover_variants(image_saved)
+    staged[-1] = image_saved
+    return image_saved
+
+def _probe_saved_audio(audio_saved: SavedFile) -> Optional[AudioMetadata]:
+    try:
+        with open_saved(audio_saved) as f:
+            return probe_audio_file(f, audio_saved.size)
+    except Exception as e:
+        print(f"⚠️ 警告: 无法读取音频信息: {str(e)}")
+        return None
+
+async def _probe_staged_audio(audio_saved: SavedFile) -> Optional[AudioMetadata]:
+    """只读取文件头提取时长、码率等信息（对象存储中的文件按范围读取）"""
+    with STAGE_DURATION.time(stage="probe_audio"):
+        return await run_io(_probe_saved_audio, audio_saved)
+
+async def _process_staged_audio(audio_saved: SavedFile) -> Tuple[SavedFile, Optional[AudioMetadata]]:
+    """为可压缩的音频（WAV）生成预压缩变体，同时读取音频信息"""
+    return await asyncio.gather(add_precompressed(audio_saved), _probe_staged_audio(audio_saved))
+
+async def _discard_all(staged: List[SavedFile]):
+    for saved in staged:
+        await run_io(discard_staged, saved)
+
 @app.post("/api/episodes", response_model=EpisodeResponse)
 async def create_episode(
-    audio_file: UploadFile = File(..., description="音频文件 (mp3, wav, m4a)"),
-    image_file: UploadFile = File(..., description="封面图片 (jpg, png, jpeg)"),
+    audio_file: Optional[UploadFile] = File(None, description="音频文件 (mp3, wav, m4a)"),
+    image_file: Optional[UploadFile] = File(None, description="封面图片 (jpg, png, jpeg)"),
     title: str = Form(..., description="播客标题"),
-    description: str = Form(..., description="播客描述")
+    description: str = Form(..., description="播客描述"),
+    audio_sha256: Optional[str] = Form(None, description="已存储音频的 SHA-256，代替 audio_file"),
+    image_sha256: Optional[str] = Form(None, description="已存储封面的 SHA-256，代替 image_file")
 ):
     """
     创建新的播客集
@@ -64,61 +300,117 @@ async def create_episode(
     - image_file: 封面图片 (最大 10MB)
     - title: 播客标题
     - description: 播客描述
+    - audio_sha256 / image_sha256: 服务器上已有的内容（GET /api/blobs/{sha256} 查询）可以只提供哈希，不再上传文件
     """
     try:
-        # 验证音频文件
-        audio_valid, audio_error = validate_file(
-            audio_file,
-            allowed_types=["audio/mpeg", "audio/wav", "audio/mp4", "audio/x-m4a"],
-            max_size_mb=50
-        )
-        if not audio_valid:
-            raise HTTPException(status_code=400, detail=f"音频文件无效: {audio_error}")
+        audio_known = await _known_blob(audio_sha256, audio_file, "audio", "audio")
+        image_known = await _known_blob(image_sha256, image_file, "images", "image")
+        await _validate_episode_form(audio_file, image_file, title, description)
         
-        # 验证图片文件
-        image_valid, image_error = validate_file(
-            image_file,
-            allowed_types=["image/jpeg", "image/png", "image/jpg"],
-            max_size_mb=10
-        )
-        if not image_valid:
-            raise HTTPException(status_code=400, detail=f"图片文件无效: {image_error}")
-        
-        # 验证元数据
-        if not title or len(title.strip()) == 0:
-            raise HTTPException(status_code=400, detail="标题不能为空")
-        if not description or len(description.strip()) == 0:
-            raise HTTPException(status_code=400, detail="描述不能为空")
+        staged = []
+        try:
+            audio_saved, image_saved, audio_meta = await _stage_episode_files(
+                audio_file, image_file, staged, audio_known, image_known
+            )
+            
+            # 保存到数据库，同时登记引用并将文件放到内容寻址位置
+            created_at = datetime.now().isoformat()
+            episode = await catalog.create_episode(
+                title, description, audio_saved, image_saved, created_at, audio_meta
+            )
+        except BaseException:
+            await _discard_all(staged)
+            raise
         
-        # 保存音频文件
-        audio_path = await save_file(audio_file, "audio")
+        # 返回创建的播客信息
+        return episode
+    
+    except HTTPException:
+        raise
+    except FileTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except FileNotFoundError as e:
+        if audio_sha256 or image_sha256:
+            # 按哈希引用的内容在查询之后被删除
+            raise HTTPException(status_code=409, detail="引用的内容已被删除，请上传文件")
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+@app.post("/api/episodes/batch", response_model=BatchCreateResponse)
+async def create_episodes_batch(
+    audio_files: List[UploadFile] = File(..., description="音频文件，按顺序与其他字段一一对应"),
+    image_files: List[UploadFile] = File(..., description="封面图片"),
+    titles: List[str] = Form(..., description="播客标题"),
+    descriptions: List[str] = Form(..., description="播客描述")
+):
+    """
+    批量创建播客
+    
+    四个字段重复出现，按顺序组成条目，每个条目的校验规则与 POST /api/episodes 相同。
+    文件并发写入暂存区，所有记录在一个数据库事务中插入；
+    单个条目失败不影响其他条目，响应中逐条给出结果
+    """
+    try:
+        count = len(audio_files)
+        if not (len(image_files) == len(titles) == len(descriptions) == count):
+            raise HTTPException(status_code=400, detail="audio_files、image_files、titles 和 descriptions 的数量必须一致")
+        if count > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"每次最多创建 {BATCH_MAX_ITEMS} 个播客")
         
-        # 保存图片文件
-        image_path = await save_file(image_file, "images")
+        errors: Dict[int, str] = {}
+        for i in range(count):
+            try:
+                await _validate_episode_form(audio_files[i], image_files[i], titles[i], descriptions[i])
+            except HTTPException as e:
+                errors[i] = e.detail
         
-        # 保存到数据库
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        staged_by_item: List[List[SavedFile]] = [[] for _ in range(count)]
         
-        created_at = datetime.now().isoformat()
+        async def stage(i: int):
+            async with semaphore:
+                return await _stage_episode_files(audio_files[i], image_files[i], staged_by_item[i])
         
-        cursor.execute("""
-            INSERT INTO episodes (title, description, audio_path, image_path, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (title, description, audio_path, image_path, created_at))
+        pending = [i for i in range(count) if i not in errors]
+        created: Dict[int, EpisodeResponse] = {}
+        try:
+            outcomes = await asyncio.gather(*(stage(i) for i in pending), return_exceptions=True)
+            
+            # 整批使用同一个创建时间，按 id 保持请求中的顺序
+            created_at = datetime.now().isoformat()
+            indexes = []
+            episodes = []
+            for i, outcome in zip(pending, outcomes):
+                if isinstance(outcome, BaseException):
+                    await _discard_all(staged_by_item[i])
+                    errors[i] = f"保存文件失败: {outcome}"
+                    continue
+                audio_saved, image_saved, audio_meta = outcome
+                indexes.append(i)
+                episodes.append(repository.NewEpisode(
+                    titles[i], descriptions[i], audio_saved, image_saved, created_at, audio_meta
+                ))
+            
+            results = await catalog.create_episodes(episodes) if episodes else []
+        except BaseException:
+            for staged in staged_by_item:
+                await _discard_all(staged)
+            raise
         
-        episode_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        for i, result in zip(indexes, results):
+            if isinstance(result, Exception):
+                errors[i] = f"保存到数据库失败: {result}"
+            else:
+                created[i] = result
         
-        # 返回创建的播客信息
-        return EpisodeResponse(
-            id=episode_id,
-            title=title,
-            description=description,
-            audio_url=f"/storage/{audio_path}",
-            image_url=f"/storage/{image_path}",
-            created_at=created_at
+        return BatchCreateResponse(
+            created=len(created),
+            failed=len(errors),
+            items=[
+                BatchItemResult(index=i, episode=created.get(i), error=errors.get(i))
+                for i in range(count)
+            ]
         )
     
     except HTTPException:
@@ -126,79 +418,245 @@ async def create_episode(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
-@app.get("/api/episodes", response_model=List[EpisodeResponse])
-async def list_episodes():
+@app.get("/api/episodes", response_model=EpisodePage)
+async def list_episodes(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    include_total: bool = Query(False, description="是否返回播客总数")
+):
     """
-    获取所有播客列表
+    获取播客列表（游标分页）
     
-    返回所有播客的元数据，按创建时间倒序排列
+    按创建时间倒序返回一页播客；next_cursor 不为 null 时用它请求下一页。
+    响应带有由目录版本生成的 ETag，目录未变化时条件请求返回 304
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, description, audio_path, image_path, created_at
-            FROM episodes
-            ORDER BY created_at DESC
-        """)
-        
-        episodes = []
-        for row in cursor.fetchall():
-            episodes.append(EpisodeResponse(
-                id=row[0],
-                title=row[1],
-                description=row[2],
-                audio_url=f"/storage/{row[3]}",
-                image_url=f"/storage/{row[4]}",
-                created_at=row[5]
-            ))
+        # 先取版本再取数据：并发写入时内容只会比 ETag 新，不会让客户端错误地命中 304
+        version = await catalog.get_version()
+        headers = cache_headers(make_etag(version.tag), version.last_modified)
+        if is_not_modified(request, headers["ETag"], version.last_modified):
+            return not_modified_response(headers)
         
-        conn.close()
+        # 直接返回编码好的 JSON（结构与 EpisodePage 相同），不再按 response_model 校验和编码
+        body = await catalog.list_episodes_json(limit, cursor, include_total)
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+@app.api_route("/feed.xml", methods=["GET", "HEAD"], response_class=Response)
+async def get_feed(request: Request):
+    """
+    播客 RSS 订阅源（最新 FEED_MAX_ITEMS 集）
+    
+    目录未变化时直接返回缓存的 XML；支持 gzip 和 If-None-Match / If-Modified-Since 条件请求
+    """
+    try:
+        version = await catalog.get_version()
+        base_url = feed.PUBLIC_BASE_URL or str(request.base_url).rstrip("/")
+        rendered = await feed.get_feed_cache(base_url).get(version.tag, version.last_modified)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+    
+    gzipped = accepts_encoding(request, "gzip")
+    headers = cache_headers(
+        rendered.gzip_etag if gzipped else rendered.etag,
+        rendered.last_modified,
+        f"public, max-age={FEED_MAX_AGE}"
+    )
+    headers["Vary"] = "Accept-Encoding"
+    if is_not_modified(request, headers["ETag"], rendered.last_modified):
+        return not_modified_response(headers)
+    
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return Response(
+        content=rendered.gzipped if gzipped else rendered.xml,
+        media_type="application/rss+xml; charset=utf-8",
+        headers=headers
+    )
+
+@app.get("/api/episodes/search", response_model=EpisodeSearchPage)
+async def search_episodes(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="搜索词，多个词用空格分隔"),
+    limit: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor")
+):
+    """
+    全文搜索播客标题和描述
+    
+    结果按 BM25 相关度排序（标题匹配权重更高），附带高亮标题和描述摘要。
+    每个搜索词至少 3 个字符；多个词之间为 AND
+    """
+    try:
+        # 与列表接口相同：先取目录版本，ETag 同时包含查询参数
+        version = await catalog.get_version()
+        etag = content_etag(f"{version.tag}|{q}|{limit}|{cursor or ''}".encode())
+        headers = cache_headers(etag, version.last_modified)
+        if is_not_modified(request, headers["ETag"], version.last_modified):
+            return not_modified_response(headers)
         
-        return episodes
+        rows, next_cursor = await repository.search_episodes(q, limit, cursor)
+        response.headers.update(headers)
+        return EpisodeSearchPage(
+            items=[search_hit_from_row(row) for row in rows],
+            next_cursor=next_cursor
+        )
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
 @app.get("/api/episodes/{episode_id}", response_model=EpisodeResponse)
-async def get_episode(episode_id: int):
+async def get_episode(episode_id: int, request: Request):
     """
     获取单个播客详情
     
     参数:
     - episode_id: 播客 ID
+    
+    支持 If-None-Match / If-Modified-Since 条件请求
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, description, audio_path, image_path, created_at
-            FROM episodes
-            WHERE id = ?
-        """, (episode_id,))
+        found = await catalog.get_episode_json(episode_id)
         
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
+        if not found:
             raise HTTPException(status_code=404, detail="播客未找到")
+        episode, body = found
         
-        return EpisodeResponse(
-            id=row[0],
-            title=row[1],
-            description=row[2],
-            audio_url=f"/storage/{row[3]}",
-            image_url=f"/storage/{row[4]}",
-            created_at=row[5]
-        )
+        try:
+            last_modified = datetime.fromisoformat(episode.created_at).astimezone(timezone.utc)
+        except ValueError:
+            last_modified = None
+        headers = cache_headers(content_etag(body), last_modified)
+        if is_not_modified(request, headers["ETag"], last_modified):
+            return not_modified_response(headers)
+        
+        return Response(content=body, media_type="application/json", headers=headers)
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
+@app.api_route("/api/episodes/{episode_id}/audio", methods=["GET", "HEAD"])
+async def get_episode_audio(episode_id: int, request: Request):
+    """
+    播放/下载播客音频
+    
+    支持单段 Range 和 If-Range（多段范围返回 416），
+    Content-Length 和 ETag 来自上传时记录的大小和 SHA-256。
+    
+    参数:
+    - episode_id: 播客 ID
+    """
+    row = await repository.get_audio(episode_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="播客未找到")
+    
+    if uses_object_storage() and get_media_cache() is None:
+        # 缓存关闭：对象存储自身支持 Range，客户端直接从存储下载
+        url = await run_io(s3.get_store().presigned_get_url, row["audio_path"], MEDIA_URL_EXPIRY)
+        return RedirectResponse(url, status_code=307)
+    
+    release = None
+    try:
+        # 对象存储中的音频先经过本地读穿缓存（租用到响应发送完），之后与本地存储一样发送
+        if uses_object_storage():
+            path, release = await lease_media_file(row["audio_path"])
+        else:
+            path = local_media_path(row["audio_path"])
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="音频文件不存在")
+    
+    try:
+        response = await _audio_response(request, row, path)
+    except BaseException:
+        if release is not None:
+            release()
+        raise
+    if release is not None:
+        if isinstance(response, FileRangeResponse):
+            response.on_close = release
+        else:
+            release()
+    return response
+
+async def _audio_response(request: Request, row, path: str) -> Response:
+    """按条件请求和 Range 构造音频响应（path 为可以直接读取的本地文件）"""
+    size = row["audio_size"]
+    etag = make_etag(row["audio_sha256"]) if row["audio_sha256"] else None
+    if size is None or etag is None:
+        # 旧数据没有记录大小和校验和，退回到文件属性
+        try:
+            stat = await run_io(os.stat, path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="音频文件不存在")
+        size = stat.st_size
+        etag = make_etag(f"{stat.st_mtime_ns:x}-{size:x}")
+    
+    try:
+        last_modified = datetime.fromisoformat(row["created_at"]).astimezone(timezone.utc)
+    except ValueError:
+        last_modified = None
+    headers = cache_headers(etag, last_modified, cache_control="public, max-age=86400")
+    headers["Accept-Ranges"] = "bytes"
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
+    
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    
+    byte_range = None
+    if if_range_matches(request.headers.get("if-range"), etag, headers.get("Last-Modified")):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"})
+    
+    if not await run_io(os.path.exists, path):
+        raise HTTPException(status_code=404, detail="音频文件不存在")
+    
+    if byte_range is None:
+        # 完整请求：有预压缩变体（例如 WAV）时按 Accept-Encoding 直接发送变体；范围请求始终针对原文件
+        if not uses_object_storage():
+            codec = await run_io(select_precompressed, path, request.headers.get("accept-encoding"))
+            if codec is not None:
+                variant = path + codec.suffix
+                try:
+                    variant_size = await run_io(os.path.getsize, variant)
+                except FileNotFoundError:
+                    variant_size = None
+                if variant_size is not None:
+                    headers.update({"Content-Encoding": codec.name, "Vary": "Accept-Encoding", "ETag": f"W/{etag}"})
+                    return FileRangeResponse(variant, 0, variant_size, 200, headers, media_type)
+        return FileRangeResponse(path, 0, size, 200, headers, media_type)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end - start + 1, 206, headers, media_type)
+
+@app.api_route("/api/blobs/{sha256}", methods=["GET", "HEAD"], response_model=BlobInfo)
+async def get_blob(sha256: str):
+    """
+    查询服务器是否已存储某个内容
+    
+    客户端可以在上传前计算文件的 SHA-256 并查询，已存在时创建播客只需提供
+    audio_sha256 / image_sha256，不必重复上传大文件。
+    
+    参数:
+    - sha256: 文件内容的 SHA-256（十六进制）
+    """
+    row = await repository.get_blob(sha256.lower())
+    if not row:
+        raise HTTPException(status_code=404, detail="内容不存在")
+    return BlobInfo(sha256=row["sha256"], size=row["size"])
+
 @app.delete("/api/episodes/{episode_id}")
 async def delete_episode(episode_id: int):
     """
@@ -208,34 +666,14 @@ async def delete_episode(episode_id: int):
     - episode_id: 播客 ID
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 获取文件路径
-        cursor.execute("""
-            SELECT audio_path, image_path
-            FROM episodes
-            WHERE id = ?
-        """, (episode_id,))
-        
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
+        # 从数据库删除，获取不再被引用的文件
+        files = await catalog.delete_episode(episode_id)
+        if files is None:
             raise HTTPException(status_code=404, detail="播客未找到")
         
-        audio_path, image_path = row
-        
-        # 从数据库删除
-        cursor.execute("DELETE FROM episodes WHERE id = ?", (episode_id,))
-        conn.commit()
-        conn.close()
-        
-        # 删除文件
+        # 删除文件（仍被其他播客引用的文件会保留）
         try:
-            if os.path.exists(f"./storage/{audio_path}"):
-                os.remove(f"./storage/{audio_path}")
-            if os.path.exists(f"./storage/{image_path}"):
-                os.remove(f"./storage/{image_path}")
+            await repository.remove_files(files)
         except Exception as e:
             print(f"⚠️ 警告: 无法删除文件: {str(e)}")
         
@@ -246,6 +684,261 @@ async def delete_episode(episode_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
+# ==================== 断点续传 ====================
+# 创建会话 → PATCH 逐块上传音频 → 中断后 HEAD 查询已接收的字节数并从断点继续 → finalize 创建播客
+
+def _upload_session(upload: UploadInfo, response: Response) -> UploadSession:
+    """生成会话响应，并设置 Upload-Offset / Upload-Length 响应头"""
+    response.headers["Upload-Offset"] = str(upload.offset)
+    response.headers["Upload-Length"] = str(upload.size)
+    response.headers["Cache-Control"] = "no-store"
+    return UploadSession(
+        id=upload.id,
+        size=upload.size,
+        offset=upload.offset,
+        expires_at=datetime.fromtimestamp(upload.updated_at + UPLOAD_EXPIRY_SECONDS, timezone.utc).isoformat()
+    )
+
+@app.post("/api/uploads", response_model=UploadSession, status_code=201)
+async def create_upload_session(body: UploadCreateRequest, response: Response):
+    """
+    创建音频的断点续传会话
+    
+    返回的 Location 为会话地址，之后用 PATCH 上传数据
+    """
+    if body.size > AUDIO_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"文件大小超过限制 ({AUDIO_MAX_MB}MB)")
+    
+    try:
+        upload = await create_upload(body.filename, body.size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+    
+    response.headers["Location"] = f"/api/uploads/{upload.id}"
+    return _upload_session(upload, response)
+
+@app.api_route("/api/uploads/{upload_id}", methods=["GET", "HEAD"], response_model=UploadSession)
+async def get_upload_session(upload_id: str, response: Response):
+    """
+    查询上传进度
+    
+    Upload-Offset 响应头为已接收的字节数，续传时从这里开始
+    """
+    upload = await get_upload(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return _upload_session(upload, response)
+
+@app.patch("/api/uploads/{upload_id}", response_model=UploadSession)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., ge=0, description="这段数据的起始位置，必须等于已接收的字节数")
+):
+    """
+    上传一段音频数据
+    
+    请求体为原始字节，边接收边写入磁盘；连接中断时已收到的部分会保留。
+    起始位置不匹配时返回 409，Upload-Offset 响应头给出正确的位置
+    """
+    try:
+        upload = await get_upload(upload_id)
+        if upload is None:
+            raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+        
+        # 声明的长度已超出文件大小：不读取请求体直接拒绝
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and upload_offset + int(content_length) > upload.size:
+            raise HTTPException(status_code=413, detail=f"数据超过声明的文件大小 ({upload.size} 字节)")
+        
+        upload = await append_upload(upload_id, upload_offset, request.stream())
+        return _upload_session(upload, response)
+    
+    except HTTPException:
+        raise
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+@app.post("/api/uploads/{upload_id}/finalize", response_model=EpisodeResponse)
+async def finalize_upload(
+    upload_id: str,
+    image_file: UploadFile = File(..., description="封面图片 (jpg, png, jpeg)"),
+    title: str = Form(..., description="播客标题"),
+    description: str = Form(..., description="播客描述")
+):
+    """
+    完成断点续传并创建播客
+    
+    音频必须已全部上传；其余字段与 POST /api/episodes 相同。
+    校验失败时会话保留，修正后可以再次提交
+    """
+    try:
+        upload = await get_upload(upload_id)
+        if upload is None:
+            raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+        if upload.offset != upload.size:
+            raise HTTPException(status_code=409, detail=f"音频尚未上传完整 ({upload.offset}/{upload.size} 字节)")
+        
+        media_type = sniff_media_type(await read_upload_head(upload_id, SNIFF_BYTES))
+        if media_type not in AUDIO_TYPES:
+            raise HTTPException(status_code=400, detail="音频文件无效: 无法识别的文件类型")
+        await _validate_episode_form(None, image_file, title, description)
+        
+        staged = []
+        try:
+            # 数据文件直接作为暂存文件，入库时重命名到最终位置
+            audio_saved = await finish_upload(upload_id, "audio")
+            staged.append(audio_saved)
+            
+            image_saved = await _stage_cover(image_file, staged)
+            audio_saved, audio_meta = await _process_staged_audio(audio_saved)
+            staged[0] = audio_saved
+            
+            created_at = datetime.now().isoformat()
+            episode = await catalog.create_episode(
+                title, description, audio_saved, image_saved, created_at, audio_meta
+            )
+        except BaseException:
+            await _discard_all(staged)
+            raise
+        
+        return episode
+    
+    except HTTPException:
+        raise
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except FileTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """
+    取消上传并删除已接收的数据
+    """
+    if not await abort_upload(upload_id):
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return {"message": "上传已取消", "id": upload_id}
+
+# ==================== 直传 ====================
+# 创建会话（声明大小和 SHA-256）→ 客户端直接 PUT 到返回的地址 → finalize 核对文件并创建播客
+# 使用 S3 时地址为预签名地址，文件数据不经过 API 进程
+
+@app.post("/api/episodes/uploads", response_model=DirectUploadSession, status_code=201)
+async def create_direct_upload_session(body: DirectUploadCreateRequest):
+    """
+    创建直传会话，返回音频和封面的上传地址
+    
+    客户端用 PUT 把文件原始字节发送到各自的地址（带上返回的 headers），
+    然后调用 POST /api/episodes/uploads/{id}/finalize
+    """
+    if body.audio.size > AUDIO_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"音频文件大小超过限制 ({AUDIO_MAX_MB}MB)")
+    if body.image.size > IMAGE_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"图片文件大小超过限制 ({IMAGE_MAX_MB}MB)")
+    
+    try:
+        upload, targets = await create_direct_upload([
+            DirectUploadFile("audio", body.audio.filename, body.audio.size, body.audio.sha256),
+            DirectUploadFile("image", body.image.filename, body.image.size, body.image.sha256)
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+    
+    return DirectUploadSession(
+        id=upload.id,
+        audio=UploadTarget(url=targets["audio"].url, headers=targets["audio"].headers),
+        image=UploadTarget(url=targets["image"].url, headers=targets["image"].headers),
+        expires_at=datetime.fromtimestamp(upload.expires_at, timezone.utc).isoformat()
+    )
+
+@app.put("/api/storage/uploads/{upload_id}/{slot}", status_code=204)
+async def put_direct_upload(upload_id: str, slot: str, request: Request, expires: int = Query(...), signature: str = Query(...)):
+    """
+    本地存储的直传地址（使用 S3 时客户端直接上传到存储桶，不会访问这里）
+    
+    请求体为文件原始字节，大小和 SHA-256 必须与创建会话时声明的一致
+    """
+    if uses_object_storage():
+        raise HTTPException(status_code=404, detail="上传地址不存在")
+    try:
+        await receive_direct_upload(upload_id, slot, expires, signature, request.stream())
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except UploadVerificationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+    return Response(status_code=204)
+
+@app.post("/api/episodes/uploads/{upload_id}/finalize", response_model=EpisodeResponse)
+async def finalize_direct_upload(upload_id: str, body: DirectUploadFinalizeRequest):
+    """
+    完成直传并创建播客
+    
+    核对两个文件的大小、SHA-256 和文件头类型；校验失败时会话保留，重新上传后可以再次提交
+    """
+    _validate_metadata(body.title, body.description)
+    try:
+        async with await direct_upload_lock(upload_id):
+            verified = await verify_direct_upload(upload_id, {"audio": "audio", "image": "images"})
+            (audio_saved, audio_head), (image_saved, image_head) = verified["audio"], verified["image"]
+            if sniff_media_type(audio_head) not in AUDIO_TYPES:
+                raise HTTPException(status_code=400, detail="音频文件无效: 无法识别的文件类型")
+            if sniff_media_type(image_head) not in IMAGE_TYPES:
+                raise HTTPException(status_code=400, detail="图片文件无效: 无法识别的文件类型")
+            
+            # 数据直接作为暂存文件，入库时放到最终位置
+            await close_direct_upload(upload_id)
+            staged = [audio_saved, image_saved]
+            try:
+                image_saved, (audio_saved, audio_meta) = await asyncio.gather(
+                    add_cover_variants(image_saved),
+                    _process_staged_audio(audio_saved)
+                )
+                staged[:] = [audio_saved, image_saved]
+                
+                created_at = datetime.now().isoformat()
+                episode = await catalog.create_episode(
+                    body.title, body.description, audio_saved, image_saved, created_at, audio_meta
+                )
+            except BaseException:
+                await _discard_all(staged)
+                raise
+        
+        return episode
+    
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except UploadVerificationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+@app.delete("/api/episodes/uploads/{upload_id}")
+async def abort_direct_upload_session(upload_id: str):
+    """
+    取消直传并删除已上传的数据
+    """
+    if not await abort_direct_upload(upload_id):
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return {"message": "上传已取消", "id": upload_id}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,10 +1,23 @@
 """
 Pydantic 模型 - 数据验证和序列化
 """
+import html
+import json
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+try:
+    import orjson  # 可选：安装后 JSON 编码更快
+except ImportError:
+    orjson = None
+
+class ImageVariant(BaseModel):
+    """封面缩略图"""
+    width: int = Field(..., description="宽度（像素）")
+    format: str = Field(..., description="图片格式 (webp, jpeg, png)")
+    url: str = Field(..., description="图片 URL")
+
 class EpisodeResponse(BaseModel):
     """播客响应模型"""
     id: int = Field(..., description="播客 ID")
@@ -12,7 +25,12 @@ class EpisodeResponse(BaseModel):
     description: str = Field(..., description="播客描述")
     audio_url: str = Field(..., description="音频文件 URL")
     image_url: str = Field(..., description="封面图片 URL")
+    image_variants: List[ImageVariant] = Field(default_factory=list, description="封面缩略图（不同宽度和格式）")
     created_at: str = Field(..., description="创建时间 (ISO 格式)")
+    duration_seconds: Optional[float] = Field(None, description="音频时长（秒），无法解析时为空")
+    bitrate_kbps: Optional[int] = Field(None, description="平均码率 (kbps)")
+    sample_rate: Optional[int] = Field(None, description="采样率 (Hz)")
+    channels: Optional[int] = Field(None, description="声道数")
     
     class Config:
         json_schema_extra = {
@@ -20,9 +38,235 @@ class EpisodeResponse(BaseModel):
                 "id": 1,
                 "title": "第一集：欢迎来到我的播客",
                 "description": "这是第一集的介绍...",
-                "audio_url": "/storage/audio/episode_1.mp3",
+                "audio_url": "/api/episodes/1/audio",
                 "image_url": "/storage/images/cover_1.jpg",
-                "created_at": "2024-01-01T12:00:00"
+                "image_variants": [
+                    {"width": 320, "format": "webp", "url": "/storage/images/cover_1_w320.webp"}
+                ],
+                "created_at": "2024-01-01T12:00:00",
+                "duration_seconds": 1834.5,
+                "bitrate_kbps": 128,
+                "sample_rate": 44100,
+                "channels": 2
+            }
+        }
+
+def episode_fields(row) -> Dict[str, Any]:
+    """数据库记录对应的 EpisodeResponse 字段（按模型字段顺序）"""
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "description": row["description"],
+        "audio_url": f"/api/episodes/{row['id']}/audio",
+        "image_url": f"/storage/{row['image_path']}",
+        "image_variants": [
+            {"width": variant["width"], "format": variant["format"], "url": f"/storage/{variant['path']}"}
+            for variant in json.loads(row["image_variants"] or "[]")
+        ],
+        "created_at": row["created_at"],
+        "duration_seconds": row["duration_seconds"],
+        "bitrate_kbps": row["bitrate_kbps"],
+        "sample_rate": row["sample_rate"],
+        "channels": row["channels"]
+    }
+
+def episode_from_row(row) -> EpisodeResponse:
+    """将数据库记录转换为响应模型"""
+    return EpisodeResponse(**episode_fields(row))
+
+# ==================== JSON 快速路径 ====================
+# 列表和详情接口直接返回编码好的 JSON 字节，跳过逐行构建模型、FastAPI 按 response_model 的再次校验
+# 以及标准库编码器；输出与模型序列化的结果相同，OpenAPI 仍按路由的 response_model 生成
+
+def dumps(value: Any) -> bytes:
+    """紧凑的 UTF-8 JSON（非 ASCII 字符不转义，与 Pydantic 的输出一致）"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+def encode_episode(episode: EpisodeResponse) -> bytes:
+    """播客的 JSON 编码"""
+    return episode.model_dump_json().encode()
+
+def episode_json_from_row(row) -> bytes:
+    """直接将数据库记录编码为 EpisodeResponse 的 JSON，不构建模型"""
+    return dumps(episode_fields(row))
+
+def episode_page_json(items: List[bytes], next_cursor: Optional[str], total: Optional[int]) -> bytes:
+    """由编码好的各播客拼接 EpisodePage 的 JSON"""
+    return b"".join((
+        b'{"items":[', b",".join(items),
+        b'],"next_cursor":', dumps(next_cursor),
+        b',"total":', dumps(total), b"}"
+    ))
+
+class EpisodeSearchHit(EpisodeResponse):
+    """搜索结果"""
+    score: float = Field(..., description="BM25 相关度，越小越相关")
+    title_highlight: str = Field(..., description="标题（已 HTML 转义），匹配处用 <mark> 标出")
+    snippet: str = Field(..., description="描述中的匹配片段（已 HTML 转义），匹配处用 <mark> 标出")
+
+def _mark(text: str) -> str:
+    """转义 HTML，并把 FTS5 高亮标记替换为 <mark>"""
+    return html.escape(text).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+def search_hit_from_row(row) -> EpisodeSearchHit:
+    """将搜索结果记录转换为响应模型"""
+    episode = episode_from_row(row)
+    return EpisodeSearchHit(
+        **episode.model_dump(),
+        score=row["score"],
+        title_highlight=_mark(row["title_highlight"] or ""),
+        snippet=_mark(row["snippet"] or "")
+    )
+
+class EpisodeSearchPage(BaseModel):
+    """搜索分页响应模型"""
+    items: List[EpisodeSearchHit] = Field(..., description="当前页的搜索结果，按相关度排序")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有更多数据时为 null")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [],
+                "next_cursor": "Wy0zLjIxLDE3XQ"
+            }
+        }
+
+class EpisodePage(BaseModel):
+    """播客分页响应模型"""
+    items: List[EpisodeResponse] = Field(..., description="当前页的播客")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有更多数据时为 null")
+    total: Optional[int] = Field(None, description="播客总数（仅在 include_total=true 时返回）")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [],
+                "next_cursor": "WyIyMDI0LTAxLTAxVDEyOjAwOjAwIiwgMV0",
+                "total": 42
+            }
+        }
+
+class BatchItemResult(BaseModel):
+    """批量创建中单个条目的结果"""
+    index: int = Field(..., description="条目在请求中的序号（从 0 开始）")
+    episode: Optional[EpisodeResponse] = Field(None, description="创建成功时的播客")
+    error: Optional[str] = Field(None, description="失败原因，成功时为 null")
+
+class BatchCreateResponse(BaseModel):
+    """批量创建响应模型"""
+    created: int = Field(..., description="成功创建的条目数")
+    failed: int = Field(..., description="失败的条目数")
+    items: List[BatchItemResult] = Field(..., description="各条目的结果，按请求顺序排列")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "created": 1,
+                "failed": 1,
+                "items": [
+                    {"index": 0, "episode": {"id": 7, "title": "第七集", "...": "..."}, "error": None},
+                    {"index": 1, "episode": None, "error": "音频文件无效: 无法识别的文件类型"}
+                ]
+            }
+        }
+
+class UploadCreateRequest(BaseModel):
+    """创建断点续传会话的请求"""
+    filename: str = Field(..., min_length=1, max_length=255, description="音频文件名（用于确定扩展名）")
+    size: int = Field(..., gt=0, description="文件总大小（字节）")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "filename": "episode-42.mp3",
+                "size": 47185920
+            }
+        }
+
+class UploadSession(BaseModel):
+    """断点续传会话"""
+    id: str = Field(..., description="会话 ID")
+    size: int = Field(..., description="文件总大小（字节）")
+    offset: int = Field(..., description="已接收的字节数，下一块从这里开始")
+    expires_at: str = Field(..., description="无新数据写入时会话的过期时间 (ISO 格式)")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "3f2b9c0e4d5a4e6f8a1b2c3d4e5f6a7b",
+                "size": 47185920,
+                "offset": 20971520,
+                "expires_at": "2024-01-02T12:00:00+00:00"
+            }
+        }
+
+class DirectUploadFileRequest(BaseModel):
+    """直传的一个文件"""
+    filename: str = Field(..., min_length=1, max_length=255, description="文件名（用于确定扩展名）")
+    size: int = Field(..., gt=0, description="文件大小（字节）")
+    sha256: str = Field(..., pattern=r"^[0-9a-fA-F]{64}$", description="文件内容的 SHA-256（十六进制）")
+
+class DirectUploadCreateRequest(BaseModel):
+    """创建直传会话的请求"""
+    audio: DirectUploadFileRequest = Field(..., description="音频文件")
+    image: DirectUploadFileRequest = Field(..., description="封面图片")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "audio": {
+                    "filename": "episode-42.mp3",
+                    "size": 47185920,
+                    "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+                },
+                "image": {
+                    "filename": "cover.jpg",
+                    "size": 524288,
+                    "sha256": "60303ae22b998861bce3b28f33eec1be758a213c86c93c076dbe9f558c11c752"
+                }
+            }
+        }
+
+class UploadTarget(BaseModel):
+    """一个文件的上传地址"""
+    url: str = Field(..., description="上传地址；以 / 开头时相对于 API")
+    method: str = Field("PUT", description="HTTP 方法，请求体为文件的原始字节")
+    headers: Dict[str, str] = Field(default_factory=dict, description="上传时必须带上的请求头")
+
+class DirectUploadSession(BaseModel):
+    """直传会话"""
+    id: str = Field(..., description="会话 ID")
+    audio: UploadTarget = Field(..., description="音频的上传地址")
+    image: UploadTarget = Field(..., description="封面的上传地址")
+    expires_at: str = Field(..., description="上传地址的过期时间 (ISO 格式)")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "3f2b9c0e4d5a4e6f8a1b2c3d4e5f6a7b",
+                "audio": {"url": "/api/storage/uploads/3f2b.../audio?expires=1704200400&signature=...", "method": "PUT", "headers": {}},
+                "image": {"url": "/api/storage/uploads/3f2b.../image?expires=1704200400&signature=...", "method": "PUT", "headers": {}},
+                "expires_at": "2024-01-02T13:00:00+00:00"
+            }
+        }
+
+class DirectUploadFinalizeRequest(BaseModel):
+    """完成直传的请求"""
+    title: str = Field(..., description="播客标题")
+    description: str = Field(..., description="播客描述")
+
+class BlobInfo(BaseModel):
+    """已存储内容的信息"""
+    sha256: str = Field(..., description="内容的 SHA-256")
+    size: int = Field(..., description="文件大小（字节）")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "size": 1048576
             }
         }
 
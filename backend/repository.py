@@ -0,0 +1,761 @@
+"""
+异步数据访问层
+
+接口均为 async，内部的 SQLite 操作在 I/O 线程池中执行。
+同名的 *_row / select_* 同步函数接收一个已有连接，供需要自行管理连接的调用方使用。
+"""
+import base64
+import json
+import math
+import os
+import sqlite3
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from backend.audio_meta import AudioMetadata
+from backend.db import db_connection
+from backend.executor import run_io
+from backend.metrics import DB_QUERY_DURATION
+from backend.storage import (
+    Derivative, SavedFile, place_blob, upload_blob, present_derivatives, discard_staged, detach_blob, restore_blob,
+    remove_stored, remove_stored_objects, uses_object_storage
+)
+
+EPISODE_COLUMNS = (
+    "id, title, description, audio_path, image_path, created_at, image_variants, "
+    "duration_seconds, bitrate_kbps, sample_rate, channels"
+)
+
+SEARCH_MIN_TERM_LENGTH = 3  # trigram 分词器的最短可匹配长度
+SEARCH_HIGHLIGHT_START = "\x02"  # 高亮标记，由 models 转义后替换为 <mark>
+SEARCH_HIGHLIGHT_END = "\x03"
+
+def encode_cursor(*values: Any) -> str:
+    """
+    将排序键编码为不透明的分页游标
+    
+    参数:
+        *values: 上一页最后一条记录的排序键
+    
+    返回:
+        URL 安全的游标字符串
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    解码分页游标
+    
+    参数:
+        cursor: encode_cursor 生成的游标
+    
+    返回:
+        排序键列表
+    
+    异常:
+        ValueError: 游标格式无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list):
+        raise ValueError("无效的分页游标")
+    return values
+
+def _is_row_id(value: Any) -> bool:
+    # 游标来自客户端：布尔值不是 ID，超出 SQLite 64 位整数范围的值无法绑定到查询
+    return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    解码搜索结果游标
+    
+    返回:
+        (score, id)
+    
+    异常:
+        ValueError: 游标格式无效
+    """
+    after = decode_cursor(cursor)
+    if len(after) != 2 or isinstance(after[0], bool) or not isinstance(after[0], (int, float)) or not _is_row_id(after[1]):
+        raise ValueError("无效的分页游标")
+    try:
+        score = float(after[0])
+    except OverflowError:
+        raise ValueError("无效的分页游标")
+    if not math.isfinite(score):
+        raise ValueError("无效的分页游标")
+    return score, after[1]
+
+def build_match_query(query: str) -> str:
+    """
+    将用户输入的搜索词转换为 FTS5 MATCH 表达式
+    
+    按空白拆分，每个词作为短语加引号（FTS5 运算符和特殊字符因此不生效），词之间为 AND。
+    
+    参数:
+        query: 用户输入
+    
+    返回:
+        MATCH 表达式
+    
+    异常:
+        ValueError: 没有搜索词，或有词短于 3 个字符（trigram 索引无法匹配）
+    """
+    terms = query.split()
+    if not terms:
+        raise ValueError("搜索词不能为空")
+    if any(len(term) < SEARCH_MIN_TERM_LENGTH for term in terms):
+        raise ValueError(f"每个搜索词至少需要 {SEARCH_MIN_TERM_LENGTH} 个字符")
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def decode_episode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    解码播客列表游标
+    
+    返回:
+        (created_at, id)
+    
+    异常:
+        ValueError: 游标格式无效
+    """
+    after = decode_cursor(cursor)
+    if len(after) != 2 or not isinstance(after[0], str) or not _is_row_id(after[1]):
+        raise ValueError("无效的分页游标")
+    return after[0], after[1]
+
+# ==================== 同步操作（调用方提供连接） ====================
+
+def acquire_blob(conn: sqlite3.Connection, saved: SavedFile) -> str:
+    """
+    登记一次对文件内容的引用（需在写事务中调用）
+    
+    返回:
+        该内容的存储路径；内容已存在时返回已有路径
+    
+    异常:
+        FileNotFoundError: saved 没有暂存文件（按哈希引用已存储的内容），而该内容已被删除
+    """
+    row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (saved.sha256,)).fetchone()
+    if row:
+        conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = ?", (saved.sha256,))
+        return row["path"]
+    if saved.staged_path is None and saved.staged_key is None:
+        raise FileNotFoundError(f"内容已被删除: {saved.sha256}")
+    
+    conn.execute("""
+        INSERT INTO blobs (sha256, path, size, refcount)
+        VALUES (?, ?, ?, 1)
+    """, (saved.sha256, saved.path, saved.size))
+    return saved.path
+
+def release_blob(conn: sqlite3.Connection, path: str) -> bool:
+    """
+    释放一次对文件的引用（需在写事务中调用）
+    
+    返回:
+        是否应该删除该文件（最后一个引用，或是未登记的旧文件）
+    """
+    row = conn.execute("SELECT refcount FROM blobs WHERE path = ?", (path,)).fetchone()
+    if not row:
+        return True
+    if row["refcount"] <= 1:
+        conn.execute("DELETE FROM blobs WHERE path = ?", (path,))
+        return True
+    conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE path = ?", (path,))
+    return False
+
+class NewEpisode(NamedTuple):
+    """待插入的播客"""
+    title: str
+    description: str
+    audio: SavedFile
+    image: SavedFile
+    created_at: str
+    audio_meta: Optional[AudioMetadata] = None  # 音频文件头中解析出的信息，无法解析时相应列为 NULL
+
+def _insert_in_transaction(
+    conn: sqlite3.Connection,
+    episode: NewEpisode,
+    placed: List[str],
+    derivatives: Optional[List[Derivative]] = None
+) -> Dict[str, Any]:
+    """
+    在已开启的写事务中登记引用并插入记录
+    
+    本地存储同时把暂存文件改名到最终位置，新放置的文件追加到 placed；
+    对象存储的文件已由 _upload_episode_files 写好，derivatives 为已就位的封面缩略图，事务内不发出网络请求。
+    """
+    audio_meta = episode.audio_meta or AudioMetadata(None, None, None, None)
+    audio_path = acquire_blob(conn, episode.audio)
+    image_path = acquire_blob(conn, episode.image)
+    if derivatives is None:
+        for saved, path in ((episode.audio, audio_path), (episode.image, image_path)):
+            placed.extend(place_blob(saved, path))
+        derivatives = present_derivatives(episode.image)
+    
+    image_variants = json.dumps([
+        {"width": d.width, "format": d.format, "path": d.path}
+        for d in derivatives
+    ])
+    cursor = conn.execute("""
+        INSERT INTO episodes (
+            title, description, audio_path, image_path, created_at, audio_size, audio_sha256, image_variants,
+            duration_seconds, bitrate_kbps, sample_rate, channels
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        episode.title, episode.description, audio_path, image_path, episode.created_at,
+        episode.audio.size, episode.audio.sha256, image_variants, *audio_meta
+    ))
+    
+    return {
+        "id": cursor.lastrowid,
+        "title": episode.title,
+        "description": episode.description,
+        "audio_path": audio_path,
+        "image_path": image_path,
+        "created_at": episode.created_at,
+        "audio_size": episode.audio.size,
+        "audio_sha256": episode.audio.sha256,
+        "image_variants": image_variants,
+        **audio_meta._asdict()
+    }
+
+def _discard_episode_files(episode: NewEpisode, placed: List[str]):
+    """插入失败后删除新放置的文件和剩余的暂存文件"""
+    for path in placed:
+        _remove_stored(path)
+    discard_staged(episode.audio)
+    discard_staged(episode.image)
+
+# ==================== 对象存储的文件放置 ====================
+# 复制和上传都在写事务之外：事务开始前把文件写到最终键，事务内只登记引用和插入记录。
+# 对象的删除（删除播客、清理插入失败留下的对象）在写锁内确认没有 blob 引用后才执行，
+# 插入提交后再检查一遍自己的对象，补齐在“写好”和“提交”之间被并发删除的部分。
+# 删除要么发生在插入提交之前（会被补齐），要么能看到插入登记的引用（不会删除）。
+
+class _Upload(NamedTuple):
+    """写事务开始前已写到最终键的文件"""
+    keys: List[str]  # 本次新写入的对象键，插入失败时删除其中没有被引用的
+    derivatives: List[Derivative]  # 已就位的封面缩略图
+
+def _is_referenced(conn: sqlite3.Connection, path: str) -> bool:
+    """对象是否属于已登记的 blob（原文件、预压缩变体或封面缩略图）"""
+    name = os.path.basename(path)
+    sha256 = name[:64]
+    row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+    if row is None:
+        return False
+    return path == row["path"] or path.startswith(row["path"] + ".") or name.startswith(f"{sha256}_w")
+
+def _purge_unreferenced(conn: sqlite3.Connection, paths: List[str]):
+    """在写锁内删除没有被任何 blob 引用的对象；全部仍被引用时不发出请求"""
+    if not paths:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        orphans = [path for path in paths if not _is_referenced(conn, path)]
+        if orphans:
+            remove_stored_objects(orphans)
+    finally:
+        conn.rollback()
+
+def _discard_uploaded(conn: sqlite3.Connection, episode: NewEpisode, keys: List[str]):
+    """插入失败后删除没有被引用的新对象和暂存文件"""
+    try:
+        _purge_unreferenced(conn, keys)
+        discard_staged(episode.audio)
+        discard_staged(episode.image)
+    except Exception as e:
+        print(f"⚠️ 警告: 无法清理上传的文件: {str(e)}")
+
+def _upload_episode_files(conn: sqlite3.Connection, episode: NewEpisode) -> _Upload:
+    """在写事务之外把音频、图片及其衍生文件写到最终键（内容已登记时写到已有路径）"""
+    keys = []
+    try:
+        for saved in (episode.audio, episode.image):
+            row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (saved.sha256,)).fetchone()
+            keys.extend(upload_blob(saved, row["path"] if row else saved.path))
+        derivatives = present_derivatives(episode.image)
+    except BaseException:
+        _discard_uploaded(conn, episode, keys)
+        raise
+    return _Upload(keys, derivatives)
+
+def _settle_uploaded(conn: sqlite3.Connection, episode: NewEpisode, row: Dict[str, Any], keys: List[str]):
+    """提交后补齐被并发删除的对象，再删除暂存文件和没有用上的对象（登记时内容已有其他路径）"""
+    try:
+        upload_blob(episode.audio, row["audio_path"])
+        upload_blob(episode.image, row["image_path"])
+        discard_staged(episode.audio)
+        discard_staged(episode.image)
+        _purge_unreferenced(conn, keys)
+    except Exception as e:
+        print(f"⚠️ 警告: 无法整理上传的文件: {str(e)}")
+
+def insert_episode_row(
+    conn: sqlite3.Connection,
+    title: str,
+    description: str,
+    audio: SavedFile,
+    image: SavedFile,
+    created_at: str,
+    audio_meta: Optional[AudioMetadata] = None
+) -> Dict[str, Any]:
+    """
+    插入播客记录并提交
+    
+    audio_meta 为音频文件头中解析出的信息，无法解析时相应列为 NULL。
+    
+    引用计数、记录插入和本地文件落位在同一个写事务中完成（BEGIN IMMEDIATE 持有写锁），
+    与其他 worker 的删除互斥，不会出现刚复用的文件被并发删除的情况。
+    对象存储的复制和上传在事务开始前完成，事务内不发出网络请求。
+    
+    返回:
+        新记录的各列
+    """
+    episode = NewEpisode(title, description, audio, image, created_at, audio_meta)
+    upload = _upload_episode_files(conn, episode) if uses_object_storage() else None
+    placed = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = _insert_in_transaction(conn, episode, placed, upload.derivatives if upload else None)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if upload:
+            _discard_uploaded(conn, episode, upload.keys)
+        else:
+            _discard_episode_files(episode, placed)
+        raise
+    if upload:
+        _settle_uploaded(conn, episode, row, upload.keys)
+    return row
+
+def insert_episode_rows(conn: sqlite3.Connection, episodes: List[NewEpisode]) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    在一个写事务中批量插入播客，只提交一次
+    
+    每条记录包在一个 SAVEPOINT 中：单条失败只回滚该条并清理它的文件，其余照常提交。
+    整个事务失败（例如提交时出错或请求被取消）时全部回滚。
+    对象存储的文件在事务开始前逐条写好，写入失败的记录不进入事务。
+    
+    参数:
+        conn: 数据库连接
+        episodes: 待插入的播客
+    
+    返回:
+        与 episodes 一一对应的列表：成功为新记录的各列，失败为异常
+    """
+    uploads: List[Union[_Upload, Exception, None]] = []
+    for episode in episodes:
+        if not uses_object_storage():
+            uploads.append(None)
+            continue
+        try:
+            uploads.append(_upload_episode_files(conn, episode))
+        except Exception as e:
+            uploads.append(e)
+    
+    results: List[Union[Dict[str, Any], Exception]] = []
+    placed_all = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for episode, upload in zip(episodes, uploads):
+            if isinstance(upload, Exception):
+                results.append(upload)
+                continue
+            placed = []
+            conn.execute("SAVEPOINT batch_item")
+            try:
+                row = _insert_in_transaction(conn, episode, placed, upload.derivatives if upload else None)
+            except Exception as e:
+                conn.execute("ROLLBACK TO batch_item")
+                conn.execute("RELEASE batch_item")
+                if upload is None:
+                    _discard_episode_files(episode, placed)
+                results.append(e)
+                continue
+            conn.execute("RELEASE batch_item")
+            placed_all.extend(placed)
+            results.append(row)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        for path in placed_all:
+            _remove_stored(path)
+        for episode, upload in zip(episodes, uploads):
+            if isinstance(upload, _Upload):
+                _discard_uploaded(conn, episode, upload.keys)
+            elif upload is None:
+                discard_staged(episode.audio)
+                discard_staged(episode.image)
+        raise
+    
+    # 对象的清理要拿写锁，失败记录留到提交后处理
+    for episode, upload, result in zip(episodes, uploads, results):
+        if not isinstance(upload, _Upload):
+            continue
+        if isinstance(result, Exception):
+            _discard_uploaded(conn, episode, upload.keys)
+        else:
+            _settle_uploaded(conn, episode, result, upload.keys)
+    return results
+
+def delete_episode_row(conn: sqlite3.Connection, episode_id: int) -> Optional[List[str]]:
+    """
+    删除播客记录并提交
+    
+    释放音频和图片的引用；引用归零的文件（连同封面缩略图）在事务内改名，提交后由调用方用 remove_files 删除。
+    
+    返回:
+        提交后需要删除的文件相对路径，记录不存在时为 None
+    """
+    detached = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT audio_path, image_path, image_variants
+            FROM episodes
+            WHERE id = ?
+        """, (episode_id,)).fetchone()
+        if not row:
+            conn.rollback()
+            return None
+        
+        conn.execute("DELETE FROM episodes WHERE id = ?", (episode_id,))
+        variant_paths = [variant["path"] for variant in json.loads(row["image_variants"] or "[]")]
+        for path, derived in ((row["audio_path"], []), (row["image_path"], variant_paths)):
+            if release_blob(conn, path):
+                for remove_path in [path] + derived:
+                    trash = detach_blob(remove_path)
+                    if trash:
+                        detached.append((trash, remove_path))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        for trash, path in detached:
+            restore_blob(trash, path)
+        raise
+    
+    return [trash for trash, _ in detached]
+
+def select_all_episodes(conn: sqlite3.Connection) -> List[sqlite3.Row]:
+    """获取全部播客记录，按 (created_at, id) 倒序"""
+    return conn.execute(f"""
+        SELECT {EPISODE_COLUMNS}
+        FROM episodes
+        ORDER BY created_at DESC, id DESC
+    """).fetchall()
+
+def select_episodes_after(conn: sqlite3.Connection, after_id: int) -> List[sqlite3.Row]:
+    """获取 ID 大于 after_id 的播客记录（主键范围扫描），按 ID 升序"""
+    return conn.execute(f"""
+        SELECT {EPISODE_COLUMNS}
+        FROM episodes
+        WHERE id > ?
+        ORDER BY id
+    """, (after_id,)).fetchall()
+
+def select_episode_seq(conn: sqlite3.Connection) -> int:
+    """episodes 表的 AUTOINCREMENT 序列值（最近分配的 ID）"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'episodes'").fetchone()
+    return row[0] if row else 0
+
+def select_deletions_after(conn: sqlite3.Connection, after_seq: int) -> Tuple[Optional[int], List[int]]:
+    """
+    删除记录中序号大于 after_seq 的部分
+    
+    返回:
+        (删除记录中最小的序号，没有记录时为 None, 被删除的播客 ID 列表)
+    """
+    first = conn.execute("SELECT MIN(seq) FROM episode_deletions").fetchone()[0]
+    rows = conn.execute("""
+        SELECT episode_id
+        FROM episode_deletions
+        WHERE seq > ?
+        ORDER BY seq
+    """, (after_seq,)).fetchall()
+    return first, [row[0] for row in rows]
+
+def select_deletion_seq(conn: sqlite3.Connection) -> int:
+    """删除记录的 AUTOINCREMENT 序列值（最近一次删除的序号）"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'episode_deletions'").fetchone()
+    return row[0] if row else 0
+
+def select_modified_at(conn: sqlite3.Connection) -> Optional[float]:
+    """目录最近一次变化的 Unix 时间戳（插入或删除播客时由触发器更新）"""
+    row = conn.execute("SELECT modified_at FROM catalog_state WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+def count_episodes_and_seq() -> Tuple[int, int, Optional[float]]:
+    """返回 (播客总数, AUTOINCREMENT 序列值, 目录最近一次变化的 Unix 时间戳)"""
+    with db_connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+        return count, select_episode_seq(conn), select_modified_at(conn)
+
+def _list_episodes(limit: int, after: Optional[Tuple[str, int]], include_total: bool) -> Tuple[List[sqlite3.Row], Optional[int]]:
+    with db_connection() as conn:
+        # 多取一条用于判断是否还有下一页
+        if after is None:
+            rows = conn.execute(f"""
+                SELECT {EPISODE_COLUMNS}
+                FROM episodes
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (limit + 1,)).fetchall()
+        else:
+            rows = conn.execute(f"""
+                SELECT {EPISODE_COLUMNS}
+                FROM episodes
+                WHERE (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (after[0], after[1], limit + 1)).fetchall()
+        
+        total = None
+        if include_total:
+            total = conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+        return rows, total
+
+def _latest_feed_episodes(limit: int) -> List[sqlite3.Row]:
+    with db_connection() as conn:
+        return conn.execute(f"""
+            SELECT {EPISODE_COLUMNS}, audio_size
+            FROM episodes
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+
+def _search_episodes(match: str, limit: int, after: Optional[Tuple[float, int]]) -> List[sqlite3.Row]:
+    keyset = "AND (score > :score OR (score = :score AND rowid > :id))" if after else ""
+    columns = ", ".join(f"e.{column.strip()}" for column in EPISODE_COLUMNS.split(","))
+    with db_connection() as conn:
+        # 先只按 BM25 排序取出一页 rowid，再只对这一页生成高亮和摘要；
+        # 标题权重高于描述，bm25() 越小越相关
+        return conn.execute(f"""
+            WITH hits AS (
+                SELECT rowid, bm25(episodes_fts, 10.0, 1.0) AS score
+                FROM episodes_fts
+                WHERE episodes_fts MATCH :match {keyset}
+                ORDER BY score, rowid
+                LIMIT :limit
+            )
+            SELECT {columns},
+                hits.score AS score,
+                highlight(episodes_fts, 0, :start, :end) AS title_highlight,
+                snippet(episodes_fts, 1, :start, :end, '…', 64) AS snippet
+            FROM hits
+            JOIN episodes_fts ON episodes_fts.rowid = hits.rowid
+            JOIN episodes e ON e.id = hits.rowid
+            WHERE episodes_fts MATCH :match
+            ORDER BY hits.score, hits.rowid
+        """, {
+            "match": match,
+            "limit": limit + 1,
+            "score": after[0] if after else None,
+            "id": after[1] if after else None,
+            "start": SEARCH_HIGHLIGHT_START,
+            "end": SEARCH_HIGHLIGHT_END
+        }).fetchall()
+
+def _insert_episode(*args) -> Dict[str, Any]:
+    with db_connection() as conn:
+        return insert_episode_row(conn, *args)
+
+def _insert_episodes(episodes: List[NewEpisode]) -> List[Union[Dict[str, Any], Exception]]:
+    with db_connection() as conn:
+        return insert_episode_rows(conn, episodes)
+
+def _get_episode(episode_id: int) -> Optional[sqlite3.Row]:
+    with db_connection() as conn:
+        return conn.execute(f"""
+            SELECT {EPISODE_COLUMNS}
+            FROM episodes
+            WHERE id = ?
+        """, (episode_id,)).fetchone()
+
+def _remove_stored(relative_path: str):
+    try:
+        remove_stored(relative_path)
+    except Exception as e:
+        print(f"⚠️ 警告: 无法删除文件 {relative_path}: {str(e)}")
+
+def _get_blob(sha256: str) -> Optional[sqlite3.Row]:
+    with db_connection() as conn:
+        return conn.execute("""
+            SELECT sha256, path, size
+            FROM blobs
+            WHERE sha256 = ?
+        """, (sha256,)).fetchone()
+
+def _get_audio(episode_id: int) -> Optional[sqlite3.Row]:
+    with db_connection() as conn:
+        return conn.execute("""
+            SELECT audio_path, audio_size, audio_sha256, created_at
+            FROM episodes
+            WHERE id = ?
+        """, (episode_id,)).fetchone()
+
+def _delete_episode(episode_id: int) -> Optional[List[str]]:
+    with db_connection() as conn:
+        return delete_episode_row(conn, episode_id)
+
+def _remove_files(paths: List[str]):
+    if not uses_object_storage():
+        for path in paths:
+            remove_stored(path)
+        return
+    with db_connection() as conn:
+        _purge_unreferenced(conn, paths)
+
+# ==================== 异步接口 ====================
+
+async def run_db(op: str, func, *args):
+    """在 I/O 线程池中执行数据库操作，并按 op 记录耗时（含排队等待）"""
+    with DB_QUERY_DURATION.time(op=op):
+        return await run_io(func, *args)
+
+async def insert_episode(
+    title: str,
+    description: str,
+    audio: SavedFile,
+    image: SavedFile,
+    created_at: str,
+    audio_meta: Optional[AudioMetadata] = None
+) -> Dict[str, Any]:
+    """
+    插入播客记录，并将暂存的音频和图片放到最终位置
+    
+    返回:
+        新记录的各列
+    """
+    return await run_db("insert", _insert_episode, title, description, audio, image, created_at, audio_meta)
+
+async def insert_episodes(episodes: List[NewEpisode]) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    在一个事务中批量插入播客记录，并将暂存的文件放到最终位置
+    
+    返回:
+        与 episodes 一一对应的列表：成功为新记录的各列，失败为异常
+    """
+    return await run_db("insert_many", _insert_episodes, episodes)
+
+async def list_episodes(
+    limit: int,
+    cursor: Optional[str] = None,
+    include_total: bool = False
+) -> Tuple[List[sqlite3.Row], Optional[str], Optional[int]]:
+    """
+    按 (created_at, id) 倒序分页获取播客（键集分页）
+    
+    每页都是一次索引范围扫描，成本与翻到第几页无关。
+    
+    参数:
+        limit: 每页条数
+        cursor: 上一页返回的 next_cursor
+        include_total: 是否同时返回总数
+    
+    返回:
+        (记录列表, 下一页游标, 总数)
+    
+    异常:
+        ValueError: 游标无效
+    """
+    after = decode_episode_cursor(cursor) if cursor else None
+    
+    rows, total = await run_db("list", _list_episodes, limit, after, include_total)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return rows, next_cursor, total
+
+async def latest_feed_episodes(limit: int) -> List[sqlite3.Row]:
+    """
+    最新的 limit 条播客（订阅源用），按 (created_at, id) 倒序
+    
+    返回:
+        记录列表，除响应模型的列外还包含 audio_size
+    """
+    return await run_db("feed", _latest_feed_episodes, limit)
+
+async def search_episodes(
+    query: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[sqlite3.Row], Optional[str]]:
+    """
+    全文搜索标题和描述，按 BM25 相关度排序（键集分页）
+    
+    参数:
+        query: 搜索词，多个词之间为 AND
+        limit: 每页条数
+        cursor: 上一页返回的 next_cursor
+    
+    返回:
+        (记录列表，额外包含 score / title_highlight / snippet, 下一页游标)
+    
+    异常:
+        ValueError: 搜索词或游标无效
+    """
+    match = build_match_query(query)
+    after = decode_search_cursor(cursor) if cursor else None
+    
+    rows = await run_db("search", _search_episodes, match, limit, after)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["score"], last["id"])
+    return rows, next_cursor
+
+async def get_episode(episode_id: int) -> Optional[sqlite3.Row]:
+    """
+    获取单个播客
+    
+    返回:
+        记录，不存在时为 None
+    """
+    return await run_db("get", _get_episode, episode_id)
+
+async def get_audio(episode_id: int) -> Optional[sqlite3.Row]:
+    """
+    获取播客音频的存储信息
+    
+    返回:
+        (audio_path, audio_size, audio_sha256, created_at)，不存在时为 None
+    """
+    return await run_db("get_audio", _get_audio, episode_id)
+
+async def get_blob(sha256: str) -> Optional[sqlite3.Row]:
+    """
+    按内容哈希查找已存储的文件
+    
+    返回:
+        (sha256, path, size)，不存在时为 None
+    """
+    return await run_db("get_blob", _get_blob, sha256)
+
+async def delete_episode(episode_id: int) -> Optional[List[str]]:
+    """
+    删除播客记录
+    
+    返回:
+        提交后需要删除的文件相对路径，不存在时为 None
+    """
+    return await run_db("delete", _delete_episode, episode_id)
+
+async def remove_files(paths: List[str]):
+    """
+    删除 delete_episode 返回的文件
+    
+    对象存储在写锁内确认对象没有被重新登记后才删除（期间可能有相同内容的新上传复用了它）。
+    """
+    await run_db("remove_files", _remove_files, paths)
@@ -0,0 +1,394 @@
+"""
+S3 兼容对象存储
+
+STORAGE_BACKEND=s3 时使用。上传按 S3_PART_SIZE 分片：分片从文件对象中顺序读出（同时计算 SHA-256），
+交给专用线程池并行上传，每个上传同时在途的分片不超过 S3_MAX_CONCURRENCY 个，
+峰值内存约为 S3_PART_SIZE × S3_MAX_CONCURRENCY，与文件大小无关。
+所有请求共用一个带连接池的客户端，网络错误、5xx 和限流按指数退避（带随机抖动）重试。
+
+S3_ENDPOINT_URL 可以指向 MinIO、moto server 等本地替身；测试和基准也可以直接给 S3Store
+传入进程内的假客户端（实现同名的 boto3 客户端方法即可），不需要网络。
+依赖 boto3（pip install boto3），只在使用 S3 存储时导入。
+"""
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+# 配置
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")  # 为空时使用 AWS；本地替身例如 http://localhost:9000
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)  # S3 要求除最后一片外每片至少 5MB
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))  # 每个上传同时在途的分片数
+S3_POOL_SIZE = int(os.getenv("S3_POOL_SIZE", "16"))  # HTTP 连接池大小，也是分片上传线程数
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))  # 每个请求最多尝试的次数
+S3_RETRY_BASE_DELAY = float(os.getenv("S3_RETRY_BASE_DELAY", "0.2"))  # 第一次重试前的等待（秒），之后每次翻倍
+S3_RETRY_MAX_DELAY = 10.0
+READ_BUFFER_SIZE = 64 * 1024  # 按范围读取对象时每次请求的最小字节数
+DELETE_BATCH_SIZE = 1000  # DeleteObjects 每次最多删除的对象数
+
+T = TypeVar("T")
+
+class UploadCancelled(Exception):
+    """上传在完成前被取消"""
+
+def _is_retryable(exc: BaseException) -> bool:
+    """网络错误、5xx、429 和 S3 的限流错误码可以重试"""
+    try:
+        from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+    except ImportError:
+        return isinstance(exc, (ConnectionError, TimeoutError))
+    if isinstance(exc, ClientError):
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        code = exc.response.get("Error", {}).get("Code", "")
+        return status >= 500 or status == 429 or code in ("SlowDown", "Throttling", "RequestTimeout")
+    return isinstance(exc, (BotoConnectionError, HTTPClientError, ConnectionError, TimeoutError))
+
+def _is_not_found(exc: BaseException) -> bool:
+    response = getattr(exc, "response", None) or {}
+    code = str(response.get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+def create_client():
+    """
+    创建带连接池的 boto3 S3 客户端（线程安全）
+
+    重试由 S3Store 统一处理，botocore 自带的重试关闭。
+
+    异常:
+        RuntimeError: 未安装 boto3
+    """
+    try:
+        import boto3
+        from botocore.config import Config
+    except ImportError:
+        raise RuntimeError("使用 S3 存储需要安装 boto3: pip install boto3")
+
+    config = Config(
+        region_name=S3_REGION,
+        max_pool_connections=S3_POOL_SIZE,
+        retries={"total_max_attempts": 1},
+        # 本地替身通常不支持虚拟主机风格的存储桶域名
+        s3={"addressing_style": "path"} if S3_ENDPOINT_URL else None
+    )
+    return boto3.client(
+        "s3",
+        endpoint_url=S3_ENDPOINT_URL or None,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID") or None,
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY") or None,
+        config=config
+    )
+
+class S3Store:
+    """一个存储桶上的对象操作（同步，在 I/O 线程池中调用；线程安全）"""
+
+    def __init__(
+        self,
+        bucket: str,
+        client: Any = None,
+        part_size: int = S3_PART_SIZE,
+        max_concurrency: int = S3_MAX_CONCURRENCY,
+        max_attempts: int = S3_MAX_ATTEMPTS,
+        part_executor: Optional[ThreadPoolExecutor] = None
+    ):
+        self.bucket = bucket
+        self.client = client if client is not None else create_client()
+        self.part_size = part_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self._part_executor = part_executor or ThreadPoolExecutor(max_workers=S3_POOL_SIZE, thread_name_prefix="s3-part")
+
+    def _call(self, func: Callable[..., T], **kwargs: Any) -> T:
+        """调用客户端方法，可重试的错误按指数退避重试"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(Bucket=self.bucket, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts or not _is_retryable(e):
+                    raise
+                delay = min(S3_RETRY_MAX_DELAY, S3_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                time.sleep(random.uniform(delay / 2, delay))
+
+    def upload_fileobj(
+        self,
+        src: BinaryIO,
+        key: str,
+        content_type: Optional[str] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Tuple[int, str]:
+        """
+        从文件对象的当前位置读到结尾，上传为一个对象
+
+        不足一个分片时用一次 PutObject，否则用分片上传；失败或取消时中止分片上传，不留下未完成的分片。
+
+        参数:
+            src: 可读的文件对象（例如 UploadFile.file）
+            key: 对象键
+            content_type: 对象的 Content-Type
+            cancel: 设置后在下一个分片前停止并抛出 UploadCancelled
+
+        返回:
+            (大小, SHA-256 十六进制字符串)
+        """
+        extra = {"ContentType": content_type} if content_type else {}
+        digest = hashlib.sha256()
+        chunk = src.read(self.part_size)
+        digest.update(chunk)
+        if len(chunk) < self.part_size:
+            self._call(self.client.put_object, Key=key, Body=chunk, **extra)
+            return len(chunk), digest.hexdigest()
+
+        upload_id = self._call(self.client.create_multipart_upload, Key=key, **extra)["UploadId"]
+        in_flight: Set[Future] = set()
+        parts: List[Dict[str, Any]] = []
+        size = 0
+        try:
+            part_number = 1
+            while chunk:
+                if cancel is not None and cancel.is_set():
+                    raise UploadCancelled(key)
+                # 在途分片达到上限时先等一个完成，读取速度受上传速度约束
+                while len(in_flight) >= self.max_concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    parts.extend(future.result() for future in done)
+                in_flight.add(self._part_executor.submit(self._upload_part, key, upload_id, part_number, chunk))
+                size += len(chunk)
+                part_number += 1
+                chunk = src.read(self.part_size)
+                digest.update(chunk)
+
+            done, in_flight = wait(in_flight)
+            parts.extend(future.result() for future in done)
+            parts.sort(key=lambda part: part["PartNumber"])
+            self._call(
+                self.client.complete_multipart_upload,
+                Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            wait(in_flight)
+            try:
+                self._call(self.client.abort_multipart_upload, Key=key, UploadId=upload_id)
+            except Exception as e:
+                print(f"⚠️ 警告: 无法中止分片上传 {key}: {str(e)}")
+            raise
+        return size, digest.hexdigest()
+
+    def _upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> Dict[str, Any]:
+        response = self._call(
+            self.client.upload_part,
+            Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def upload_file(self, path: str, key: str, content_type: Optional[str] = None) -> Tuple[int, str]:
+        """上传本地文件，参见 upload_fileobj"""
+        with open(path, "rb") as f:
+            return self.upload_fileobj(f, key, content_type)
+
+    def size(self, key: str) -> Optional[int]:
+        """对象大小，不存在时为 None"""
+        try:
+            return self._call(self.client.head_object, Key=key)["ContentLength"]
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    def copy(self, src_key: str, dst_key: str):
+        """在存储桶内复制对象（服务端复制，数据不经过本进程）"""
+        self._call(self.client.copy_object, Key=dst_key, CopySource={"Bucket": self.bucket, "Key": src_key})
+
+    def delete(self, key: str):
+        """删除对象（不存在时不报错）"""
+        self._call(self.client.delete_object, Key=key)
+
+    def delete_many(self, keys: List[str]):
+        """批量删除对象（每个请求最多 1000 个，不存在的键不报错）"""
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[i:i + DELETE_BATCH_SIZE]
+            response = self._call(
+                self.client.delete_objects,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            )
+            errors = response.get("Errors") or []
+            if errors:
+                raise RuntimeError(f"无法删除对象 {errors[0].get('Key')}: {errors[0].get('Message')}")
+
+    def list_keys(self, prefix: str) -> List[str]:
+        """列出以 prefix 开头的对象键"""
+        keys = []
+        token = None
+        while True:
+            kwargs = {"Prefix": prefix}
+            if token:
+                kwargs["ContinuationToken"] = token
+            response = self._call(self.client.list_objects_v2, **kwargs)
+            keys.extend(item["Key"] for item in response.get("Contents", []))
+            token = response.get("NextContinuationToken")
+            if not response.get("IsTruncated") or not token:
+                return keys
+
+    def download_file(self, key: str, path: str):
+        """
+        下载对象到本地文件（分块写入，不整体读入内存）
+
+        异常:
+            FileNotFoundError: 对象不存在
+        """
+        try:
+            body = self._call(self.client.get_object, Key=key)["Body"]
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(key)
+            raise
+        try:
+            with open(path, "wb") as f:
+                while chunk := body.read(self.part_size):
+                    f.write(chunk)
+        finally:
+            body.close()
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        """读取 [start, end] 范围内的字节（含 end）"""
+        body = self._call(self.client.get_object, Key=key, Range=f"bytes={start}-{end}")["Body"]
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def open_reader(self, key: str, size: Optional[int] = None) -> BinaryIO:
+        """
+        以只读文件对象打开对象，read/seek 转换为按范围读取
+
+        只读取文件头的场景（例如解析音频信息）不需要下载整个对象。
+        """
+        if size is None:
+            size = self.size(key)
+            if size is None:
+                raise FileNotFoundError(key)
+        return io.BufferedReader(_RangeReader(self, key, size), buffer_size=READ_BUFFER_SIZE)
+
+    def presigned_get_url(self, key: str, expires_in: int) -> str:
+        """生成临时的 GET 下载地址"""
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+    def presigned_put_url(self, key: str, expires_in: int, checksum_sha256: Optional[str] = None) -> Tuple[str, Dict[str, str]]:
+        """
+        生成临时的 PUT 上传地址
+
+        参数:
+            key: 对象键
+            expires_in: 有效期（秒）
+            checksum_sha256: 内容 SHA-256 的 base64；给出时客户端必须带上返回的请求头，
+                S3 会拒绝内容不符的上传，并把校验和保存在对象上
+
+        返回:
+            (地址, 客户端上传时必须带上的请求头)
+        """
+        params = {"Bucket": self.bucket, "Key": key}
+        headers = {}
+        if checksum_sha256:
+            params["ChecksumSHA256"] = checksum_sha256
+            headers["x-amz-checksum-sha256"] = checksum_sha256
+        url = self.client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in)
+        return url, headers
+
+    def stored_sha256(self, key: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        对象大小和上传时保存的 SHA-256 校验和（base64）
+
+        返回:
+            (大小, 校验和)；对象不存在时大小为 None，上传时没有带校验和时校验和为 None
+        """
+        try:
+            response = self._call(self.client.head_object, Key=key, ChecksumMode="ENABLED")
+        except Exception as e:
+            if _is_not_found(e):
+                return None, None
+            raise
+        return response["ContentLength"], response.get("ChecksumSHA256")
+
+    def sha256(self, key: str) -> str:
+        """读取整个对象计算 SHA-256（十六进制）"""
+        digest = hashlib.sha256()
+        body = self._call(self.client.get_object, Key=key)["Body"]
+        try:
+            while chunk := body.read(self.part_size):
+                digest.update(chunk)
+        finally:
+            body.close()
+        return digest.hexdigest()
+
+    def close(self):
+        self._part_executor.shutdown(wait=True)
+
+class _RangeReader(io.RawIOBase):
+    """S3 对象上的可定位只读流（由 BufferedReader 合并小读取）"""
+
+    def __init__(self, store: S3Store, key: str, size: int):
+        self._store = store
+        self._key = key
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self._size or len(buffer) == 0:
+            return 0
+        end = min(self._pos + len(buffer), self._size) - 1
+        data = self._store.read_range(self._key, self._pos, end)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+_store: Optional[S3Store] = None
+_store_lock = threading.Lock()
+
+def get_store() -> S3Store:
+    """
+    获取共享的 S3Store（首次调用时创建）
+
+    异常:
+        RuntimeError: 未配置 S3_BUCKET 或未安装 boto3
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if not S3_BUCKET:
+                    raise RuntimeError("STORAGE_BACKEND=s3 需要配置 S3_BUCKET")
+                _store = S3Store(S3_BUCKET)
+    return _store
+
+def shutdown_store():
+    """关闭分片上传线程池"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -1,22 +1,53 @@
 """
 文件存储管理
-包含本地存储实现和云存储占位符函数
+包含本地存储、S3 兼容对象存储和其他云存储占位符函数
+
+文件按内容寻址：路径为 {子文件夹}/{哈希前两位}/{SHA-256}{扩展名}，
+相同内容只存一份，引用计数记录在数据库的 blobs 表中。
+上传先写入暂存区，由数据库事务在登记引用时调用 place_blob 放到最终位置。
+使用 S3 时相对路径即对象键：上传直接流式写入存储桶中的暂存对象（staged_key），
+upload_blob 在写事务开始前于服务端复制到最终键，封面缩略图等本地生成的文件同时上传；
+事务内只登记引用，不发出网络请求。
 """
 import os
 import uuid
+import json
+import hmac
+import base64
+import time
+import asyncio
+import hashlib
+import functools
+import threading
 from fastapi import UploadFile
-from typing import Tuple, Optional
+from collections import Counter, OrderedDict
+from typing import AsyncIterator, BinaryIO, Callable, Dict, List, Tuple, Optional, NamedTuple
 import re
+import mimetypes
+
+from backend import s3
+from backend.compression import CODECS, is_compressible, precompress_file, variant_suffixes
+from backend.executor import run_io, run_io_to_completion
+from backend.metrics import STAGE_DURATION, record_upload
+from backend.validation import AUDIO_MAX_MB, IMAGE_MAX_MB, SNIFF_BYTES, sniff_media_type
 
 # 配置
 STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # local, s3, supabase, github, gcp
 STORAGE_BASE_DIR = "./storage"
+# 不对外提供的工作文件（暂存、缓存等）放在存储目录之外，/storage 挂载不会暴露它们；
+# 暂存文件在放置时直接改名到 STORAGE_BASE_DIR，两者必须在同一个文件系统上
+PRIVATE_DIR = os.getenv("STORAGE_PRIVATE_DIR", "./storage_private")
+STAGING_DIR = os.path.join(PRIVATE_DIR, "staging")  # 尚未登记到数据库的上传
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 流式写入的分块大小（字节）
+MAX_FILE_BYTES = {"audio": AUDIO_MAX_MB * 1024 * 1024, "images": IMAGE_MAX_MB * 1024 * 1024}  # 按子文件夹的单个文件上限
+UPLOADS_DIR = os.path.join(PRIVATE_DIR, "uploads")  # 断点续传的未完成上传
+UPLOAD_EXPIRY_SECONDS = int(os.getenv("UPLOAD_EXPIRY_HOURS", "24")) * 3600  # 未完成上传的保留时间
+MEDIA_CACHE_DIR = os.path.join(PRIVATE_DIR, "cache")  # 对象存储的本地读穿缓存
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", "1024")) * 1024 * 1024  # 缓存总大小上限，0 表示不缓存
 
-# 云存储配置（可选）
-S3_BUCKET = os.getenv("S3_BUCKET", "")
-S3_REGION = os.getenv("S3_REGION", "us-east-1")
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID", "")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
+S3_STAGING_PREFIX = ".staging/"  # 存储桶中尚未登记的上传（可配置生命周期规则清理残留）
+
+# 云存储配置（可选，S3 的配置见 backend/s3.py）
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
@@ -29,6 +60,30 @@ GITHUB_BRANCH = os.getenv("GITHUB_BRANCH", "main")
 GCP_BUCKET = os.getenv("GCP_BUCKET", "")
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID", "")
 
+class Derivative(NamedTuple):
+    """由原文件生成的衍生文件（例如封面缩略图）"""
+    path: str  # 相对路径
+    width: int  # 图片宽度（像素）
+    format: str  # 文件格式，例如 webp
+    staged_path: Optional[str] = None  # 暂存文件路径；已在最终位置时为 None
+
+class FileTooLarge(ValueError):
+    """写入的文件超过大小上限"""
+    
+    def __init__(self, max_bytes: int):
+        super().__init__(f"文件大小超过限制 ({max_bytes // (1024 * 1024)}MB)")
+        self.max_bytes = max_bytes
+
+class SavedFile(NamedTuple):
+    """已保存文件的信息"""
+    path: str  # 相对路径（内容寻址）
+    size: int  # 文件大小（字节）
+    sha256: str  # 内容的 SHA-256 校验和（十六进制）
+    staged_path: Optional[str] = None  # 暂存文件路径；已在最终位置时为 None
+    derivatives: Tuple[Derivative, ...] = ()  # 衍生文件，随原文件一起放置和删除
+    staged_key: Optional[str] = None  # 对象存储中的暂存对象键（STORAGE_BACKEND=s3），与 staged_path 二选一
+    encodings: Tuple[str, ...] = ()  # 已生成的预压缩变体（编码名称），暂存在 staged_path + 扩展名
+
 def sanitize_filename(filename: str) -> str:
     """
     清理文件名，防止路径遍历攻击
@@ -49,6 +104,9 @@ def validate_file(file: UploadFile, allowed_types: list, max_size_mb: int) -> Tu
     """
     验证上传的文件
     
+    只检查文件大小和开头的 SNIFF_BYTES 个字节，不读取整个文件；
+    文件类型按魔数识别，客户端声明的 Content-Type 不作为依据。
+    
     参数:
         file: 上传的文件
         allowed_types: 允许的 MIME 类型列表
@@ -57,25 +115,535 @@ def validate_file(file: UploadFile, allowed_types: list, max_size_mb: int) -> Tu
     返回:
         (是否有效, 错误信息)
     """
-    # 检查文件类型
-    if file.content_type not in allowed_types:
-        return False, f"不支持的文件类型: {file.content_type}"
-    
     # 检查文件大小
     file.file.seek(0, 2)  # 移动到文件末尾
     file_size = file.file.tell()  # 获取文件大小
-    file.file.seek(0)  # 重置到开头
     
     max_size_bytes = max_size_mb * 1024 * 1024
     if file_size > max_size_bytes:
+        file.file.seek(0)
         return False, f"文件大小超过限制 ({max_size_mb}MB)"
     
     if file_size == 0:
+        file.file.seek(0)
         return False, "文件为空"
     
+    # 按文件头识别真实类型
+    file.file.seek(0)
+    head = file.file.read(SNIFF_BYTES)
+    file.file.seek(0)  # 重置到开头
+    media_type = sniff_media_type(head)
+    if media_type is None:
+        return False, "无法识别的文件类型"
+    if media_type not in allowed_types:
+        return False, f"不支持的文件类型: {media_type}"
+    
     return True, None
 
-async def save_file(file: UploadFile, subfolder: str) -> str:
+async def stream_to_disk(
+    file: UploadFile,
+    dest_path: str,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    max_bytes: Optional[int] = None
+) -> Tuple[int, str]:
+    """
+    将上传文件按固定大小分块流式写入磁盘
+    
+    边读边写，同时计算字节数和 SHA-256，每个上传的峰值内存只取决于 chunk_size，
+    与文件大小无关。先写入 .part 临时文件，完成后原子重命名，失败或被取消时清理残留（dest_path 应是新的路径）。
+    每个分块的读取、哈希和写入在 I/O 线程池中一次完成，多个上传并行时不阻塞事件循环。
+    
+    参数:
+        file: 上传的文件
+        dest_path: 目标文件路径
+        chunk_size: 每次读取的字节数
+        max_bytes: 文件大小上限；写入过程中一旦超过就停止，不依赖事先的检查
+    
+    返回:
+        (文件大小, SHA-256 十六进制字符串)
+    
+    异常:
+        FileTooLarge: 超过 max_bytes
+    """
+    await run_io(file.file.seek, 0)
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{dest_path}.part"
+    
+    try:
+        f = await run_io_to_completion(open, tmp_path, "wb")
+        try:
+            while True:
+                copied = await run_io(_copy_chunk, file.file, f, digest, chunk_size)
+                if not copied:
+                    break
+                size += copied
+                if max_bytes is not None and size > max_bytes:
+                    raise FileTooLarge(max_bytes)
+        finally:
+            await run_io(f.close)
+        await run_io_to_completion(os.replace, tmp_path, dest_path)
+    except BaseException:
+        # 改名完成后才被取消时目标文件已经存在，一并删除
+        await run_io(_remove_if_exists, tmp_path)
+        await run_io(_remove_if_exists, dest_path)
+        raise
+    
+    return size, digest.hexdigest()
+
+def _copy_chunk(src, dst, digest, chunk_size: int) -> int:
+    chunk = src.read(chunk_size)
+    if chunk:
+        digest.update(chunk)
+        dst.write(chunk)
+    return len(chunk)
+
+def _remove_if_exists(path: str) -> bool:
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+def uses_object_storage() -> bool:
+    """已保存的文件是否在对象存储中（而不是本地存储目录）"""
+    return STORAGE_BACKEND == "s3"
+
+def _stored_size(relative_path: str) -> Optional[int]:
+    if uses_object_storage():
+        return s3.get_store().size(relative_path)
+    try:
+        return os.path.getsize(os.path.join(STORAGE_BASE_DIR, relative_path))
+    except FileNotFoundError:
+        return None
+
+def _stored_exists(relative_path: str) -> bool:
+    return _stored_size(relative_path) is not None
+
+def remove_stored(relative_path: str) -> bool:
+    """
+    删除最终位置上的文件（同步）
+    
+    返回:
+        文件是否存在并被删除
+    """
+    if uses_object_storage():
+        cache = get_media_cache()
+        if cache is not None:
+            cache.discard(relative_path)
+        store = s3.get_store()
+        if not store.exists(relative_path):
+            return False
+        store.delete(relative_path)
+        return True
+    path = local_media_path(relative_path)
+    for suffix in variant_suffixes():
+        _remove_if_exists(path + suffix)
+    return _remove_if_exists(path)
+
+def remove_stored_objects(relative_paths: List[str]):
+    """
+    对象存储：一次请求删除多个对象及其预压缩变体（同步）
+    
+    不先逐个查询是否存在，调用方在写锁内调用时只多占用一个往返。
+    """
+    cache = get_media_cache()
+    keys = []
+    for relative_path in relative_paths:
+        if cache is not None:
+            cache.discard(relative_path)
+        keys.append(relative_path)
+        keys.extend(relative_path + suffix for suffix in variant_suffixes())
+    s3.get_store().delete_many(keys)
+
+def blob_path(subfolder: str, sha256: str, filename: Optional[str]) -> str:
+    """
+    生成内容寻址的相对路径
+    
+    参数:
+        subfolder: 子文件夹名称
+        sha256: 内容哈希
+        filename: 原始文件名（只取扩展名）
+    
+    返回:
+        相对路径，例如 images/ab/ab12...ef.png
+    """
+    file_extension = sanitize_filename(os.path.splitext(filename or "")[1].lower())
+    return f"{subfolder}/{sha256[:2]}/{sha256}{file_extension}"
+
+def derivative_path(subfolder: str, sha256: str, width: int, file_format: str) -> str:
+    """
+    生成衍生文件的相对路径，与原文件放在同一目录
+    
+    返回:
+        相对路径，例如 images/ab/ab12...ef_w320.webp
+    """
+    return f"{subfolder}/{sha256[:2]}/{sha256}_w{width}.{file_format}"
+
+def _place(staged_path: Optional[str], relative_path: str) -> bool:
+    final_path = os.path.join(STORAGE_BASE_DIR, relative_path)
+    if os.path.exists(final_path):
+        if staged_path:
+            _remove_if_exists(staged_path)
+        return False
+    if staged_path is None:
+        raise FileNotFoundError(f"文件不存在: {relative_path}")
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(staged_path, final_path)
+    return True
+
+def _placements(saved: SavedFile, relative_path: str) -> List[Tuple[Optional[str], Optional[str], str, bool]]:
+    """
+    文件及其预压缩变体、衍生文件的放置清单
+
+    返回:
+        (暂存文件路径, 暂存对象键, 最终相对路径, 是否必需) 的列表；
+        非必需的衍生文件在没有暂存文件且目标缺失时跳过
+    """
+    items = [(saved.staged_path, saved.staged_key, relative_path, True)]
+    for codec in CODECS:
+        if codec.name in saved.encodings:
+            items.append((saved.staged_path + codec.suffix, None, relative_path + codec.suffix, True))
+    for derivative in saved.derivatives:
+        items.append((derivative.staged_path, None, derivative.path, False))
+    return items
+
+def place_blob(saved: SavedFile, relative_path: str) -> List[str]:
+    """
+    将本地暂存文件及其衍生文件改名到最终位置（同步，由数据库事务调用）
+    
+    目标已存在时说明内容相同，直接丢弃暂存文件；没有暂存文件且目标缺失的衍生文件会被跳过。
+    对象存储不在事务中调用，参见 upload_blob。
+    
+    参数:
+        saved: save_file 返回的文件信息
+        relative_path: 最终相对路径（可能是已有 blob 的路径）
+    
+    返回:
+        新写入的文件相对路径
+    """
+    placed = []
+    for staged_path, _, target, required in _placements(saved, relative_path):
+        if staged_path is None and not required and not _stored_exists(target):
+            continue
+        if _place(staged_path, target):
+            placed.append(target)
+    return placed
+
+def upload_blob(saved: SavedFile, relative_path: str) -> List[str]:
+    """
+    对象存储：把暂存对象及其衍生文件写到最终键（同步，在写事务之外调用）
+    
+    暂存对象在服务端复制，本地暂存的文件（断点续传的音频、预压缩变体、封面缩略图）直接上传；
+    目标已存在时跳过。暂存文件保留，提交后再调用一次本函数补齐期间被并发删除的对象，然后 discard_staged。
+    
+    返回:
+        新写入的对象键
+    """
+    store = s3.get_store()
+    uploaded = []
+    for staged_path, staged_key, target, required in _placements(saved, relative_path):
+        if store.exists(target):
+            continue
+        if staged_key:
+            store.copy(staged_key, target)
+        elif staged_path:
+            store.upload_file(staged_path, target)
+        elif required:
+            raise FileNotFoundError(f"文件不存在: {target}")
+        else:
+            continue
+        uploaded.append(target)
+    return uploaded
+
+def present_derivatives(saved: SavedFile) -> List[Derivative]:
+    """返回已在最终位置的衍生文件（同步）"""
+    return [derivative for derivative in saved.derivatives if _stored_exists(derivative.path)]
+
+def discard_staged(saved: SavedFile):
+    """删除尚未登记的暂存文件及其衍生文件（同步）"""
+    if saved.staged_path:
+        _remove_if_exists(saved.staged_path)
+        for suffix in variant_suffixes():
+            _remove_if_exists(saved.staged_path + suffix)
+    if saved.staged_key:
+        s3.get_store().delete(saved.staged_key)
+    for derivative in saved.derivatives:
+        if derivative.staged_path:
+            _remove_if_exists(derivative.staged_path)
+
+def detach_blob(relative_path: str) -> Optional[str]:
+    """
+    将 blob 移到待删除名称下（同步，由数据库事务调用）
+    
+    事务提交后再调用 repository.remove_files 删除返回的路径；回滚时用 restore_blob 恢复。
+    对象存储不能改名，对象原地保留到提交后删除。
+    
+    返回:
+        待删除文件的相对路径，文件不存在时为 None（对象存储不在事务中查询，总是原样返回）
+    """
+    if uses_object_storage():
+        return relative_path
+    final_path = os.path.join(STORAGE_BASE_DIR, relative_path)
+    trash_relative = f"{relative_path}.deleted-{uuid.uuid4().hex}"
+    try:
+        os.replace(final_path, os.path.join(STORAGE_BASE_DIR, trash_relative))
+    except FileNotFoundError:
+        return None
+    # 预压缩变体跟随原文件，提交后由 repository.remove_files 一并删除
+    for suffix in variant_suffixes():
+        if os.path.exists(final_path + suffix):
+            os.replace(final_path + suffix, os.path.join(STORAGE_BASE_DIR, trash_relative + suffix))
+    return trash_relative
+
+def restore_blob(trash_relative: str, relative_path: str):
+    """撤销 detach_blob（同步）"""
+    if uses_object_storage():
+        return
+    trash_path = os.path.join(STORAGE_BASE_DIR, trash_relative)
+    final_path = os.path.join(STORAGE_BASE_DIR, relative_path)
+    os.replace(trash_path, final_path)
+    for suffix in variant_suffixes():
+        if os.path.exists(trash_path + suffix):
+            os.replace(trash_path + suffix, final_path + suffix)
+
+def local_media_path(relative_path: str) -> str:
+    """
+    将相对路径解析为本地文件路径，拒绝越出存储目录的路径
+    
+    参数:
+        relative_path: save_file 返回的相对路径
+    
+    返回:
+        本地文件的绝对路径
+    
+    异常:
+        ValueError: 路径越出存储目录
+    """
+    base = os.path.realpath(STORAGE_BASE_DIR)
+    path = os.path.realpath(os.path.join(base, relative_path))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError(f"无效的存储路径: {relative_path}")
+    return path
+
+def open_saved(saved: SavedFile) -> BinaryIO:
+    """
+    以只读文件对象打开暂存或已放置的文件（同步）
+    
+    对象存储中的文件按需范围读取，只读文件头时不会下载整个对象。
+    """
+    if saved.staged_key:
+        return s3.get_store().open_reader(saved.staged_key, saved.size)
+    if saved.staged_path:
+        return open(saved.staged_path, "rb")
+    if uses_object_storage():
+        return s3.get_store().open_reader(saved.path)
+    return open(local_media_path(saved.path), "rb")
+
+# ==================== 读穿缓存 ====================
+# 对象存储中的文件第一次被读取时下载到 MEDIA_CACHE_DIR（与存储相同的目录结构），之后直接从本地磁盘发送。
+# 内容按哈希寻址、不会被修改，缓存无需失效，只在 blob 被删除时移除。
+# 下载先写入 .part 再原子改名；同一进程内对同一文件的并发未命中只触发一次下载。
+# 总大小超过 MEDIA_CACHE_MAX_MB 时按最近最少使用淘汰；每个 worker 各自计数，启动时按修改时间接管已有文件。
+# 取得的路径带有租用计数，响应发送完后释放；租用中的文件不会被淘汰（暂时超过上限，之后的下载再淘汰）。
+
+class MediaCache:
+    """对象存储前的本地磁盘 LRU 缓存"""
+    
+    def __init__(self, directory: str, max_bytes: int, fetch: Callable[[str, str], None]):
+        """
+        参数:
+            directory: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            fetch: 把相对路径对应的远程文件下载到给定本地路径的函数（同步，不存在时抛出 FileNotFoundError）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._fetch = fetch
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # 相对路径 -> 大小，最近使用的在末尾
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._settled = 0  # 已结束的下载数，用于发现查找期间完成的下载
+        self._leases: Counter = Counter()  # 相对路径 -> 未释放的租用数
+    
+    def _path(self, relative_path: str) -> str:
+        base = os.path.realpath(self.directory)
+        path = os.path.realpath(os.path.join(base, relative_path))
+        if os.path.commonpath([base, path]) != base or path == base:
+            raise ValueError(f"无效的存储路径: {relative_path}")
+        return path
+    
+    def _load(self):
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, os.path.relpath(path, self.directory).replace(os.sep, "/"), stat.st_size))
+        with self._lock:
+            if self._loaded:
+                return
+            for _, relative_path, size in sorted(found):
+                self._entries[relative_path] = size
+                self._total += size
+            self._loaded = True
+            self._evict_locked(None)
+    
+    def _lookup(self, relative_path: str) -> Optional[str]:
+        path = self._path(relative_path)
+        with self._lock:
+            if relative_path not in self._entries:
+                return None
+            if not os.path.exists(path):
+                # 被其他 worker 淘汰
+                self._total -= self._entries.pop(relative_path)
+                return None
+            self._entries.move_to_end(relative_path)
+            self._leases[relative_path] += 1
+        return path
+    
+    def _fill(self, relative_path: str) -> str:
+        path = self._path(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            self._fetch(relative_path, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove_if_exists(tmp_path)
+            raise
+        with self._lock:
+            self._total -= self._entries.pop(relative_path, 0)
+            self._entries[relative_path] = size
+            self._total += size
+            self._evict_locked(relative_path)
+        return path
+    
+    def _evict_locked(self, keep: Optional[str]):
+        # 刚下载的文件即使超过上限也保留，正在等待它的请求马上要租用；租用中的文件正在发送
+        for relative_path in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            if relative_path == keep or self._leases[relative_path]:
+                continue
+            size = self._entries.pop(relative_path)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.directory, relative_path))
+            except OSError:
+                pass
+    
+    def discard(self, relative_path: str):
+        """移除缓存的文件（同步，blob 被删除时调用）"""
+        with self._lock:
+            self._total -= self._entries.pop(relative_path, 0)
+        try:
+            _remove_if_exists(self._path(relative_path))
+        except ValueError:
+            pass
+    
+    def release(self, relative_path: str):
+        """释放 lease 取得的租用（同步，响应发送完后调用）"""
+        with self._lock:
+            self._leases[relative_path] -= 1
+            if self._leases[relative_path] <= 0:
+                del self._leases[relative_path]
+    
+    async def lease(self, relative_path: str) -> str:
+        """
+        返回文件在本地缓存中的路径并登记租用，未命中时下载
+        
+        释放（release）之前文件不会被淘汰。
+        
+        异常:
+            FileNotFoundError: 远程文件不存在
+            ValueError: 路径越出缓存目录
+        """
+        if not self._loaded:
+            await run_io(self._load)
+        while True:
+            settled = self._settled
+            path = await self._lookup_async(relative_path)
+            if path is not None:
+                return path
+            
+            future = self._pending.get(relative_path)
+            if future is None:
+                if settled != self._settled:
+                    # 查找在线程中进行时有下载结束（可能正是这个文件），结果可能已过时，重新查找
+                    continue
+                future = asyncio.ensure_future(run_io(self._fill, relative_path))
+                self._pending[relative_path] = future
+                future.add_done_callback(lambda f: self._settle(relative_path, f))
+            # 某个请求被取消不影响其他等待同一下载的请求；下载完成后回到开头登记租用
+            # （极少数情况下文件在此之前已被其他下载淘汰，重新下载）
+            await asyncio.shield(future)
+    
+    async def _lookup_async(self, relative_path: str) -> Optional[str]:
+        task = asyncio.ensure_future(run_io(self._lookup, relative_path))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # 请求被取消时线程中的查找可能已经登记了租用，完成后释放
+            task.add_done_callback(lambda t: self._release_unclaimed(relative_path, t))
+            raise
+    
+    def _release_unclaimed(self, relative_path: str, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self.release(relative_path)
+    
+    def _settle(self, relative_path: str, future: asyncio.Future):
+        self._pending.pop(relative_path, None)
+        self._settled += 1
+        if not future.cancelled():
+            future.exception()  # 所有等待者都已取消时避免“异常未被获取”的警告
+
+_media_cache: Optional[MediaCache] = None
+
+def get_media_cache() -> Optional[MediaCache]:
+    """
+    获取对象存储的读穿缓存
+    
+    返回:
+        MediaCache；本地存储或 MEDIA_CACHE_MAX_MB=0 时为 None
+    """
+    global _media_cache
+    if not uses_object_storage() or MEDIA_CACHE_MAX_BYTES <= 0:
+        return None
+    if _media_cache is None:
+        _media_cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES, lambda key, path: s3.get_store().download_file(key, path))
+    return _media_cache
+
+def _no_release():
+    pass
+
+async def lease_media_file(relative_path: str) -> Tuple[str, Callable[[], None]]:
+    """
+    获取可以直接发送的本地文件路径：本地存储为存储目录中的文件，对象存储经过读穿缓存
+    
+    返回:
+        (路径, 释放函数)；对象存储的缓存文件在调用释放函数之前不会被淘汰，响应发送完后调用
+    
+    异常:
+        FileNotFoundError: 文件不存在
+        ValueError: 路径无效，或使用对象存储但缓存已关闭
+    """
+    if not uses_object_storage():
+        path = local_media_path(relative_path)
+        if not await run_io(os.path.exists, path):
+            raise FileNotFoundError(relative_path)
+        return path, _no_release
+    cache = get_media_cache()
+    if cache is None:
+        raise ValueError("读穿缓存已关闭")
+    path = await cache.lease(relative_path)
+    return path, functools.partial(cache.release, relative_path)
+
+async def save_file(file: UploadFile, subfolder: str) -> SavedFile:
     """
     保存文件（根据配置选择存储后端）
     
@@ -84,8 +652,35 @@ async def save_file(file: UploadFile, subfolder: str) -> str:
         subfolder: 子文件夹名称 (audio 或 images)
     
     返回:
-        文件的相对路径
+        SavedFile: 相对路径、大小和校验和
     """
+    start = time.perf_counter()
+    with STAGE_DURATION.time(stage="save_file"):
+        saved = await _save_to_backend(file, subfolder)
+    record_upload("form", saved.size, time.perf_counter() - start)
+    return saved
+
+async def add_precompressed(saved: SavedFile) -> SavedFile:
+    """
+    为可压缩的暂存文件（例如 WAV）生成预压缩变体，随原文件一起放置和删除
+    
+    只处理本地暂存、放到本地存储的文件；已压缩的格式（MP3、图片等）和对象存储直接跳过。
+    压缩失败不影响上传，只是没有变体。
+    
+    返回:
+        encodings 填好的 SavedFile
+    """
+    if uses_object_storage() or not saved.staged_path or not is_compressible(mimetypes.guess_type(saved.path)[0]):
+        return saved
+    try:
+        with STAGE_DURATION.time(stage="precompress"):
+            encodings = await run_io(precompress_file, saved.staged_path)
+    except OSError as e:
+        print(f"⚠️ 警告: 无法生成预压缩文件 {saved.path}: {str(e)}")
+        return saved
+    return saved._replace(encodings=tuple(encodings))
+
+async def _save_to_backend(file: UploadFile, subfolder: str) -> SavedFile:
     if STORAGE_BACKEND == "local":
         return await save_file_local(file, subfolder)
     elif STORAGE_BACKEND == "s3":
@@ -99,7 +694,36 @@ async def save_file(file: UploadFile, subfolder: str) -> str:
     else:
         return await save_file_local(file, subfolder)
 
-async def save_file_local(file: UploadFile, subfolder: str) -> str:
+async def save_files(uploads: List[Tuple[UploadFile, str]]) -> List[SavedFile]:
+    """
+    并发保存多个文件
+    
+    任一文件保存失败时，取消其余仍在进行的保存（未完成的 .part 文件由 stream_to_disk 清理），
+    删除已经保存好的暂存文件，然后抛出第一个异常；调用方被取消时同样清理。
+    
+    参数:
+        uploads: (上传的文件, 子文件夹名称) 列表
+    
+    返回:
+        与 uploads 顺序对应的 SavedFile 列表
+    """
+    tasks = [asyncio.ensure_future(save_file(file, subfolder)) for file, subfolder in uploads]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for task in tasks:
+            if not task.cancelled() and task.exception() is None:
+                await run_io(discard_staged, task.result())
+        raise
+
+async def save_file_local(file: UploadFile, subfolder: str) -> SavedFile:
     """
     本地存储实现
     
@@ -108,75 +732,550 @@ async def save_file_local(file: UploadFile, subfolder: str) -> str:
         subfolder: 子文件夹名称
     
     返回:
-        文件的相对路径
+        SavedFile: 内容寻址路径、大小、校验和以及暂存文件路径
     """
-    # 创建存储目录
-    storage_dir = os.path.join(STORAGE_BASE_DIR, subfolder)
-    os.makedirs(storage_dir, exist_ok=True)
+    # 先写入暂存目录，哈希要等读完才知道
+    await run_io(os.makedirs, STAGING_DIR, exist_ok=True)
+    staged_path = os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}.upload")
     
-    # 生成唯一文件名
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    unique_filename = sanitize_filename(unique_filename)
+    size, sha256 = await stream_to_disk(file, staged_path, max_bytes=MAX_FILE_BYTES.get(subfolder))
     
-    # 保存文件
-    file_path = os.path.join(storage_dir, unique_filename)
+    return SavedFile(
+        path=blob_path(subfolder, sha256, file.filename),
+        size=size,
+        sha256=sha256,
+        staged_path=staged_path
+    )
+
+# ==================== 断点续传 ====================
+# 每个上传会话在 UPLOADS_DIR 下有两个文件：{id}.json 记录文件名和声明的大小，
+# {id}.part 是已接收的数据。已接收的字节数就是 .part 的大小，不单独记录；
+# 分块直接追加到 .part，完成后它本身就是暂存文件，由 place_blob 重命名到最终位置，不再复制。
+
+_UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_upload_locks: Dict[str, asyncio.Lock] = {}
+
+class UploadInfo(NamedTuple):
+    """断点续传会话"""
+    id: str
+    filename: str  # 原始文件名
+    size: int  # 声明的文件总大小（字节）
+    offset: int  # 已接收的字节数
+    updated_at: float  # 最后一次写入的时间戳（过期时间从这里算起）
+
+class UploadOffsetMismatch(Exception):
+    """分块的起始位置与已接收的字节数不一致"""
     
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    def __init__(self, offset: int):
+        super().__init__(f"上传位置不匹配，已接收 {offset} 字节")
+        self.offset = offset
+
+def _upload_paths(upload_id: str) -> Tuple[str, str]:
+    if not _UPLOAD_ID_PATTERN.match(upload_id):
+        raise FileNotFoundError(upload_id)
+    base = os.path.join(UPLOADS_DIR, upload_id)
+    return f"{base}.json", f"{base}.part"
+
+def _read_upload(upload_id: str) -> Optional[UploadInfo]:
+    try:
+        meta_path, data_path = _upload_paths(upload_id)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        stat = os.stat(data_path)
+    except FileNotFoundError:
+        return None
+    if stat.st_mtime < time.time() - UPLOAD_EXPIRY_SECONDS:
+        # 已过期但还没被清理，与不存在相同
+        return None
+    return UploadInfo(upload_id, meta["filename"], meta["size"], stat.st_size, stat.st_mtime)
+
+def _remove_upload(upload_id: str):
+    meta_path, data_path = _upload_paths(upload_id)
+    _remove_if_exists(meta_path)
+    _remove_if_exists(data_path)
+
+def _remove_expired_uploads() -> List[str]:
+    # 按数据文件最后一次写入的时间判断，仍在续传的会话不会被清理
+    if not os.path.isdir(UPLOADS_DIR):
+        return []
+    cutoff = time.time() - UPLOAD_EXPIRY_SECONDS
+    removed = []
+    for entry in os.scandir(UPLOADS_DIR):
+        upload_id, ext = os.path.splitext(entry.name)
+        if ext == ".part" and _UPLOAD_ID_PATTERN.match(upload_id) and entry.stat().st_mtime < cutoff:
+            _remove_upload(upload_id)
+            removed.append(upload_id)
+    return removed
+
+def _create_upload(filename: str, size: int) -> UploadInfo:
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    meta_path, data_path = _upload_paths(upload_id)
+    created_at = time.time()
+    open(data_path, "wb").close()
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"filename": filename, "size": size, "created_at": created_at}, f)
+    return UploadInfo(upload_id, filename, size, 0, created_at)
+
+def _hash_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_head(path: str, length: int) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(length)
+
+async def _upload_lock(upload_id: str) -> asyncio.Lock:
+    """
+    同一会话的操作在本进程内串行执行；只为存在的会话创建锁，未知的 ID 不会让锁表增长
     
-    # 返回相对路径
-    relative_path = f"{subfolder}/{unique_filename}"
-    return relative_path
+    异常:
+        FileNotFoundError: 会话不存在
+    """
+    lock = _upload_locks.get(upload_id)
+    if lock is None:
+        if await get_upload(upload_id) is None:
+            raise FileNotFoundError(upload_id)
+        lock = _upload_locks.setdefault(upload_id, asyncio.Lock())
+    return lock
 
-# ==================== 云存储占位符函数 ====================
-# 以下函数是占位符，展示如何集成各种云存储服务
-# 要使用这些函数，需要安装相应的 SDK 并配置环境变量
+def _release_upload_lock(upload_id: str):
+    # 会话已结束或已不存在（过期、被其他 worker 删除）
+    _upload_locks.pop(upload_id, None)
 
-async def save_file_s3(file: UploadFile, subfolder: str) -> str:
+async def create_upload(filename: str, size: int) -> UploadInfo:
     """
-    AWS S3 存储占位符
+    创建断点续传会话（顺便清理过期的未完成上传）
     
-    TODO: 实现 S3 上传
+    参数:
+        filename: 原始文件名
+        size: 文件总大小（字节）
     
-    步骤:
-    1. 安装: pip install boto3
-    2. 配置环境变量: AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_BUCKET
-    3. 取消注释以下代码并根据需要修改
+    返回:
+        UploadInfo
+    """
+    for upload_id in await run_io(_remove_expired_uploads):
+        lock = _upload_locks.get(upload_id)
+        if lock is not None and not lock.locked():
+            _release_upload_lock(upload_id)
+    return await run_io(_create_upload, sanitize_filename(filename), size)
+
+async def get_upload(upload_id: str) -> Optional[UploadInfo]:
+    """获取上传会话，不存在时为 None"""
+    return await run_io(_read_upload, upload_id)
+
+async def append_upload(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> UploadInfo:
+    """
+    从 offset 开始追加一段数据
     
-    示例代码:
-    ```python
-    import boto3
+    连接中断时已写入的部分会保留，客户端查询 offset 后从断点继续。
+    同一会话的写入在本进程内串行执行。
     
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=S3_REGION
-    )
+    参数:
+        upload_id: 会话 ID
+        offset: 这段数据在文件中的起始位置，必须等于已接收的字节数
+        chunks: 数据块的异步迭代器（例如 request.stream()）
     
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    s3_key = f"{subfolder}/{unique_filename}"
+    返回:
+        写入后的 UploadInfo
     
-    content = await file.read()
+    异常:
+        FileNotFoundError: 会话不存在
+        UploadOffsetMismatch: offset 与已接收的字节数不一致
+        ValueError: 数据超过声明的大小（超出部分不会写入）
+    """
+    async with await _upload_lock(upload_id):
+        info = await get_upload(upload_id)
+        if info is None:
+            _release_upload_lock(upload_id)
+            raise FileNotFoundError(upload_id)
+        if offset != info.offset:
+            raise UploadOffsetMismatch(info.offset)
+        
+        written = info.offset
+        start = time.perf_counter()
+        f = await run_io(open, _upload_paths(upload_id)[1], "ab")
+        try:
+            async for chunk in chunks:
+                if written + len(chunk) > info.size:
+                    await run_io(f.write, chunk[:info.size - written])
+                    raise ValueError(f"数据超过声明的文件大小 ({info.size} 字节)")
+                await run_io(f.write, chunk)
+                written += len(chunk)
+        finally:
+            await run_io(f.close)
+            record_upload("resumable", written - info.offset, time.perf_counter() - start)
+        return info._replace(offset=written, updated_at=time.time())
+
+async def finish_upload(upload_id: str, subfolder: str) -> SavedFile:
+    """
+    结束已接收完整的上传，将数据文件作为暂存文件交给 place_blob
     
-    s3_client.put_object(
-        Bucket=S3_BUCKET,
-        Key=s3_key,
-        Body=content,
-        ContentType=file.content_type
-    )
+    参数:
+        upload_id: 会话 ID
+        subfolder: 子文件夹名称
     
-    return s3_key
-    ```
+    返回:
+        SavedFile，staged_path 为会话的数据文件
+    
+    异常:
+        FileNotFoundError: 会话不存在
+        UploadOffsetMismatch: 数据尚未接收完整
     """
-    # 暂时回退到本地存储
-    print("⚠️  S3 存储未配置，使用本地存储")
-    return await save_file_local(file, subfolder)
+    async with await _upload_lock(upload_id):
+        info = await get_upload(upload_id)
+        if info is None:
+            _release_upload_lock(upload_id)
+            raise FileNotFoundError(upload_id)
+        if info.offset != info.size:
+            raise UploadOffsetMismatch(info.offset)
+        
+        meta_path, data_path = _upload_paths(upload_id)
+        sha256 = await run_io(_hash_file, data_path)
+        await run_io(_remove_if_exists, meta_path)
+        _release_upload_lock(upload_id)
+        return SavedFile(
+            path=blob_path(subfolder, sha256, info.filename),
+            size=info.size,
+            sha256=sha256,
+            staged_path=data_path
+        )
+
+async def read_upload_head(upload_id: str, length: int) -> bytes:
+    """读取已接收数据的开头（用于识别文件类型）"""
+    return await run_io(_read_head, _upload_paths(upload_id)[1], length)
+
+async def abort_upload(upload_id: str) -> bool:
+    """
+    取消上传并删除已接收的数据
+    
+    返回:
+        会话是否存在
+    """
+    try:
+        lock = await _upload_lock(upload_id)
+    except FileNotFoundError:
+        return False
+    async with lock:
+        info = await get_upload(upload_id)
+        if info is not None:
+            await run_io(_remove_upload, upload_id)
+        _release_upload_lock(upload_id)
+        return info is not None
+
+# ==================== 直传 ====================
+# 客户端先声明文件的大小和 SHA-256，拿到每个文件的上传地址后直接 PUT 到存储：
+# 使用 S3 时是预签名地址，数据不经过 API 进程；本地存储时是带 HMAC 签名的 API 地址（receive_direct_upload）。
+# 会话元数据为 DIRECT_UPLOADS_DIR/{id}.json，本地数据文件为 {id}.{slot}；
+# S3 中的数据在 .staging/direct/{id}/{slot}。完成时核对大小和哈希，数据直接作为暂存文件交给 upload_blob（本地存储时为 place_blob）。
+
+DIRECT_UPLOADS_DIR = os.path.join(PRIVATE_DIR, "direct")
+UPLOAD_URL_EXPIRY = int(os.getenv("UPLOAD_URL_EXPIRY", "3600"))  # 直传地址的有效期（秒）
+SIGNING_KEY_PATH = os.path.join(PRIVATE_DIR, "signing_key")  # 未配置 UPLOAD_SIGNING_KEY 时自动生成，多个 worker 共用
+
+_direct_locks: Dict[str, asyncio.Lock] = {}
+_signing_key: Optional[bytes] = None
+
+class DirectUploadFile(NamedTuple):
+    """直传会话中的一个文件"""
+    slot: str  # audio 或 image
+    filename: str  # 原始文件名
+    size: int  # 声明的大小（字节）
+    sha256: str  # 声明的 SHA-256（十六进制）
+
+class DirectUpload(NamedTuple):
+    """直传会话"""
+    id: str
+    files: Tuple[DirectUploadFile, ...]
+    expires_at: float  # 上传地址的过期时间戳
+
+    def file(self, slot: str) -> Optional[DirectUploadFile]:
+        return next((f for f in self.files if f.slot == slot), None)
+
+class UploadTarget(NamedTuple):
+    """一个文件的上传地址"""
+    url: str  # 以 / 开头时相对于 API
+    headers: Dict[str, str]  # 上传时必须带上的请求头
+
+class UploadVerificationError(ValueError):
+    """直传的文件缺失或与声明的大小、哈希不一致"""
+
+def _get_signing_key() -> bytes:
+    global _signing_key
+    if _signing_key is None:
+        configured = os.getenv("UPLOAD_SIGNING_KEY", "")
+        if configured:
+            _signing_key = configured.encode()
+        else:
+            os.makedirs(PRIVATE_DIR, exist_ok=True)
+            try:
+                fd = os.open(SIGNING_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(os.urandom(32).hex().encode())
+            except FileExistsError:
+                pass
+            with open(SIGNING_KEY_PATH, "rb") as f:
+                _signing_key = f.read().strip()
+    return _signing_key
+
+def _direct_signature(upload_id: str, slot: str, expires: int) -> str:
+    message = f"{upload_id}/{slot}/{expires}".encode()
+    return hmac.new(_get_signing_key(), message, hashlib.sha256).hexdigest()
+
+def _direct_base(upload_id: str) -> str:
+    if not _UPLOAD_ID_PATTERN.match(upload_id):
+        raise FileNotFoundError(upload_id)
+    return os.path.join(DIRECT_UPLOADS_DIR, upload_id)
+
+def _direct_key(upload_id: str, slot: str) -> str:
+    return f"{S3_STAGING_PREFIX}direct/{upload_id}/{slot}"
+
+def _read_direct_upload(upload_id: str) -> Optional[DirectUpload]:
+    try:
+        with open(f"{_direct_base(upload_id)}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    files = tuple(DirectUploadFile(**item) for item in meta["files"])
+    return DirectUpload(upload_id, files, meta["expires_at"])
+
+def _remove_direct_upload(upload: DirectUpload):
+    base = _direct_base(upload.id)
+    for item in upload.files:
+        _remove_if_exists(f"{base}.{item.slot}")
+        if uses_object_storage():
+            s3.get_store().delete(_direct_key(upload.id, item.slot))
+    _remove_if_exists(f"{base}.json")
+
+def _remove_expired_direct_uploads():
+    # 地址过期后再保留 UPLOAD_EXPIRY_SECONDS，给已上传完但还没 finalize 的客户端留出时间
+    if not os.path.isdir(DIRECT_UPLOADS_DIR):
+        return
+    cutoff = time.time() - UPLOAD_EXPIRY_SECONDS
+    for entry in os.scandir(DIRECT_UPLOADS_DIR):
+        upload_id, ext = os.path.splitext(entry.name)
+        if ext != ".json" or not _UPLOAD_ID_PATTERN.match(upload_id):
+            continue
+        upload = _read_direct_upload(upload_id)
+        if upload is not None and upload.expires_at < cutoff:
+            try:
+                _remove_direct_upload(upload)
+            except Exception as e:
+                print(f"⚠️ 警告: 无法清理过期的直传 {upload_id}: {str(e)}")
+
+def _upload_target(upload: DirectUpload, item: DirectUploadFile) -> UploadTarget:
+    expires = int(upload.expires_at)
+    if uses_object_storage():
+        checksum = base64.b64encode(bytes.fromhex(item.sha256)).decode()
+        url, headers = s3.get_store().presigned_put_url(_direct_key(upload.id, item.slot), UPLOAD_URL_EXPIRY, checksum)
+        return UploadTarget(url, headers)
+    signature = _direct_signature(upload.id, item.slot, expires)
+    return UploadTarget(f"/api/storage/uploads/{upload.id}/{item.slot}?expires={expires}&signature={signature}", {})
+
+def _create_direct_upload(files: List[DirectUploadFile]) -> Tuple[DirectUpload, Dict[str, UploadTarget]]:
+    _remove_expired_direct_uploads()
+    os.makedirs(DIRECT_UPLOADS_DIR, exist_ok=True)
+    upload = DirectUpload(uuid.uuid4().hex, tuple(files), time.time() + UPLOAD_URL_EXPIRY)
+    with open(f"{_direct_base(upload.id)}.json", "w", encoding="utf-8") as f:
+        json.dump({"files": [item._asdict() for item in upload.files], "expires_at": upload.expires_at}, f)
+    return upload, {item.slot: _upload_target(upload, item) for item in upload.files}
+
+async def create_direct_upload(files: List[DirectUploadFile]) -> Tuple[DirectUpload, Dict[str, UploadTarget]]:
+    """
+    创建直传会话（顺便清理过期的会话）
+    
+    参数:
+        files: 要上传的文件，sha256 为小写十六进制
+    
+    返回:
+        (会话, 按 slot 索引的上传地址)
+    """
+    files = [item._replace(filename=sanitize_filename(item.filename), sha256=item.sha256.lower()) for item in files]
+    return await run_io(_create_direct_upload, files)
+
+async def get_direct_upload(upload_id: str) -> Optional[DirectUpload]:
+    """获取直传会话，不存在时为 None"""
+    return await run_io(_read_direct_upload, upload_id)
+
+async def receive_direct_upload(upload_id: str, slot: str, expires: int, signature: str, chunks: AsyncIterator[bytes]):
+    """
+    本地存储的直传地址：接收一个文件（S3 的预签名地址在本地的对应物）
+    
+    边接收边写入 .part 并计算哈希，大小和哈希都与声明一致才改名为数据文件，
+    重复上传会覆盖之前的数据。
+    
+    异常:
+        PermissionError: 签名无效或地址已过期
+        FileNotFoundError: 会话或文件不存在
+        UploadVerificationError: 数据与声明的大小或哈希不一致
+    """
+    expected = _direct_signature(upload_id, slot, expires)
+    if not hmac.compare_digest(expected, signature) or expires < time.time():
+        raise PermissionError("上传地址无效或已过期")
+    upload = await get_direct_upload(upload_id)
+    item = upload.file(slot) if upload else None
+    if item is None:
+        raise FileNotFoundError(f"{upload_id}/{slot}")
+    
+    data_path = f"{_direct_base(upload_id)}.{slot}"
+    tmp_path = f"{data_path}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    start = time.perf_counter()
+    try:
+        f = await run_io_to_completion(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > item.size:
+                    raise UploadVerificationError(f"数据超过声明的文件大小 ({item.size} 字节)")
+                digest.update(chunk)
+                await run_io(f.write, chunk)
+        finally:
+            await run_io(f.close)
+            record_upload("direct", size, time.perf_counter() - start)
+        if size != item.size:
+            raise UploadVerificationError(f"文件大小不一致: 声明 {item.size} 字节，收到 {size} 字节")
+        if digest.hexdigest() != item.sha256:
+            raise UploadVerificationError("文件内容与声明的 SHA-256 不一致")
+        await run_io(os.replace, tmp_path, data_path)
+    except BaseException:
+        await run_io(_remove_if_exists, tmp_path)
+        raise
+
+def _verify_direct_file(upload: DirectUpload, item: DirectUploadFile, subfolder: str) -> Tuple[SavedFile, bytes]:
+    if uses_object_storage():
+        store = s3.get_store()
+        key = _direct_key(upload.id, item.slot)
+        size, checksum = store.stored_sha256(key)
+        if size is None:
+            raise UploadVerificationError(f"{item.slot} 尚未上传")
+        if size != item.size:
+            raise UploadVerificationError(f"{item.slot} 大小不一致: 声明 {item.size} 字节，实际 {size} 字节")
+        # 带校验和上传时 S3 已核对过内容，否则读取对象重新计算
+        sha256 = base64.b64decode(checksum).hex() if checksum else store.sha256(key)
+        saved = SavedFile(blob_path(subfolder, sha256, item.filename), size, sha256, staged_key=key)
+        head = store.read_range(key, 0, SNIFF_BYTES - 1) if size else b""
+    else:
+        data_path = f"{_direct_base(upload.id)}.{item.slot}"
+        try:
+            size = os.path.getsize(data_path)
+        except FileNotFoundError:
+            raise UploadVerificationError(f"{item.slot} 尚未上传")
+        if size != item.size:
+            raise UploadVerificationError(f"{item.slot} 大小不一致: 声明 {item.size} 字节，实际 {size} 字节")
+        sha256 = _hash_file(data_path)
+        saved = SavedFile(blob_path(subfolder, sha256, item.filename), size, sha256, staged_path=data_path)
+        head = _read_head(data_path, SNIFF_BYTES)
+    if sha256 != item.sha256:
+        raise UploadVerificationError(f"{item.slot} 内容与声明的 SHA-256 不一致")
+    return saved, head
+
+async def verify_direct_upload(upload_id: str, subfolders: Dict[str, str]) -> Dict[str, Tuple[SavedFile, bytes]]:
+    """
+    核对直传的文件，不修改会话（校验失败时客户端可以重新上传后再次提交）
+    
+    参数:
+        upload_id: 会话 ID
+        subfolders: slot 到子文件夹名称的映射
+    
+    返回:
+        按 slot 索引的 (SavedFile, 文件开头 SNIFF_BYTES 个字节)，SavedFile 的暂存位置为直传的数据
+    
+    异常:
+        FileNotFoundError: 会话不存在
+        UploadVerificationError: 文件缺失或大小、哈希不一致
+    """
+    upload = await get_direct_upload(upload_id)
+    if upload is None:
+        _direct_locks.pop(upload_id, None)
+        raise FileNotFoundError(upload_id)
+    results = await asyncio.gather(*(
+        run_io(_verify_direct_file, upload, item, subfolders[item.slot]) for item in upload.files
+    ))
+    return {item.slot: result for item, result in zip(upload.files, results)}
+
+async def direct_upload_lock(upload_id: str) -> asyncio.Lock:
+    """
+    同一直传会话的完成操作在本进程内串行执行；只为存在的会话创建锁
+    
+    异常:
+        FileNotFoundError: 会话不存在
+    """
+    lock = _direct_locks.get(upload_id)
+    if lock is None:
+        if await get_direct_upload(upload_id) is None:
+            raise FileNotFoundError(upload_id)
+        lock = _direct_locks.setdefault(upload_id, asyncio.Lock())
+    return lock
+
+async def close_direct_upload(upload_id: str):
+    """
+    结束直传会话：删除元数据，数据文件此后由 verify_direct_upload 返回的 SavedFile 负责
+    """
+    await run_io(_remove_if_exists, f"{_direct_base(upload_id)}.json")
+    _direct_locks.pop(upload_id, None)
+
+async def abort_direct_upload(upload_id: str) -> bool:
+    """
+    取消直传并删除已上传的数据
+    
+    返回:
+        会话是否存在
+    """
+    try:
+        lock = await direct_upload_lock(upload_id)
+    except FileNotFoundError:
+        return False
+    async with lock:
+        upload = await get_direct_upload(upload_id)
+        if upload is not None:
+            await run_io(_remove_direct_upload, upload)
+        _direct_locks.pop(upload_id, None)
+        return upload is not None
+
+# ==================== 云存储 ====================
+# S3 已实现；其余函数是占位符，展示如何集成各种云存储服务
+# 要使用这些函数，需要安装相应的 SDK 并配置环境变量
+
+async def save_file_s3(file: UploadFile, subfolder: str) -> SavedFile:
+    """
+    S3 兼容对象存储实现
+    
+    分片直接从 UploadFile 读出，并行上传到存储桶中的暂存对象，同时计算 SHA-256，
+    不在本地再写一份；upload_blob 在登记引用前于服务端复制到内容寻址的最终键。
+    被取消或失败时中止分片上传（见 s3.S3Store.upload_fileobj）。
+    
+    参数:
+        file: 上传的文件
+        subfolder: 子文件夹名称
+    
+    返回:
+        SavedFile: 内容寻址路径、大小、校验和以及暂存对象键
+    """
+    store = await run_io(s3.get_store)
+    staged_key = f"{S3_STAGING_PREFIX}{uuid.uuid4().hex}.upload"
+    cancel = threading.Event()
+    
+    await run_io(file.file.seek, 0)
+    try:
+        size, sha256 = await run_io(store.upload_fileobj, file.file, staged_key, file.content_type, cancel)
+    except BaseException:
+        # 上传线程在下一个分片前停止并中止分片上传
+        cancel.set()
+        raise
+    
+    return SavedFile(
+        path=blob_path(subfolder, sha256, file.filename),
+        size=size,
+        sha256=sha256,
+        staged_key=staged_key
+    )
 
-async def save_file_supabase(file: UploadFile, subfolder: str) -> str:
+async def save_file_supabase(file: UploadFile, subfolder: str) -> SavedFile:
     """
     Supabase Storage 占位符
     
@@ -212,7 +1311,7 @@ async def save_file_supabase(file: UploadFile, subfolder: str) -> str:
     print("⚠️  Supabase 存储未配置，使用本地存储")
     return await save_file_local(file, subfolder)
 
-async def save_file_github(file: UploadFile, subfolder: str) -> str:
+async def save_file_github(file: UploadFile, subfolder: str) -> SavedFile:
     """
     GitHub Repository 存储占位符
     
@@ -252,7 +1351,7 @@ async def save_file_github(file: UploadFile, subfolder: str) -> str:
     print("⚠️  GitHub 存储未配置，使用本地存储")
     return await save_file_local(file, subfolder)
 
-async def save_file_gcp(file: UploadFile, subfolder: str) -> str:
+async def save_file_gcp(file: UploadFile, subfolder: str) -> SavedFile:
     """
     Google Cloud Storage 占位符
     
@@ -303,10 +1402,13 @@ def check_storage_config():
     if STORAGE_BACKEND == "local":
         print(f"  本地路径: {STORAGE_BASE_DIR}")
     elif STORAGE_BACKEND == "s3":
-        if not S3_BUCKET:
+        if not s3.S3_BUCKET:
             print("  ⚠️  警告: S3_BUCKET 未配置")
         else:
-            print(f"  S3 存储桶: {S3_BUCKET}")
+            print(f"  S3 存储桶: {s3.S3_BUCKET}")
+            if s3.S3_ENDPOINT_URL:
+                print(f"  S3 端点: {s3.S3_ENDPOINT_URL}")
+            print(f"  分片大小: {s3.S3_PART_SIZE // (1024 * 1024)}MB，并行分片: {s3.S3_MAX_CONCURRENCY}")
     elif STORAGE_BACKEND == "supabase":
         if not SUPABASE_URL or not SUPABASE_KEY:
             print("  ⚠️  警告: Supabase 配置不完整")
@@ -0,0 +1,156 @@
+"""
+媒体文件流式响应
+
+支持单段 Range / If-Range；服务器提供 ASGI zero-copy 扩展时交给 sendfile 发送，
+否则在 I/O 线程池中分块读取。
+"""
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.types import Receive, Scope, Send
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+from backend.executor import run_io
+from backend.http_cache import parse_http_date
+
+STREAM_CHUNK_SIZE = 256 * 1024  # 非 zero-copy 时每次读取的字节数
+
+class RangeNotSatisfiable(Exception):
+    """Range 请求无法满足（416）"""
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 请求头
+    
+    只支持单个字节范围；格式无法识别时按规范忽略 Range，返回完整内容。
+    
+    参数:
+        header: Range 请求头
+        size: 文件大小
+    
+    返回:
+        (起始字节, 结束字节)（均含），无 Range 时为 None
+    
+    异常:
+        RangeNotSatisfiable: 多段范围或范围越界
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    if "," in spec:
+        raise RangeNotSatisfiable("不支持多段范围请求")
+    
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text == "":
+            # 后缀范围：最后 N 个字节
+            suffix = int(end_text)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable("范围越界")
+            return max(0, size - suffix), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    
+    if start < 0 or (end_text and start > end):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable("范围越界")
+    return start, min(end, size - 1)
+
+def if_range_matches(header: Optional[str], etag: str, last_modified_http: Optional[str]) -> bool:
+    """
+    判断 If-Range 条件是否成立（不成立时应忽略 Range，返回完整内容）
+    
+    ETag 使用强比较；日期必须与 Last-Modified 完全相同。
+    """
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        return header == etag
+    if last_modified_http is None:
+        return False
+    since = parse_http_date(header)
+    current = parse_http_date(last_modified_http)
+    return since is not None and since == current
+
+class FileRangeResponse(Response):
+    """
+    发送文件的某个字节范围
+    
+    Content-Length 等响应头由调用方预先计算，这里只负责发送字节。
+    发送结束（包括连接中断）后调用 on_close，用于释放读穿缓存的租用。
+    """
+    
+    def __init__(
+        self, path: str, start: int, length: int, status_code: int, headers: Dict[str, str], media_type: str,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.length = length
+        self.on_close = on_close
+        self.headers["content-length"] = str(length)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await self._send_file(scope, send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+    
+    async def _send_file(self, scope: Scope, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope.get("method") == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        f = await run_io(open, self.path, "rb")
+        try:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False,
+                })
+                return
+            
+            await run_io(f.seek, self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await run_io(f.read, min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # 文件在发送过程中被截断
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_io(f.close)
+
+class ClosingFileResponse(FileResponse):
+    """发送结束（包括连接中断）后调用 on_close 的 FileResponse"""
+    
+    def __init__(self, path: str, on_close: Callable[[], None], **kwargs):
+        super().__init__(path, **kwargs)
+        self.on_close = on_close
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
@@ -0,0 +1,145 @@
+"""
+上传的早期校验
+
+- 请求体大小：在读取请求体之前按 Content-Length 拒绝超限请求（客户端使用
+  Expect: 100-continue 时连请求体都不会发送）；没有 Content-Length（分块传输）时
+  边接收边计数，一旦超限立即中止，不再继续接收
+- 文件类型：根据文件开头的魔数识别真实类型，不信任客户端声明的 Content-Type
+"""
+import os
+import re
+from typing import Dict, Optional, Pattern
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+AUDIO_MAX_MB = 50  # 音频文件大小上限
+IMAGE_MAX_MB = 10  # 封面图片大小上限
+FORM_OVERHEAD_BYTES = 1024 * 1024  # 文本字段和 multipart 边界的余量
+SNIFF_BYTES = 4096  # 识别文件类型时读取的字节数
+
+# 创建播客请求的请求体上限：两个文件加上表单余量
+EPISODE_UPLOAD_MAX_BYTES = (AUDIO_MAX_MB + IMAGE_MAX_MB) * 1024 * 1024 + FORM_OVERHEAD_BYTES
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))  # 批量创建每次最多的条目数
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_MB", "1024")) * 1024 * 1024  # 批量创建的请求体上限
+
+def _is_mpeg_audio_frame(head: bytes) -> bool:
+    """检查开头是否为 MPEG 音频帧头（11 位同步字 + 有效的层、码率和采样率）"""
+    if len(head) < 4 or head[0] != 0xFF or head[1] & 0xE0 != 0xE0:
+        return False
+    layer = (head[1] >> 1) & 0x03
+    bitrate_index = head[2] >> 4
+    sample_rate_index = (head[2] >> 2) & 0x03
+    return layer != 0 and bitrate_index not in (0, 15) and sample_rate_index != 3
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """
+    根据文件开头的魔数识别媒体类型
+    
+    参数:
+        head: 文件开头的字节（SNIFF_BYTES 个足够）
+    
+    返回:
+        audio/mpeg, audio/wav, audio/mp4, image/jpeg, image/png 之一，无法识别时为 None
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    if head.startswith(b"ID3") or _is_mpeg_audio_frame(head):
+        return "audio/mpeg"
+    return None
+
+class _RequestTooLarge(Exception):
+    pass
+
+class RequestSizeLimitMiddleware:
+    """
+    按路径限制 POST 请求体大小的 ASGI 中间件
+    
+    FastAPI 在调用路由函数之前就会完整接收并解析 multipart 请求体，
+    因此大小限制必须在中间件里、在应用读取请求体之前执行。
+    """
+    
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        """
+        参数:
+            app: 下游 ASGI 应用
+            limits: 路径到请求体字节上限的映射，路径可以包含 {参数} 占位符
+        """
+        self.app = app
+        self.limits = [(self._compile(path), limit) for path, limit in limits.items()]
+    
+    @staticmethod
+    def _compile(path: str) -> Pattern:
+        parts = re.split(r"\{[^/}]+\}", path)
+        return re.compile("^" + "[^/]+".join(re.escape(part) for part in parts) + "$")
+    
+    def _limit_for(self, path: str) -> Optional[int]:
+        for pattern, limit in self.limits:
+            if pattern.match(path):
+                return limit
+        return None
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    await self._reject(scope, receive, send, 400, "无效的 Content-Length")
+                    return
+        
+        # 声明的大小已超限：不读取请求体直接拒绝
+        if content_length is not None and content_length > limit:
+            await self._reject(scope, receive, send, 413, f"请求体超过限制 ({limit // (1024 * 1024)}MB)")
+            return
+        
+        received = 0
+        exceeded = False
+        response_started = False
+        
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _RequestTooLarge()
+            return message
+        
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            # 超限后丢弃应用自己生成的错误响应（例如请求体解析失败的 400），改为返回 413
+            if exceeded:
+                return
+            response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _RequestTooLarge:
+            pass
+        
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send, 413, f"请求体超过限制 ({limit // (1024 * 1024)}MB)")
+    
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, status_code: int, detail: str):
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers={"Connection": "close"})
+        await response(scope, receive, send)
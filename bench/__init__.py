@@ -0,0 +1,9 @@
+"""
+性能基准
+
+- bench.seed: 向 podcasts.db 和 ./storage 写入合成的播客数据
+- bench.run: 在进程内启动 uvicorn，按给定并发压测各接口，输出 JSON 报告
+- bench.s3: 用进程内的假 S3 客户端（bench.fake_s3）离线测量分片上传和按范围读取
+
+seed 和 run 都在 --workdir 指定的目录中运行（默认 ./bench_data），不会改动项目自身的数据库和文件。
+"""
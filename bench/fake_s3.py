@@ -0,0 +1,167 @@
+"""
+进程内的假 S3 客户端
+
+实现 backend.s3.S3Store 用到的 boto3 客户端方法，对象保存在内存中，供测试和 bench.s3 使用，不需要网络。
+可以给每次调用加上固定延迟（模拟往返时间）和按数据量计算的传输时间（模拟单连接带宽），
+或让指定方法的前几次调用失败（检验重试和中止）。keep_data=False 时不保存对象内容，基准测内存时不计入存储桶本身。
+
+用法:
+    client = FakeS3Client(latency=0.01)
+    client.fail("upload_part", times=2)
+    store = S3Store("bucket", client=client)
+"""
+import hashlib
+import io
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+class FakeClientError(Exception):
+    """形如 botocore ClientError 的错误（带 response 字段）"""
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+class FakeS3Client:
+    """内存中的存储桶（线程安全）"""
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0, keep_data: bool = True):
+        """
+        参数:
+            latency: 每次调用的额外延迟（秒）
+            bandwidth: 每个连接的传输速度（字节/秒），0 表示不限
+            keep_data: 是否保存对象内容；为 False 时对象读出为空
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.keep_data = keep_data
+        self.objects: Dict[str, bytes] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}  # UploadId -> {"key", "parts": {编号: (ETag, 数据)}}
+        self.calls: Counter = Counter()
+        self.aborted: List[str] = []
+        self.max_parts_in_flight = 0
+        self._parts_in_flight = 0
+        self._failures: Dict[str, List[BaseException]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def fail(self, method: str, times: int = 1, exc: Callable[[str], BaseException] = ConnectionError):
+        """让 method 接下来的 times 次调用抛出 exc(说明)"""
+        with self._lock:
+            self._failures[method].extend(exc(f"injected {method} failure") for _ in range(times))
+
+    def _enter(self, method: str, size: int = 0):
+        with self._lock:
+            self.calls[method] += 1
+            failures = self._failures.get(method)
+            failure = failures.pop(0) if failures else None
+        delay = self.latency + (size / self.bandwidth if self.bandwidth else 0.0)
+        if delay:
+            time.sleep(delay)
+        if failure is not None:
+            raise failure
+
+    def _get(self, key: str) -> bytes:
+        with self._lock:
+            data = self.objects.get(key)
+        if data is None:
+            raise FakeClientError("NoSuchKey", key)
+        return data
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs) -> Dict[str, Any]:
+        self._enter("put_object", len(Body))
+        with self._lock:
+            self.objects[Key] = bytes(Body) if self.keep_data else b""
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        self._enter("create_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {"key": Key, "parts": {}}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes) -> Dict[str, Any]:
+        with self._lock:
+            self._parts_in_flight += 1
+            self.max_parts_in_flight = max(self.max_parts_in_flight, self._parts_in_flight)
+        try:
+            self._enter("upload_part", len(Body))
+            etag = hashlib.md5(Body).hexdigest()
+            with self._lock:
+                upload = self.uploads.get(UploadId)
+                if upload is None:
+                    raise FakeClientError("NoSuchUpload", UploadId)
+                upload["parts"][PartNumber] = (etag, bytes(Body) if self.keep_data else b"")
+            return {"ETag": etag}
+        finally:
+            with self._lock:
+                self._parts_in_flight -= 1
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, Any]):
+        self._enter("complete_multipart_upload")
+        with self._lock:
+            upload = self.uploads.pop(UploadId, None)
+            if upload is None:
+                raise FakeClientError("NoSuchUpload", UploadId)
+            chunks = []
+            for part in MultipartUpload["Parts"]:
+                etag, data = upload["parts"].get(part["PartNumber"], (None, b""))
+                if etag != part["ETag"]:
+                    raise FakeClientError("InvalidPart", str(part["PartNumber"]))
+                chunks.append(data)
+            self.objects[Key] = b"".join(chunks)
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str):
+        self._enter("abort_multipart_upload")
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+            self.aborted.append(UploadId)
+        return {}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        self._enter("head_object")
+        try:
+            return {"ContentLength": len(self._get(Key))}
+        except FakeClientError:
+            raise FakeClientError("404", Key)
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None) -> Dict[str, Any]:
+        data = self._get(Key)
+        if Range:
+            start, end = Range.removeprefix("bytes=").split("-")
+            data = data[int(start):int(end) + 1]
+        self._enter("get_object", len(data))
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def copy_object(self, Bucket: str, Key: str, CopySource: Dict[str, str]):
+        self._enter("copy_object")
+        data = self._get(CopySource["Key"])
+        with self._lock:
+            self.objects[Key] = data
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str):
+        self._enter("delete_object")
+        with self._lock:
+            self.objects.pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any]):
+        self._enter("delete_objects")
+        with self._lock:
+            for item in Delete["Objects"]:
+                self.objects.pop(item["Key"], None)
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", ContinuationToken: Optional[str] = None):
+        self._enter("list_objects_v2")
+        with self._lock:
+            contents = [
+                {"Key": key, "Size": len(data)}
+                for key, data in sorted(self.objects.items()) if key.startswith(Prefix)
+            ]
+        return {"Contents": contents, "IsTruncated": False}
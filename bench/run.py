@@ -0,0 +1,452 @@
+"""
+后端性能基准
+
+在进程内启动 uvicorn（真实的 HTTP 和连接），按给定并发依次压测:
+- list: GET /api/episodes（随机翻到前若干页之一）
+- get: GET /api/episodes/{id}（随机 ID）
+- create: POST /api/episodes，音频大小在 --file-sizes-mb 之间轮换（请求体流式生成，不占客户端内存）
+- delete: DELETE /api/episodes/{id}，删除 create 阶段创建的播客
+
+报告为 JSON：每个 (场景, 并发) 的吞吐量、p50/p95/p99 延迟、状态码分布和峰值 RSS。
+--compare 与之前的报告逐项对比，吞吐量下降或 p95 上升超过 --tolerance 时以状态码 1 退出。
+
+用法:
+    python -m bench.run --seed-episodes 100000 --concurrency 1,10,50 --output bench_report.json
+    python -m bench.run --compare baseline.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bench.seed import DEFAULT_WORKDIR, PROJECT_DIR, enter_workdir, make_png, seed, wav_header
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = ("list", "get", "create", "delete")
+LIST_PAGE_SIZE = 20
+LIST_PAGES = 50  # list 场景随机访问的页数
+REPORT_VERSION = 1
+
+# ==================== 请求体 ====================
+
+class _Repeat:
+    """length 字节的重复内容（不在内存中展开）"""
+
+    def __init__(self, pattern: bytes, length: int):
+        self.pattern = pattern
+        self.length = length
+
+class StreamingBody:
+    """
+    由 bytes 和 _Repeat 拼接而成的只读文件对象
+
+    http.client 按块调用 read() 发送，50MB 的请求体也只占用一个块的内存。
+    """
+
+    def __init__(self, segments: List):
+        self._segments = segments
+        self._index = 0
+        self._offset = 0
+        self.length = sum(len(s) if isinstance(s, bytes) else s.length for s in segments)
+
+    def read(self, size: int = -1) -> bytes:
+        while self._index < len(self._segments):
+            segment = self._segments[self._index]
+            total = len(segment) if isinstance(segment, bytes) else segment.length
+            remaining = total - self._offset
+            if remaining <= 0:
+                self._index += 1
+                self._offset = 0
+                continue
+            n = remaining if size is None or size < 0 else min(size, remaining)
+            if isinstance(segment, bytes):
+                chunk = segment[self._offset:self._offset + n]
+            else:
+                start = self._offset % len(segment.pattern)
+                repeats = (start + n) // len(segment.pattern) + 1
+                chunk = (segment.pattern * repeats)[start:start + n]
+            self._offset += n
+            return chunk
+        return b""
+
+def episode_form(audio_size: int, seed_value: int) -> Tuple[StreamingBody, str]:
+    """
+    POST /api/episodes 的 multipart 请求体
+
+    音频为 audio_size 字节的 WAV，内容由 seed_value 决定（每次不同，避免被去重）。
+
+    返回:
+        (请求体, Content-Type)
+    """
+    boundary = uuid.uuid4().hex
+    data_size = audio_size - len(wav_header(0))
+
+    def field(name: str, value: str) -> bytes:
+        return (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n"
+        ).encode()
+
+    def file_header(name: str, filename: str, content_type: str) -> bytes:
+        return (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+
+    segments = [
+        field("title", f"Benchmark episode {seed_value}"),
+        field("description", "Uploaded by bench.run"),
+        file_header("audio_file", "bench.wav", "audio/wav"),
+        wav_header(data_size),
+        _Repeat(seed_value.to_bytes(8, "little") + b"benchwav", data_size),
+        b"\r\n",
+        file_header("image_file", "bench.png", "image/png"),
+        make_png(seed_value % 64),
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    return StreamingBody(segments), f"multipart/form-data; boundary={boundary}"
+
+# ==================== 服务器和客户端 ====================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class BackendServer:
+    """在后台线程中运行的 uvicorn（与客户端同一进程）"""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from backend.main import app
+
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "BackendServer":
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn 启动失败")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+class Client:
+    """每个线程一个 keep-alive 连接"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=300)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+# ==================== 压测 ====================
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程（服务器和客户端）的峰值常驻内存"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_load(name: str, concurrency: int, count: int, task: Callable[[int], Tuple[int, int]]) -> dict:
+    """
+    以 concurrency 个线程执行 count 次 task
+
+    task(i) 发送第 i 个请求，返回 (状态码, 上传字节数)。
+    """
+    latencies = []
+    statuses = Counter()
+    uploaded = 0
+    lock = threading.Lock()
+
+    def timed(i: int):
+        nonlocal uploaded
+        start = time.perf_counter()
+        try:
+            status, sent = task(i)
+        except Exception as e:
+            status, sent = type(e).__name__, 0
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] += 1
+            uploaded += sent
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(count)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": errors,
+        "status_counts": dict(statuses),
+        "seconds": round(wall, 3),
+        "throughput_rps": round(count / wall, 2) if wall > 0 else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if uploaded:
+        result["upload_mb_per_s"] = round(uploaded / (1024 * 1024) / wall, 2)
+    print(
+        f"  {name:<7} c={concurrency:<3} {result['throughput_rps']:>9} req/s  "
+        f"p50 {result['latency_ms']['p50']:>9}ms  p95 {result['latency_ms']['p95']:>9}ms  "
+        f"p99 {result['latency_ms']['p99']:>9}ms  errors {errors}"
+    )
+    return result
+
+def collect_list_paths(client: Client, pages: int) -> List[str]:
+    """按游标依次取前 pages 页，返回各页的请求路径"""
+    paths = [f"/api/episodes?limit={LIST_PAGE_SIZE}"]
+    while len(paths) < pages:
+        status, body = client.request("GET", paths[-1])
+        cursor = json.loads(body).get("next_cursor") if status == 200 else None
+        if not cursor:
+            break
+        paths.append(f"/api/episodes?limit={LIST_PAGE_SIZE}&cursor={cursor}")
+    return paths
+
+def episode_id_range() -> Tuple[int, int]:
+    from backend.db import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM episodes").fetchone()
+    finally:
+        conn.close()
+    return low or 0, high or 0
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """按参数执行全部场景，返回报告"""
+    seeded = seed(args.seed_episodes, reset=True, seed_value=args.seed) if args.seed_episodes else None
+
+    from backend.db import init_db
+    init_db()
+    low, high = episode_id_range()
+    if high == 0 and ("list" in args.scenarios or "get" in args.scenarios):
+        print("⚠️  数据库中没有播客，先用 --seed-episodes 或 python -m bench.seed 生成数据")
+
+    rng = random.Random(args.seed)
+    sizes = [int(mb * 1024 * 1024) for mb in args.file_sizes_mb]
+    results = []
+    with BackendServer(_free_port()) as server:
+        client = Client(server.port)
+        list_paths = collect_list_paths(client, LIST_PAGES)
+        created: List[int] = []
+        created_lock = threading.Lock()
+
+        def list_task(i: int) -> Tuple[int, int]:
+            return client.request("GET", rng.choice(list_paths))[0], 0
+
+        def get_task(i: int) -> Tuple[int, int]:
+            return client.request("GET", f"/api/episodes/{rng.randint(low, high)}")[0], 0
+
+        def create_task(i: int) -> Tuple[int, int]:
+            body, content_type = episode_form(sizes[i % len(sizes)], rng.getrandbits(62))
+            status, payload = client.request("POST", "/api/episodes", body, {
+                "Content-Type": content_type, "Content-Length": str(body.length)
+            })
+            if status == 200:
+                with created_lock:
+                    created.append(json.loads(payload)["id"])
+            return status, body.length
+
+        def delete_task(i: int) -> Tuple[int, int]:
+            with created_lock:
+                episode_id = created.pop()
+            return client.request("DELETE", f"/api/episodes/{episode_id}")[0], 0
+
+        for concurrency in args.concurrency:
+            for name in args.scenarios:
+                if name == "list":
+                    results.append(run_load(name, concurrency, args.requests, list_task))
+                elif name == "get":
+                    results.append(run_load(name, concurrency, args.requests, get_task))
+                elif name == "create":
+                    results.append(run_load(name, concurrency, args.create_requests, create_task))
+                elif name == "delete":
+                    if not created:
+                        print("  delete  跳过（没有 create 阶段创建的播客）")
+                        continue
+                    results.append(run_load(name, concurrency, len(created), delete_task))
+
+    return {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "config": {
+            "seed_episodes": args.seed_episodes,
+            "catalog_episodes": high - low + 1 if high else 0,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "create_requests": args.create_requests,
+            "file_sizes_mb": args.file_sizes_mb,
+            "scenarios": args.scenarios,
+            "seed": args.seed,
+        },
+        "seeding": seeded,
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sqlite": __import__("sqlite3").sqlite_version,
+    }
+
+# ==================== 对比 ====================
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    逐项对比两份报告
+
+    返回:
+        回归说明列表（吞吐量下降或 p95 上升超过 tolerance 的项），为空表示没有回归
+    """
+    for key in ("catalog_episodes", "requests", "create_requests", "file_sizes_mb"):
+        if report["config"].get(key) != baseline.get("config", {}).get(key):
+            print(f"⚠️  两份报告的 {key} 不同，结果可能不可比")
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'scenario':<8} {'c':>3} {'req/s':>18} {'p95 ms':>22} {'p99 ms':>22}")
+    for result in report["results"]:
+        key = (result["scenario"], result["concurrency"])
+        old = previous.get(key)
+        if old is None:
+            continue
+
+        def change(new_value, old_value) -> Optional[float]:
+            if not old_value or new_value is None:
+                return None
+            return (new_value - old_value) / old_value
+
+        rps = change(result["throughput_rps"], old["throughput_rps"])
+        p95 = change(result["latency_ms"]["p95"], old["latency_ms"]["p95"])
+        p99 = change(result["latency_ms"]["p99"], old["latency_ms"]["p99"])
+        fmt = lambda value: "   n/a" if value is None else f"{value:+6.1%}"
+        print(
+            f"{key[0]:<8} {key[1]:>3} {result['throughput_rps']:>10} {fmt(rps)} "
+            f"{result['latency_ms']['p95']:>14} {fmt(p95)} {result['latency_ms']['p99']:>14} {fmt(p99)}"
+        )
+        if rps is not None and rps < -tolerance:
+            regressions.append(f"{key[0]} c={key[1]}: 吞吐量 {rps:+.1%}")
+        if p95 is not None and p95 > tolerance:
+            regressions.append(f"{key[0]} c={key[1]}: p95 {p95:+.1%}")
+    return regressions
+
+# ==================== 命令行 ====================
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+def _float_list(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v.strip()]
+
+def _scenario_list(value: str) -> List[str]:
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知场景: {', '.join(sorted(unknown))}")
+    return names
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="后端性能基准")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="数据库和存储所在目录")
+    parser.add_argument("--seed-episodes", type=int, default=0, help="压测前清空并生成 N 条合成播客（0 表示使用已有数据）")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 10, 50], help="并发数，逗号分隔")
+    parser.add_argument("--requests", type=int, default=500, help="list / get 每轮的请求数")
+    parser.add_argument("--create-requests", type=int, default=20, help="create 每轮的请求数")
+    parser.add_argument("--file-sizes-mb", type=_float_list, default=[1, 10, 50], help="create 的音频大小（MB），轮流使用")
+    parser.add_argument("--scenarios", type=_scenario_list, default=list(SCENARIOS), help="要执行的场景，逗号分隔")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default="bench_report.json", help="报告路径")
+    parser.add_argument("--compare", help="与之前的报告对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="判定为回归的相对变化")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    # 工作目录切换前解析相对路径
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    enter_workdir(args.workdir)
+
+    report = run_benchmark(args)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📄 报告已写入 {output}（峰值 RSS {report['peak_rss_mb']}MB）")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ 性能回归:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✅ 没有超过容差的回归")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+S3 存储的离线基准
+
+用 bench.fake_s3 的进程内假客户端代替存储桶（每次请求加上往返延迟，按单连接带宽计算传输时间），
+不需要网络和凭据，测量 backend.s3.S3Store:
+- upload: 不同文件大小和分片并发下的上传耗时、吞吐量、请求数和峰值内存（tracemalloc）
+- range: 只读取文件头（解析音频信息的场景）时按范围读取与下载整个对象的耗时和请求数
+
+分片并行时吞吐量应随并发近似线性增长；峰值内存约为 分片大小 × (并发 + 1)，与文件大小无关。
+
+用法:
+    python -m bench.s3 --sizes-mb 8,64,256 --concurrency 1,4,8 --output s3_report.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+from bench.seed import PROJECT_DIR
+
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from backend.s3 import S3Store
+from bench.fake_s3 import FakeS3Client
+
+MB = 1024 * 1024
+HEADER_BYTES = 4096  # 解析音频信息时读取的文件头大小
+
+class SyntheticFile(io.RawIOBase):
+    """给定长度的只读数据流，内容由一个 1MB 的块重复而成，不在内存中保留整个文件"""
+
+    def __init__(self, size: int):
+        self._remaining = size
+        self._block = os.urandom(MB)
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytearray:
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        self._remaining -= size
+        # 与 UploadFile.read 一样每次只分配一块
+        data = bytearray(size)
+        for offset in range(0, size, len(self._block)):
+            data[offset:offset + len(self._block)] = self._block[:size - offset]
+        return data
+
+def bench_upload(size: int, concurrency: int, part_size: int, latency: float, bandwidth: float) -> dict:
+    client = FakeS3Client(latency=latency, bandwidth=bandwidth, keep_data=False)
+    store = S3Store("bench", client=client, part_size=part_size, max_concurrency=concurrency)
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        store.upload_fileobj(SyntheticFile(size), "bench/upload.bin")
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        store.close()
+    return {
+        "size_mb": size // MB,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "mb_per_second": round(size / MB / elapsed, 1),
+        "requests": sum(client.calls.values()),
+        "max_parts_in_flight": client.max_parts_in_flight,
+        "peak_memory_mb": round(peak / MB, 1),
+    }
+
+def bench_range(size: int, part_size: int, latency: float, bandwidth: float) -> dict:
+    client = FakeS3Client(latency=latency, bandwidth=bandwidth)
+    client.objects["bench/audio.wav"] = os.urandom(size)
+    store = S3Store("bench", client=client, part_size=part_size)
+    try:
+        start = time.perf_counter()
+        with store.open_reader("bench/audio.wav", size) as reader:
+            reader.read(HEADER_BYTES)
+        ranged = time.perf_counter() - start
+        ranged_requests = client.calls["get_object"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            store.download_file("bench/audio.wav", os.path.join(directory, "audio.wav"))
+            full = time.perf_counter() - start
+    finally:
+        store.close()
+    return {
+        "size_mb": size // MB,
+        "header_bytes": HEADER_BYTES,
+        "ranged_ms": round(ranged * 1000, 1),
+        "ranged_requests": ranged_requests,
+        "download_ms": round(full * 1000, 1),
+    }
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="S3 存储的离线基准（进程内假客户端）")
+    parser.add_argument("--sizes-mb", type=parse_list, default=[8, 64, 256], help="上传的文件大小（MB），逗号分隔")
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 4, 8], help="每个上传同时在途的分片数，逗号分隔")
+    parser.add_argument("--part-size-mb", type=int, default=8, help="分片大小（MB）")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="每个请求的往返延迟（毫秒）")
+    parser.add_argument("--bandwidth-mb", type=float, default=50.0, help="单连接带宽（MB/s）")
+    parser.add_argument("--range-size-mb", type=int, default=64, help="range 场景的对象大小（MB）")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    part_size = args.part_size_mb * MB
+    latency = args.latency_ms / 1000
+    bandwidth = args.bandwidth_mb * MB
+
+    print(f"分片 {args.part_size_mb}MB，往返 {args.latency_ms:g}ms，单连接 {args.bandwidth_mb:g}MB/s")
+    uploads = []
+    for size_mb in args.sizes_mb:
+        for concurrency in args.concurrency:
+            result = bench_upload(size_mb * MB, concurrency, part_size, latency, bandwidth)
+            uploads.append(result)
+            print(
+                f"  upload {size_mb:>5}MB  并发 {concurrency:>2}  {result['seconds']:>8.3f}s  "
+                f"{result['mb_per_second']:>7.1f}MB/s  {result['requests']:>4} 请求  峰值内存 {result['peak_memory_mb']:>6.1f}MB"
+            )
+
+    ranged = bench_range(args.range_size_mb * MB, part_size, latency, bandwidth)
+    print(
+        f"  range  {ranged['size_mb']:>5}MB  读取文件头 {ranged['ranged_ms']:.1f}ms（{ranged['ranged_requests']} 请求）"
+        f"，下载整个对象 {ranged['download_ms']:.1f}ms"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "part_size_mb": args.part_size_mb,
+                "latency_ms": args.latency_ms,
+                "bandwidth_mb": args.bandwidth_mb,
+                "upload": uploads,
+                "range": ranged,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
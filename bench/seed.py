@@ -0,0 +1,168 @@
+"""
+合成播客目录生成器
+
+按 backend.db 的表结构批量写入 N 条播客（例如 1k / 100k / 1M）。
+音频和封面是少量真实存在的内容寻址文件，由所有记录轮流引用（与去重后的线上数据一致），
+blobs 表的引用计数与之对应，因此生成的数据可以正常列出、读取和删除。
+
+用法:
+    python -m bench.seed --episodes 100000 [--workdir ./bench_data] [--reset]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_WORKDIR = os.path.join(PROJECT_DIR, "bench_data")
+BATCH_SIZE = 10000  # 每个事务插入的记录数
+
+WORDS = (
+    "podcast interview startup founder product design engineering market growth funding "
+    "research science music history culture travel health education climate energy "
+    "software hardware robotics language learning community story weekly episode"
+).split()
+
+def wav_header(data_size: int, sample_rate: int = 8000) -> bytes:
+    """单声道 8 位 PCM 的 WAV 文件头，data 块长度为 data_size"""
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate, 1, 8)
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+def make_wav(size: int, seed: int) -> bytes:
+    """总长为 size 字节的 WAV 文件，seed 不同则内容不同"""
+    data_size = size - len(wav_header(0))
+    marker = seed.to_bytes(8, "little")
+    return wav_header(data_size) + (marker * (data_size // 8 + 1))[:data_size]
+
+def make_png(seed: int, width: int = 64, height: int = 64) -> bytes:
+    """纯色 RGB PNG，颜色由 seed 决定"""
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+    rng = random.Random(seed)
+    pixel = bytes(rng.randrange(256) for _ in range(3))
+    raw = (b"\x00" + pixel * width) * height
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+def _write_blob(storage, subfolder: str, filename: str, content: bytes) -> Tuple[str, str, int]:
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = storage.blob_path(subfolder, sha256, filename)
+    full_path = os.path.join(storage.STORAGE_BASE_DIR, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    if not os.path.exists(full_path):
+        with open(full_path, "wb") as f:
+            f.write(content)
+    return sha256, path, len(content)
+
+def seed(episodes: int, distinct_files: int = 16, audio_kb: int = 64, reset: bool = False, seed_value: int = 0) -> dict:
+    """
+    写入合成数据（在当前目录的 podcasts.db 和 ./storage 中）
+
+    参数:
+        episodes: 记录数
+        distinct_files: 不同的音频文件数和封面文件数
+        audio_kb: 每个音频文件的大小（KB）
+        reset: 先清空数据库
+        seed_value: 随机种子，相同参数生成相同的数据
+
+    返回:
+        统计信息
+    """
+    from backend import db, storage
+
+    if reset:
+        db.reset_db()
+    else:
+        db.init_db()
+
+    start = time.perf_counter()
+    audio = [_write_blob(storage, "audio", "seed.wav", make_wav(audio_kb * 1024, i)) for i in range(distinct_files)]
+    images = [_write_blob(storage, "images", "seed.png", make_png(i)) for i in range(distinct_files)]
+    duration = (audio_kb * 1024 - len(wav_header(0))) / 8000
+
+    rng = random.Random(seed_value)
+    base_time = datetime(2024, 1, 1)
+    refcounts = {}
+    conn = db.get_db_connection()
+    try:
+        for batch_start in range(0, episodes, BATCH_SIZE):
+            rows = []
+            for i in range(batch_start, min(batch_start + BATCH_SIZE, episodes)):
+                audio_sha, audio_path, audio_size = audio[i % distinct_files]
+                image_sha, image_path, _ = images[i % distinct_files]
+                refcounts[audio_sha] = refcounts.get(audio_sha, 0) + 1
+                refcounts[image_sha] = refcounts.get(image_sha, 0) + 1
+                rows.append((
+                    f"Synthetic episode {i}: {' '.join(rng.sample(WORDS, 3))}",
+                    " ".join(rng.choices(WORDS, k=40)),
+                    audio_path, image_path,
+                    (base_time + timedelta(seconds=i * 60)).isoformat(),
+                    audio_size, audio_sha, json.dumps([]),
+                    duration, 64, 8000, 1
+                ))
+            with conn:
+                conn.executemany("""
+                    INSERT INTO episodes (
+                        title, description, audio_path, image_path, created_at, audio_size, audio_sha256, image_variants,
+                        duration_seconds, bitrate_kbps, sample_rate, channels
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+            print(f"  {min(batch_start + BATCH_SIZE, episodes)}/{episodes}", end="\r", flush=True)
+
+        with conn:
+            conn.executemany("""
+                INSERT INTO blobs (sha256, path, size, refcount) VALUES (?, ?, ?, ?)
+                ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + excluded.refcount
+            """, [
+                (sha256, path, size, refcounts[sha256])
+                for sha256, path, size in audio + images if sha256 in refcounts
+            ])
+        total = conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ 已写入 {episodes} 条播客（共 {total} 条），用时 {elapsed:.1f}s")
+    return {"inserted": episodes, "total": total, "seconds": round(elapsed, 3)}
+
+def enter_workdir(workdir: str):
+    """切换到基准目录（数据库和存储路径都相对于当前目录），之后仍可导入 backend"""
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="生成合成播客目录")
+    parser.add_argument("--episodes", type=int, required=True, help="记录数，例如 1000 / 100000 / 1000000")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="数据库和存储所在目录")
+    parser.add_argument("--distinct-files", type=int, default=16, help="不同的音频/封面文件数")
+    parser.add_argument("--audio-kb", type=int, default=64, help="每个音频文件的大小（KB）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--reset", action="store_true", help="先清空数据库")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    enter_workdir(args.workdir)
+    seed(args.episodes, args.distinct_files, args.audio_kb, args.reset, args.seed)
+
+if __name__ == "__main__":
+    main()
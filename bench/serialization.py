@@ -0,0 +1,107 @@
+"""
+列表响应的序列化基准
+
+比较 N 条播客（默认 10k）编码为 EpisodePage JSON 的几种方式:
+- models: 逐行构建 EpisodeResponse，再按 response_model 校验、jsonable_encoder 和标准库 json 编码
+  （FastAPI 对返回模型的路由所做的处理）
+- rows: 数据库记录直接编码（缓存关闭时的快速路径）
+- cached: 拼接目录中已编码的各播客（缓存开启时的快速路径）
+
+用法:
+    python -m bench.serialization --rows 10000 [--repeat 20] [--output serialization.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+from bench.seed import PROJECT_DIR, WORDS
+
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.models import (
+    EpisodePage, encode_episode, episode_from_row, episode_json_from_row, episode_page_json, orjson
+)
+
+def synthetic_rows(count: int, seed_value: int = 0) -> List[dict]:
+    """与 episodes 表列相同的合成记录（每条带两个封面缩略图）"""
+    rng = random.Random(seed_value)
+    rows = []
+    for i in range(1, count + 1):
+        sha = f"{rng.getrandbits(256):064x}"
+        rows.append({
+            "id": i,
+            "title": f"Synthetic episode {i}: {' '.join(rng.sample(WORDS, 3))}",
+            "description": " ".join(rng.choices(WORDS, k=40)),
+            "audio_path": f"audio/{sha[:2]}/{sha}.mp3",
+            "image_path": f"images/{sha[:2]}/{sha}.jpg",
+            "created_at": f"2024-01-01T12:{i // 60 % 60:02d}:{i % 60:02d}",
+            "image_variants": json.dumps([
+                {"width": width, "format": "webp", "path": f"images/{sha[:2]}/{sha}_w{width}.webp"}
+                for width in (320, 640)
+            ]),
+            "duration_seconds": rng.uniform(60, 3600),
+            "bitrate_kbps": 128,
+            "sample_rate": 44100,
+            "channels": 2,
+        })
+    return rows
+
+def via_models(rows: List[dict]) -> bytes:
+    page = EpisodePage(items=[episode_from_row(row) for row in rows], next_cursor=None, total=len(rows))
+    validated = EpisodePage.model_validate(page.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+def via_rows(rows: List[dict]) -> bytes:
+    return episode_page_json([episode_json_from_row(row) for row in rows], None, len(rows))
+
+def measure(func: Callable[[], bytes], repeat: int) -> dict:
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+    }
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="列表响应的序列化基准")
+    parser.add_argument("--rows", type=int, default=10000, help="播客条数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种方式的重复次数")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    rows = synthetic_rows(args.rows)
+    encoded = [encode_episode(episode_from_row(row)) for row in rows]
+
+    # 三种方式的输出必须相同，否则对比没有意义
+    expected = via_models(rows)
+    assert via_rows(rows) == expected, "rows 路径的输出与模型序列化不一致"
+    assert episode_page_json(encoded, None, len(rows)) == expected, "cached 路径的输出与模型序列化不一致"
+
+    results = {
+        "models": measure(lambda: via_models(rows), args.repeat),
+        "rows": measure(lambda: via_rows(rows), args.repeat),
+        "cached": measure(lambda: episode_page_json(encoded, None, len(rows)), args.repeat),
+    }
+    baseline = results["models"]["median_ms"]
+    print(f"{args.rows} 条播客，{len(expected) / 1024 / 1024:.1f}MB JSON，orjson {'已' if orjson else '未'}安装")
+    for name, result in results.items():
+        result["speedup"] = round(baseline / result["median_ms"], 1) if result["median_ms"] else None
+        print(f"  {name:<7} {result['median_ms']:>10.3f}ms  x{result['speedup']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "orjson": orjson is not None, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+测试夹具
+
+每个测试在自己的临时目录中运行（数据库和存储目录都是相对路径），结束时关闭连接池。
+对象存储使用 bench.fake_s3 的进程内假客户端，不需要网络。
+"""
+import os
+
+import pytest
+
+from backend import db, s3, storage
+from bench.fake_s3 import FakeS3Client
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """在临时目录中运行，避免改动项目自身的数据库和文件"""
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    db.close_pool()
+
+@pytest.fixture
+def database(workdir):
+    """已初始化的空数据库"""
+    db.init_db()
+    return workdir
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    """STORAGE_BACKEND=s3，共享的 S3Store 使用假客户端；重试不等待"""
+    client = FakeS3Client()
+    store = s3.S3Store("test-bucket", client=client, part_size=64 * 1024)
+    monkeypatch.setattr(s3, "_store", store)
+    monkeypatch.setattr(s3, "S3_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "s3")
+    monkeypatch.setattr(storage, "MEDIA_CACHE_MAX_BYTES", 0)
+    yield client
+    store.close()
+
+@pytest.fixture
+def client(workdir):
+    """本地存储的 API 客户端，在临时目录中运行应用的启动和关闭"""
+    from fastapi.testclient import TestClient
+
+    # main 在导入时按 ./storage 是否存在决定是否挂载静态目录
+    os.makedirs("storage", exist_ok=True)
+    from backend.main import app
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,60 @@
+"""前端 API 客户端：请求在缓存锁之外执行，同一页的并发请求只发一次"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import ApiClient
+
+class FakeResponse:
+    status_code = 200
+    headers = {"ETag": '"v1"'}
+
+    def __init__(self, params):
+        self._data = {"items": [], "next_cursor": None, "total": 0, "params": params}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+def slow_client(delay: float):
+    client = ApiClient(base_url="http://backend", ttl=60)
+    calls = []
+    in_flight = [0, 0]  # 当前, 最大
+    lock = threading.Lock()
+
+    def get(path, params=None, etag=None):
+        with lock:
+            calls.append(dict(params))
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(delay)
+        with lock:
+            in_flight[0] -= 1
+        return FakeResponse(params)
+
+    client._get = get
+    return client, calls, in_flight
+
+def test_different_pages_are_fetched_in_parallel():
+    client, calls, in_flight = slow_client(0.1)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pages = list(pool.map(lambda i: client.list_page(10, f"cursor{i}"), range(4)))
+
+    assert len(calls) == 4
+    assert in_flight[1] == 4
+    assert [page["params"]["cursor"] for page in pages] == [f"cursor{i}" for i in range(4)]
+
+def test_same_page_is_requested_once():
+    client, calls, _ = slow_client(0.1)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pages = list(pool.map(lambda _: client.list_page(10), range(4)))
+
+    assert len(calls) == 1
+    assert all(page is pages[0] for page in pages)
+    # 在 TTL 内直接返回缓存
+    client.list_page(10)
+    assert len(calls) == 1
@@ -0,0 +1,137 @@
+"""音频元数据：只读文件头解析 MP3 / WAV / M4A，截断和无法识别的数据返回 None 而不抛出异常"""
+import io
+import random
+import struct
+
+import pytest
+
+from backend.audio_meta import AudioMetadata, probe_audio_file
+
+# MPEG-1 Layer III，128kbps，44100Hz，立体声，无填充：每帧 417 字节、1152 个采样
+MP3_HEADER = b"\xff\xfb\x90\x00"
+MP3_FRAME_LENGTH = 417
+FRAMES = 100
+
+def probe(data: bytes):
+    return probe_audio_file(io.BytesIO(data), len(data))
+
+def id3v2(payload_size: int) -> bytes:
+    size = bytes((payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + size + b"\x00" * payload_size
+
+def mp3_frame(payload: bytes = b"") -> bytes:
+    return (MP3_HEADER + payload).ljust(MP3_FRAME_LENGTH, b"\x00")
+
+def mp3_cbr() -> bytes:
+    return id3v2(100) + mp3_frame() * FRAMES
+
+def mp3_xing(total_frames: int) -> bytes:
+    # 立体声 MPEG-1 的 side info 为 32 字节，Xing 头紧随其后
+    xing = b"\x00" * 32 + b"Xing" + struct.pack(">II", 0x01, total_frames)
+    return mp3_frame(xing) + mp3_frame() * FRAMES
+
+def mp3_vbri(total_frames: int) -> bytes:
+    # VBRI 头固定在帧头之后 32 字节处：版本、延迟、质量、字节数、帧数
+    vbri = b"\x00" * 32 + b"VBRI" + struct.pack(">HHHII", 1, 0, 75, MP3_FRAME_LENGTH * FRAMES, total_frames)
+    return mp3_frame(vbri) + mp3_frame() * FRAMES
+
+def wav(seconds: float = 1.0, sample_rate: int = 44100, channels: int = 2, data_size: int = None) -> bytes:
+    byte_rate = sample_rate * channels * 2
+    samples = b"\x00" * int(byte_rate * seconds)
+    fmt = struct.pack("<HHIIHH", 1, channels, sample_rate, byte_rate, channels * 2, 16)
+    body = (
+        b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(samples) if data_size is None else data_size) + samples
+    )
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+def atom(kind: bytes, *children: bytes) -> bytes:
+    body = b"".join(children)
+    return struct.pack(">I", 8 + len(body)) + kind + body
+
+def m4a(seconds: int = 30, sample_rate: int = 44100, channels: int = 2) -> bytes:
+    times = b"\x00" * 8  # 创建和修改时间
+    mvhd = atom(b"mvhd", b"\x00" * 4 + times + struct.pack(">II", 1000, seconds * 1000) + b"\x00" * 80)
+    mdhd = atom(b"mdhd", b"\x00" * 4 + times + struct.pack(">II", sample_rate, seconds * sample_rate) + b"\x00" * 4)
+    hdlr = atom(b"hdlr", b"\x00" * 8 + b"soun" + b"\x00" * 12 + b"SoundHandler\x00")
+    mp4a = atom(
+        b"mp4a",
+        b"\x00" * 6 + struct.pack(">H", 1) + b"\x00" * 8
+        + struct.pack(">HHHHI", channels, 16, 0, 0, sample_rate << 16)
+    )
+    stsd = atom(b"stsd", b"\x00" * 4 + struct.pack(">I", 1) + mp4a)
+    trak = atom(b"trak", atom(b"mdia", mdhd, hdlr, atom(b"minf", atom(b"stbl", stsd))))
+    return (
+        atom(b"ftyp", b"M4A \x00\x00\x00\x00M4A isom")
+        + atom(b"moov", mvhd, trak)
+        + atom(b"mdat", b"\x00" * 4096)
+    )
+
+def test_mp3_cbr_duration_from_file_size():
+    metadata = probe(mp3_cbr())
+
+    audio_bytes = MP3_FRAME_LENGTH * FRAMES
+    assert metadata == AudioMetadata(round(audio_bytes * 8 / 128000, 3), 128, 44100, 2)
+
+def test_mp3_id3v1_tag_is_not_counted_as_audio():
+    data = mp3_cbr() + b"TAG" + b"\x00" * 125
+
+    assert probe(data).duration_seconds == probe(mp3_cbr()).duration_seconds
+
+@pytest.mark.parametrize("build", [mp3_xing, mp3_vbri])
+def test_mp3_vbr_duration_from_frame_count(build):
+    metadata = probe(build(1000))
+
+    duration = 1000 * 1152 / 44100
+    assert metadata.duration_seconds == round(duration, 3)
+    assert metadata.sample_rate == 44100
+    assert metadata.channels == 2
+    # 平均码率按实际数据量和时长计算，而不是首帧码率
+    assert metadata.bitrate_kbps == round(MP3_FRAME_LENGTH * (FRAMES + 1) * 8 / duration / 1000)
+
+def test_wav():
+    assert probe(wav(2.0, 22050, 1)) == AudioMetadata(2.0, 353, 22050, 1)
+
+def test_streamed_wav_with_unknown_data_size():
+    # 流式写入的 WAV 把 data 大小写成 0xFFFFFFFF，按文件剩余部分计算
+    assert probe(wav(1.0, data_size=0xFFFFFFFF)).duration_seconds == 1.0
+
+def test_wav_without_data_chunk_has_no_duration():
+    assert probe(wav()[:36]) == AudioMetadata(None, 1411, 44100, 2)
+
+def test_m4a():
+    data = m4a(30, 48000, 1)
+
+    assert probe(data) == AudioMetadata(30.0, round(len(data) * 8 / 30 / 1000), 48000, 1)
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"ID3",
+    id3v2(100),  # 只有标签
+    b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00",  # fmt 块不完整
+    atom(b"ftyp", b"M4A "),  # 没有 moov
+    b"\x00\x00\x00\x01ftyp",  # 64 位大小字段被截断
+    MP3_HEADER + b"\x00" * (MP3_FRAME_LENGTH + 100),  # 下一帧的位置不是帧头，首个帧头是误匹配
+    b"hello, world" * 100,
+], ids=[
+    "empty", "id3-marker", "id3-only", "wav-short-fmt", "m4a-no-moov", "m4a-short-size",
+    "mp3-false-sync", "text",
+])
+def test_truncated_or_unrecognized_input_returns_none(data):
+    assert probe(data) is None
+
+@pytest.mark.parametrize("build", [mp3_cbr, lambda: mp3_xing(1000), lambda: mp3_vbri(1000), wav, m4a])
+def test_every_truncation_is_handled(build):
+    data = build()
+    for length in range(0, min(len(data), 2048)):
+        result = probe(data[:length])
+        assert result is None or isinstance(result, AudioMetadata)
+
+def test_random_garbage_never_raises():
+    rng = random.Random(0)
+    prefixes = [b"", b"ID3", b"RIFF\xff\xff\xff\xffWAVE", b"\x00\x00\x00\x08ftyp", b"\xff\xfb"]
+    for i in range(500):
+        data = rng.choice(prefixes) + rng.randbytes(rng.randrange(0, 2048))
+        result = probe(data)
+        assert result is None or isinstance(result, AudioMetadata), i
@@ -0,0 +1,76 @@
+"""批量创建：失败的条目不影响其他条目，并在 SAVEPOINT 回滚时归还已登记的引用"""
+import hashlib
+import os
+
+from backend import repository, storage
+from backend.db import db_connection
+from backend.storage import SavedFile
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(4096)
+
+def refcounts():
+    with db_connection() as conn:
+        return {row["sha256"]: row["refcount"] for row in conn.execute("SELECT sha256, refcount FROM blobs")}
+
+def staged_files():
+    return os.listdir(storage.STAGING_DIR) if os.path.isdir(storage.STAGING_DIR) else []
+
+def test_batch_with_one_bad_item_keeps_the_others(client):
+    items = [
+        (("a.mp3", AUDIO, "audio/mpeg"), ("a.png", make_png(1), "image/png"), "First"),
+        (("b.mp3", b"not audio at all" * 10, "audio/mpeg"), ("b.png", make_png(2), "image/png"), "Second"),
+        (("c.mp3", AUDIO, "audio/mpeg"), ("c.png", make_png(3), "image/png"), "Third"),
+    ]
+    files = [("audio_files", audio) for audio, _, _ in items] + [("image_files", image) for _, image, _ in items]
+    data = {"titles": [title for *_, title in items], "descriptions": ["batch test"] * len(items)}
+
+    response = client.post("/api/episodes/batch", data=data, files=files)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [item["error"] is None for item in body["items"]] == [True, False, True]
+    assert body["items"][1]["error"].startswith("音频文件无效")
+    assert [item["title"] for item in client.get("/api/episodes").json()["items"]] == ["Third", "First"]
+    # 两个成功的条目共用同一份音频
+    assert refcounts()[hashlib.sha256(AUDIO).hexdigest()] == 2
+    assert staged_files() == []
+
+def stage(name, data):
+    """把内容写入暂存区，模拟已经保存好的上传"""
+    os.makedirs(storage.STAGING_DIR, exist_ok=True)
+    staged_path = os.path.join(storage.STAGING_DIR, f"{name}.upload")
+    with open(staged_path, "wb") as f:
+        f.write(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    subfolder = "audio" if name.startswith("audio") else "images"
+    return SavedFile(storage.blob_path(subfolder, sha256, f"{name}.bin"), len(data), sha256, staged_path)
+
+def test_failed_item_rolls_back_its_references(database):
+    audio = stage("audio-1", AUDIO)
+    shared_audio = stage("audio-2", AUDIO)
+    cover = stage("image-1", make_png(1))
+    # 按哈希引用、但已经不存在的封面：登记完音频的引用之后才失败
+    missing_cover = SavedFile("images/gone.png", 10, "f" * 64)
+    episodes = [
+        repository.NewEpisode("Good", "kept", audio, cover, "2026-01-01T00:00:00"),
+        repository.NewEpisode("Bad", "rolled back", shared_audio, missing_cover, "2026-01-01T00:00:00"),
+    ]
+
+    with db_connection() as conn:
+        good, bad = repository.insert_episode_rows(conn, episodes)
+
+    assert good["title"] == "Good"
+    assert isinstance(bad, FileNotFoundError)
+    assert refcounts() == {audio.sha256: 1, cover.sha256: 1}
+    with db_connection() as conn:
+        assert [row["title"] for row in conn.execute("SELECT title FROM episodes")] == ["Good"]
+    assert staged_files() == []
+
+    # 引用计数正确：删除唯一的播客后文件随之删除
+    with db_connection() as conn:
+        removed = repository.delete_episode_row(conn, good["id"])
+    repository._remove_files(removed)
+    assert refcounts() == {}
+    assert not os.path.exists(storage.local_media_path(good["audio_path"]))
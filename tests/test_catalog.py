@@ -0,0 +1,110 @@
+"""播客目录缓存：其他连接（其他 worker）的插入和删除按 data_version 增量同步，删除记录被清理后整表重新加载"""
+import json
+
+import pytest
+
+from backend.catalog import EpisodeCatalog
+from backend.db import get_db_connection
+
+@pytest.fixture
+def other_worker(database):
+    """模拟另一个 worker 的数据库连接"""
+    conn = get_db_connection()
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def cache(database):
+    cache = EpisodeCatalog()
+    yield cache
+    cache.close()
+
+def insert(conn, *titles):
+    for title in titles:
+        conn.execute(
+            "INSERT INTO episodes (title, description, audio_path, image_path, created_at, image_variants)"
+            " VALUES (?, '', 'audio/a.mp3', 'images/a.png', strftime('%Y-%m-%dT%H:%M:%f', 'now'), '[]')",
+            (title,),
+        )
+    conn.commit()
+
+def delete(conn, *episode_ids):
+    for episode_id in episode_ids:
+        conn.execute("DELETE FROM episodes WHERE id = ?", (episode_id,))
+    conn.commit()
+
+def ids(cache):
+    items, _ = cache.page_json(100)
+    return [json.loads(item)["id"] for item in items]
+
+def no_full_reload(cache, monkeypatch):
+    def fail(conn):
+        raise AssertionError("应增量同步，不应重新加载整张表")
+    monkeypatch.setattr(cache, "_load", fail)
+
+def test_sync_picks_up_inserts_from_other_workers(cache, other_worker, monkeypatch):
+    insert(other_worker, "one", "two")
+    cache.refresh()
+    assert ids(cache) == [2, 1]
+    no_full_reload(cache, monkeypatch)
+
+    insert(other_worker, "three")
+    cache.refresh()
+
+    assert ids(cache) == [3, 2, 1]
+    assert cache.current_version().tag == "3-3"
+
+def test_sync_after_delete(cache, other_worker, monkeypatch):
+    insert(other_worker, "one", "two", "three")
+    cache.refresh()
+    assert cache.get_json(2) is not None
+    before = cache.current_version()
+    no_full_reload(cache, monkeypatch)
+
+    delete(other_worker, 2)
+    cache.refresh()
+
+    assert ids(cache) == [3, 1]
+    assert cache.get_json(2) is None
+    assert len(cache) == 2
+    after = cache.current_version()
+    assert after.tag == "2-3"
+    assert after.last_modified >= before.last_modified
+
+def test_insert_then_delete_between_syncs_changes_the_tag(cache, other_worker, monkeypatch):
+    insert(other_worker, "one")
+    cache.refresh()
+    no_full_reload(cache, monkeypatch)
+
+    insert(other_worker, "two")
+    delete(other_worker, 2)
+    cache.refresh()
+
+    # 内容相同，但 tag 要与其他 worker 从数据库算出的一致
+    assert ids(cache) == [1]
+    assert cache.current_version().tag == "1-2"
+
+def test_purged_deletion_log_forces_full_reload(cache, other_worker, monkeypatch):
+    insert(other_worker, "one", "two", "three")
+    cache.refresh()
+
+    delete(other_worker, 1, 2)
+    # 模拟删除记录超出保留数量：最早的一条已被清理，无法确认中间没有遗漏
+    other_worker.execute("DELETE FROM episode_deletions WHERE seq = (SELECT MIN(seq) FROM episode_deletions)")
+    other_worker.commit()
+    loads = []
+    original = cache._load
+    monkeypatch.setattr(cache, "_load", lambda conn: loads.append(1) or original(conn))
+    cache.refresh()
+
+    assert loads == [1]
+    assert ids(cache) == [3]
+
+def test_refresh_without_changes_keeps_the_snapshot(cache, other_worker):
+    insert(other_worker, "one")
+    cache.refresh()
+    version = cache.version
+
+    cache.refresh()
+
+    assert cache.version == version
@@ -0,0 +1,65 @@
+"""响应压缩中间件：协商、一次性响应压缩，以及其他消息类型前补发响应头"""
+import asyncio
+import gzip
+
+from backend.compression import CompressionMiddleware
+
+def run(app, accept_encoding: str = "gzip"):
+    """以给定 Accept-Encoding 调用 ASGI 应用，返回发出的消息"""
+    sent = []
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+        "extensions": {"http.response.zerocopy": {}},
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=10)(scope, receive, send))
+    return sent
+
+def response_app(headers, *messages):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for message in messages:
+            await send(message)
+    return app
+
+def test_zerocopy_message_is_preceded_by_response_start():
+    zerocopy = {"type": "http.response.zerocopy", "file": object(), "offset": 0, "count": 100, "more_body": False}
+    app = response_app([(b"content-type", b"audio/wav"), (b"accept-ranges", b"bytes")], zerocopy)
+
+    sent = run(app)
+
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.zerocopy"]
+    assert sent[1] is zerocopy
+    assert b"content-encoding" not in dict(sent[0]["headers"])
+
+def test_compressible_body_is_compressed():
+    body = b'{"items": []}' * 100
+    app = response_app(
+        [(b"content-type", b"application/json"), (b"etag", b'"abc"')],
+        {"type": "http.response.body", "body": body, "more_body": False},
+    )
+
+    start, message = run(app)
+
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"etag"] == b'W/"abc"'
+    assert gzip.decompress(message["body"]) == body
+
+def test_audio_body_is_not_compressed():
+    body = b"RIFF" + b"\x00" * 1000
+    app = response_app([(b"content-type", b"audio/wav")], {"type": "http.response.body", "body": body, "more_body": False})
+
+    start, message = run(app)
+
+    assert b"content-encoding" not in dict(start["headers"])
+    assert message["body"] == body
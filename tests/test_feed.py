@@ -0,0 +1,96 @@
+"""RSS 订阅源：文档结构和 enclosure、特殊字符转义、条件请求和 gzip，以及目录变化后重新生成"""
+import os
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import pytest
+
+from backend import feed
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(4096)
+ITUNES = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+
+@pytest.fixture(autouse=True)
+def fresh_feeds(monkeypatch):
+    # 订阅源缓存按目录版本命中，每个测试的新数据库会产生相同的版本
+    monkeypatch.setattr(feed, "_feeds", OrderedDict())
+
+def create(client, title, audio=AUDIO):
+    response = client.post(
+        "/api/episodes",
+        data={"title": title, "description": "feed test"},
+        files={"audio_file": ("episode.mp3", audio, "audio/mpeg"), "image_file": ("cover.png", make_png(len(title)), "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def items(response):
+    assert response.status_code == 200, response.text
+    return ET.fromstring(response.content).find("channel").findall("item")
+
+def test_feed_document(client):
+    first = create(client, "First")
+    second = create(client, 'Second <b>&</b> "quoted"\x01', audio=AUDIO + b"more")
+
+    response = client.get("/feed.xml")
+
+    assert response.headers["content-type"] == "application/rss+xml; charset=utf-8"
+    root = ET.fromstring(response.content)
+    assert root.tag == "rss" and root.get("version") == "2.0"
+    channel = root.find("channel")
+    assert channel.findtext("title") == feed.FEED_TITLE
+    assert channel.find(f"{ITUNES}image").get("href").startswith("http://testserver/storage/images/")
+
+    newest, oldest = channel.findall("item")
+    # 最新的在前；控制字符被去掉，其余字符转义后原样还原
+    assert newest.findtext("title") == 'Second <b>&</b> "quoted"'
+    assert oldest.findtext("title") == "First"
+    assert newest.findtext("guid") == f"http://testserver/api/episodes/{second['id']}"
+    assert newest.findtext("pubDate").endswith(" GMT")
+
+    for item, episode, audio in ((newest, second, AUDIO + b"more"), (oldest, first, AUDIO)):
+        enclosure = item.find("enclosure")
+        assert enclosure.get("url") == f"http://testserver/api/episodes/{episode['id']}/audio"
+        assert enclosure.get("length") == str(len(audio))
+        assert enclosure.get("type") == "audio/mpeg"
+        assert client.get(enclosure.get("url")).content == audio
+
+def test_empty_feed_is_well_formed(client):
+    assert items(client.get("/feed.xml")) == []
+
+def test_feed_conditional_get_and_gzip(client):
+    create(client, "First")
+    plain = client.get("/feed.xml", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/feed.xml", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in zipped.headers["vary"]
+    # 同一内容的两种表示使用不同的 ETag
+    assert plain.headers["etag"] != zipped.headers["etag"]
+    assert plain.content == zipped.content  # 客户端已解压
+
+    cached = client.get("/feed.xml", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == zipped.headers["etag"]
+    assert client.get("/feed.xml", headers={"If-Modified-Since": plain.headers["last-modified"]}).status_code == 304
+
+def test_feed_follows_catalog_changes(client):
+    first = create(client, "First")
+    etag = client.get("/feed.xml").headers["etag"]
+
+    second = create(client, "Second")
+    response = client.get("/feed.xml", headers={"If-None-Match": etag})
+    assert [item.findtext("title") for item in items(response)] == ["Second", "First"]
+
+    assert client.delete(f"/api/episodes/{first['id']}").status_code == 200
+    response = client.get("/feed.xml")
+    assert [item.findtext("guid").rsplit("/", 1)[1] for item in items(response)] == [str(second["id"])]
+
+def test_feed_is_limited_to_the_latest_items(client, monkeypatch):
+    monkeypatch.setattr(feed, "FEED_MAX_ITEMS", 2)
+    for title in ("One", "Two", "Three"):
+        create(client, title)
+
+    assert [item.findtext("title") for item in items(client.get("/feed.xml"))] == ["Three", "Two"]
@@ -0,0 +1,78 @@
+"""列表和详情接口的 ETag / Last-Modified：未变化时条件请求返回 304，创建或删除后返回新内容"""
+import os
+
+import pytest
+
+from backend import catalog
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(4096)
+
+def create(client, index):
+    response = client.post(
+        "/api/episodes",
+        data={"title": f"Episode {index}", "description": "cache test"},
+        files={"audio_file": ("episode.mp3", AUDIO, "audio/mpeg"), "image_file": ("cover.png", make_png(index), "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+def test_list_revalidation(client, monkeypatch, cache_enabled):
+    monkeypatch.setattr(catalog, "CATALOG_CACHE_ENABLED", cache_enabled)
+    create(client, 1)
+    first = client.get("/api/episodes")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/api/episodes", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert client.get("/api/episodes", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/api/episodes", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+
+    # 创建和删除都会改变 ETag
+    second = create(client, 2)
+    created = client.get("/api/episodes", headers={"If-None-Match": etag})
+    assert created.status_code == 200
+    assert len(created.json()["items"]) == 2
+    assert created.headers["etag"] != etag
+
+    assert client.delete(f"/api/episodes/{second['id']}").status_code == 200
+    deleted = client.get("/api/episodes", headers={"If-None-Match": created.headers["etag"]})
+    assert deleted.status_code == 200
+    assert len(deleted.json()["items"]) == 1
+    assert deleted.headers["etag"] not in (etag, created.headers["etag"])
+
+def test_if_none_match_takes_precedence_over_if_modified_since(client):
+    create(client, 1)
+    first = client.get("/api/episodes")
+
+    response = client.get("/api/episodes", headers={
+        "If-None-Match": '"stale"',
+        "If-Modified-Since": first.headers["last-modified"],
+    })
+
+    assert response.status_code == 200
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+def test_get_revalidation(client, monkeypatch, cache_enabled):
+    monkeypatch.setattr(catalog, "CATALOG_CACHE_ENABLED", cache_enabled)
+    episode = create(client, 1)
+    url = f"/api/episodes/{episode['id']}"
+    first = client.get(url)
+    etag = first.headers["etag"]
+
+    for headers in ({"If-None-Match": etag}, {"If-None-Match": "*"}, {"If-Modified-Since": first.headers["last-modified"]}):
+        cached = client.get(url, headers=headers)
+        assert cached.status_code == 304, headers
+        assert cached.content == b""
+
+    # 其他播客的变化不影响这一集的 ETag
+    create(client, 2)
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).json() == first.json()
+
+    assert client.delete(url).status_code == 200
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 404
@@ -0,0 +1,79 @@
+"""按 SHA-256 引用已存储的内容创建播客：只增加引用计数，不重新上传"""
+import hashlib
+import os
+
+import pytest
+
+from backend import repository
+from backend.db import db_connection
+from backend.storage import SavedFile
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(4096)
+COVER = make_png(1)
+
+def create(client, **fields):
+    files = {}
+    if "audio" in fields:
+        files["audio_file"] = ("episode.mp3", fields.pop("audio"), "audio/mpeg")
+    if "image" in fields:
+        files["image_file"] = ("cover.png", fields.pop("image"), "image/png")
+    data = {"title": "Episode", "description": "known blob test", **fields}
+    return client.post("/api/episodes", data=data, files=files or None)
+
+def refcounts():
+    with db_connection() as conn:
+        return {row["sha256"]: row["refcount"] for row in conn.execute("SELECT sha256, refcount FROM blobs")}
+
+def test_create_from_known_hashes_reuses_blobs(client):
+    first = create(client, audio=AUDIO, image=COVER)
+    assert first.status_code == 200, first.text
+    audio_sha256 = hashlib.sha256(AUDIO).hexdigest()
+    image_sha256 = hashlib.sha256(COVER).hexdigest()
+    assert client.head(f"/api/blobs/{audio_sha256}").status_code == 200
+
+    second = create(client, audio_sha256=audio_sha256, image_sha256=image_sha256.upper())
+
+    assert second.status_code == 200, second.text
+    first, second = first.json(), second.json()
+    assert second["image_url"] == first["image_url"]
+    with db_connection() as conn:
+        assert len(conn.execute("SELECT DISTINCT audio_path, image_path FROM episodes").fetchall()) == 1
+    assert second["image_variants"] == first["image_variants"]
+    assert refcounts() == {audio_sha256: 2, image_sha256: 2}
+
+    # 删除一个播客后内容仍被另一个引用
+    assert client.delete(f"/api/episodes/{first['id']}").status_code == 200
+    assert refcounts() == {audio_sha256: 1, image_sha256: 1}
+    assert client.get(f"/api/episodes/{second['id']}/audio").content == AUDIO
+
+def test_file_and_hash_can_be_mixed(client):
+    create(client, audio=AUDIO, image=COVER)
+
+    response = create(client, audio_sha256=hashlib.sha256(AUDIO).hexdigest(), image=make_png(2))
+
+    assert response.status_code == 200, response.text
+    assert refcounts()[hashlib.sha256(AUDIO).hexdigest()] == 2
+
+@pytest.mark.parametrize("fields", [
+    {"audio_sha256": "0" * 64, "image": COVER},  # 服务器上没有
+    {"audio_sha256": "not-a-hash", "image": COVER},
+    {"audio_sha256": hashlib.sha256(COVER).hexdigest(), "image": COVER},  # 图片不能当作音频引用
+    {"audio": AUDIO, "audio_sha256": hashlib.sha256(AUDIO).hexdigest(), "image": COVER},  # 只能提供一个
+    {"image": COVER},  # 缺少音频
+])
+def test_invalid_references_are_rejected(client, fields):
+    create(client, audio=AUDIO, image=COVER)
+    before = refcounts()
+
+    assert create(client, **fields).status_code == 400
+    assert refcounts() == before
+
+def test_reference_to_deleted_content_is_not_registered(database):
+    # 查询到内容之后、入库之前内容被删除：不能登记一个没有文件的 blob
+    missing = SavedFile(path=f"audio/00/{'0' * 64}.mp3", size=10, sha256="0" * 64)
+    image = SavedFile(path=f"images/11/{'1' * 64}.png", size=10, sha256="1" * 64)
+
+    with db_connection() as conn, pytest.raises(FileNotFoundError):
+        repository.insert_episode_row(conn, "Episode", "deleted", missing, image, "2026-01-01T00:00:00")
+    assert refcounts() == {}
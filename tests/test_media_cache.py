@@ -0,0 +1,73 @@
+"""读穿缓存：租用中的文件不被淘汰，响应发送结束（包括中断）后释放租用"""
+import asyncio
+import os
+
+import pytest
+
+from backend.storage import MediaCache
+from backend.streaming import FileRangeResponse
+
+FILE_SIZE = 100
+
+def make_cache(directory, max_bytes: int = 150):
+    fetched = []
+
+    def fetch(relative_path, path):
+        fetched.append(relative_path)
+        with open(path, "wb") as f:
+            f.write(os.urandom(FILE_SIZE))
+
+    return MediaCache(str(directory), max_bytes, fetch), fetched
+
+def test_leased_file_survives_eviction(workdir):
+    cache, fetched = make_cache(workdir / "cache")
+
+    async def scenario():
+        a = await cache.lease("audio/a.mp3")
+        b = await cache.lease("audio/b.mp3")
+        # 超过上限，但 a 仍在租用中，b 刚下载
+        assert os.path.exists(a) and os.path.exists(b)
+
+        cache.release("audio/a.mp3")
+        c = await cache.lease("audio/c.mp3")
+        # a 已释放，按最近最少使用淘汰；b 仍在租用中
+        assert not os.path.exists(a)
+        assert os.path.exists(b) and os.path.exists(c)
+
+        cache.release("audio/b.mp3")
+        cache.release("audio/c.mp3")
+        await cache.lease("audio/a.mp3")
+
+    asyncio.run(scenario())
+    assert fetched == ["audio/a.mp3", "audio/b.mp3", "audio/c.mp3", "audio/a.mp3"]
+    assert dict(cache._leases) == {"audio/a.mp3": 1}
+
+def test_concurrent_misses_download_once_and_lease_each(workdir):
+    cache, fetched = make_cache(workdir / "cache", max_bytes=0)
+
+    async def scenario():
+        paths = await asyncio.gather(*(cache.lease("audio/a.mp3") for _ in range(3)))
+        assert len(set(paths)) == 1
+        return paths[0]
+
+    path = asyncio.run(scenario())
+    assert fetched == ["audio/a.mp3"]
+    assert cache._leases["audio/a.mp3"] == 3
+    assert os.path.exists(path)
+
+def test_range_response_calls_on_close_when_client_disconnects(workdir):
+    path = workdir / "audio.bin"
+    path.write_bytes(os.urandom(1024))
+    closed = []
+    response = FileRangeResponse(str(path), 0, 1024, 200, {}, "audio/mpeg", on_close=lambda: closed.append(True))
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            raise OSError("连接已断开")
+
+    with pytest.raises(OSError):
+        asyncio.run(response({"type": "http", "method": "GET", "extensions": {}}, receive, send))
+    assert closed == [True]
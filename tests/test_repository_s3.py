@@ -0,0 +1,127 @@
+"""对象存储下的播客插入和删除：复制和上传不在写事务中，失败和并发删除不丢失、不残留对象"""
+import hashlib
+
+import pytest
+
+from backend import repository
+from backend.db import db_connection
+from backend.storage import S3_STAGING_PREFIX, SavedFile, blob_path
+from bench.fake_s3 import FakeClientError
+
+def staged(client, subfolder: str, data: bytes, extension: str) -> SavedFile:
+    """在假存储桶中放一个暂存对象，返回对应的 SavedFile"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    key = f"{S3_STAGING_PREFIX}{sha256[:16]}{extension}"
+    client.objects[key] = data
+    return SavedFile(blob_path(subfolder, sha256, f"upload{extension}"), len(data), sha256, staged_key=key)
+
+def new_episode(client, audio: bytes, image: bytes = b"cover") -> repository.NewEpisode:
+    return repository.NewEpisode(
+        "title", "description",
+        staged(client, "audio", audio, ".mp3"), staged(client, "images", image, ".png"),
+        "2026-01-01T00:00:00"
+    )
+
+def insert(conn, episode: repository.NewEpisode):
+    return repository.insert_episode_row(conn, *episode)
+
+def stored_keys(client):
+    return sorted(key for key in client.objects if not key.startswith(S3_STAGING_PREFIX))
+
+@pytest.fixture
+def conn(database):
+    with db_connection() as conn:
+        yield conn
+
+def test_no_bucket_requests_inside_write_transaction(fake_s3, conn):
+    in_transaction = []
+    enter = fake_s3._enter
+    fake_s3._enter = lambda method: (in_transaction.append(conn.in_transaction), enter(method))[1]
+
+    episode = new_episode(fake_s3, b"audio")
+    row = insert(conn, episode)
+
+    assert in_transaction and not any(in_transaction)
+    assert stored_keys(fake_s3) == sorted([row["audio_path"], row["image_path"]])
+    assert not any(key.startswith(S3_STAGING_PREFIX) for key in fake_s3.objects)
+
+def test_same_content_is_stored_once(fake_s3, conn):
+    first = insert(conn, new_episode(fake_s3, b"audio"))
+    copies = fake_s3.calls["copy_object"]
+
+    second = insert(conn, new_episode(fake_s3, b"audio"))
+
+    assert second["audio_path"] == first["audio_path"]
+    assert fake_s3.calls["copy_object"] == copies
+    assert conn.execute("SELECT refcount FROM blobs WHERE path = ?", (first["audio_path"],)).fetchone()[0] == 2
+
+def test_object_deleted_before_commit_is_restored(fake_s3, conn, monkeypatch):
+    episode = new_episode(fake_s3, b"audio")
+    insert_in_transaction = repository._insert_in_transaction
+
+    def delete_then_insert(*args):
+        # 模拟另一个 worker 在复制完成之后、提交之前删除了同一内容的对象
+        fake_s3.objects.pop(episode.audio.path)
+        return insert_in_transaction(*args)
+
+    monkeypatch.setattr(repository, "_insert_in_transaction", delete_then_insert)
+    row = insert(conn, episode)
+
+    assert fake_s3.objects[row["audio_path"]] == b"audio"
+
+def test_failed_insert_removes_copied_objects(fake_s3, conn, monkeypatch):
+    kept = insert(conn, new_episode(fake_s3, b"kept"))
+
+    def fail(*args):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(repository, "_insert_in_transaction", fail)
+    with pytest.raises(RuntimeError):
+        insert(conn, new_episode(fake_s3, b"discarded"))
+
+    # 新复制的音频被删除；封面与已有播客相同，仍被引用，保留
+    assert stored_keys(fake_s3) == sorted([kept["audio_path"], kept["image_path"]])
+    assert not any(key.startswith(S3_STAGING_PREFIX) for key in fake_s3.objects)
+
+def test_failed_copy_removes_partial_objects(fake_s3, conn):
+    episode = new_episode(fake_s3, b"audio", b"image")
+    del fake_s3.objects[episode.image.staged_key]  # 音频复制成功，图片的复制失败
+
+    with pytest.raises(FakeClientError):
+        insert(conn, episode)
+
+    assert stored_keys(fake_s3) == []
+    assert not any(key.startswith(S3_STAGING_PREFIX) for key in fake_s3.objects)
+    assert conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 0
+
+def test_batch_insert_cleans_up_failed_items(fake_s3, conn):
+    good = new_episode(fake_s3, b"good", b"good-cover")
+    bad = new_episode(fake_s3, b"bad", b"bad-cover")
+    del fake_s3.objects[bad.audio.staged_key]
+
+    results = repository.insert_episode_rows(conn, [good, bad])
+
+    assert isinstance(results[0], dict)
+    assert isinstance(results[1], Exception)
+    assert stored_keys(fake_s3) == sorted([results[0]["audio_path"], results[0]["image_path"]])
+    assert not any(key.startswith(S3_STAGING_PREFIX) for key in fake_s3.objects)
+
+def test_delete_keeps_objects_registered_again(fake_s3, conn):
+    row = insert(conn, new_episode(fake_s3, b"audio"))
+    files = repository.delete_episode_row(conn, row["id"])
+    assert sorted(files) == sorted([row["audio_path"], row["image_path"]])
+
+    # 删除提交之后、对象删除之前，相同内容又被上传
+    again = insert(conn, new_episode(fake_s3, b"audio"))
+    repository._remove_files(files)
+
+    assert stored_keys(fake_s3) == sorted([again["audio_path"], again["image_path"]])
+
+def test_delete_removes_unreferenced_objects(fake_s3, conn):
+    row = insert(conn, new_episode(fake_s3, b"audio"))
+    fake_s3.objects[row["audio_path"] + ".gz"] = b"variant"
+
+    repository._remove_files(repository.delete_episode_row(conn, row["id"]))
+
+    assert fake_s3.objects == {}
+    assert fake_s3.calls["delete_objects"] == 1
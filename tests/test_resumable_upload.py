@@ -0,0 +1,93 @@
+"""断点续传：上传位置不一致返回 409，重复 finalize 和过期的会话返回 404"""
+import os
+import time
+
+from backend import storage
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(10_000 - 3)
+
+def start(client, size=len(AUDIO)):
+    response = client.post("/api/uploads", json={"filename": "episode.mp3", "size": size})
+    assert response.status_code == 201, response.text
+    return response.headers["location"]
+
+def patch(client, location, offset, data):
+    return client.patch(location, content=data, headers={"Upload-Offset": str(offset)})
+
+def finalize(client, location):
+    return client.post(
+        f"{location}/finalize",
+        data={"title": "Episode", "description": "resumable"},
+        files={"image_file": ("cover.png", make_png(1), "image/png")},
+    )
+
+def test_upload_in_chunks_and_finalize(client):
+    location = start(client)
+
+    assert patch(client, location, 0, AUDIO[:4000]).headers["upload-offset"] == "4000"
+    assert client.head(location).headers["upload-offset"] == "4000"
+    assert patch(client, location, 4000, AUDIO[4000:]).headers["upload-offset"] == str(len(AUDIO))
+
+    response = finalize(client, location)
+    assert response.status_code == 200, response.text
+    assert client.get(response.json()["audio_url"]).content == AUDIO
+
+def test_offset_mismatch_returns_current_offset(client):
+    location = start(client)
+    patch(client, location, 0, AUDIO[:4000])
+
+    # 重发已经收到的部分，或者跳过一段
+    for offset in (0, 5000):
+        response = patch(client, location, offset, AUDIO[offset:offset + 1000])
+        assert response.status_code == 409
+        assert response.headers["upload-offset"] == "4000"
+
+    # 数据没有被写入，从正确的位置继续即可
+    assert patch(client, location, 4000, AUDIO[4000:]).status_code == 200
+    assert finalize(client, location).status_code == 200
+
+def test_data_beyond_declared_size_is_rejected(client):
+    location = start(client, size=100)
+
+    assert patch(client, location, 0, AUDIO[:200]).status_code == 413
+    assert client.head(location).headers["upload-offset"] == "0"
+
+def test_finalize_before_upload_is_complete(client):
+    location = start(client)
+    patch(client, location, 0, AUDIO[:4000])
+
+    response = finalize(client, location)
+
+    assert response.status_code == 409
+    assert client.head(location).status_code == 200
+
+def test_duplicate_finalize_creates_one_episode(client):
+    location = start(client)
+    patch(client, location, 0, AUDIO)
+
+    assert finalize(client, location).status_code == 200
+    assert finalize(client, location).status_code == 404
+    assert client.head(location).status_code == 404
+    assert len(client.get("/api/episodes").json()["items"]) == 1
+
+def test_expired_session_is_gone(client):
+    location = start(client)
+    patch(client, location, 0, AUDIO[:4000])
+    upload_id = location.rsplit("/", 1)[1]
+    expired = time.time() - storage.UPLOAD_EXPIRY_SECONDS - 60
+    os.utime(os.path.join(storage.UPLOADS_DIR, f"{upload_id}.part"), (expired, expired))
+
+    # 清理之前也不能再使用
+    assert client.head(location).status_code == 404
+    assert patch(client, location, 4000, AUDIO[4000:]).status_code == 404
+    assert finalize(client, location).status_code == 404
+
+    # 创建新会话时顺便删除过期会话的数据
+    start(client)
+    assert not os.path.exists(os.path.join(storage.UPLOADS_DIR, f"{upload_id}.part"))
+
+def test_unknown_or_malformed_session_id(client):
+    for upload_id in ("0" * 32, "../../etc/passwd", "not-an-id"):
+        assert client.get(f"/api/uploads/{upload_id}").status_code == 404
+        assert patch(client, f"/api/uploads/{upload_id}", 0, b"data").status_code == 404
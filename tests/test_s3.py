@@ -0,0 +1,174 @@
+"""S3Store：分片并行上传、重试退避、失败中止和按范围读取"""
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+from backend import s3
+from bench.fake_s3 import FakeClientError, FakeS3Client
+
+PART_SIZE = 64 * 1024
+
+def make_store(client: FakeS3Client, **kwargs) -> s3.S3Store:
+    return s3.S3Store("test-bucket", client=client, part_size=PART_SIZE, **kwargs)
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """记录重试前的等待时间而不真正等待（抖动取上限）"""
+    delays = []
+    monkeypatch.setattr(s3.time, "sleep", delays.append)
+    monkeypatch.setattr(s3.random, "uniform", lambda low, high: high)
+    return delays
+
+def test_small_upload_uses_single_put():
+    client = FakeS3Client()
+    store = make_store(client)
+    data = b"x" * 1000
+
+    size, sha256 = store.upload_fileobj(io.BytesIO(data), "small.bin")
+
+    assert (size, sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert client.objects["small.bin"] == data
+    assert client.calls["put_object"] == 1
+    assert client.calls["create_multipart_upload"] == 0
+
+def test_multipart_upload_sends_parts_in_parallel():
+    client = FakeS3Client(latency=0.02)
+    store = make_store(client, max_concurrency=4)
+    data = os.urandom(PART_SIZE * 10 + 123)
+
+    size, sha256 = store.upload_fileobj(io.BytesIO(data), "large.bin")
+
+    assert (size, sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert client.objects["large.bin"] == data
+    assert client.calls["upload_part"] == 11
+    assert 1 < client.max_parts_in_flight <= 4
+    assert not client.uploads
+    store.close()
+
+def test_retries_with_exponential_backoff(no_sleep, monkeypatch):
+    monkeypatch.setattr(s3, "S3_RETRY_BASE_DELAY", 0.1)
+    client = FakeS3Client()
+    client.fail("upload_part", times=3)
+    store = make_store(client, max_concurrency=1)
+    data = os.urandom(PART_SIZE * 2)
+
+    store.upload_fileobj(io.BytesIO(data), "retried.bin")
+
+    assert client.objects["retried.bin"] == data
+    assert no_sleep == pytest.approx([0.1, 0.2, 0.4])
+    store.close()
+
+def test_backoff_is_capped(no_sleep, monkeypatch):
+    monkeypatch.setattr(s3, "S3_RETRY_BASE_DELAY", 4.0)
+    client = FakeS3Client()
+    client.fail("put_object", times=3)
+    store = make_store(client)
+
+    store.upload_fileobj(io.BytesIO(b"data"), "capped.bin")
+
+    assert no_sleep == pytest.approx([4.0, 8.0, s3.S3_RETRY_MAX_DELAY])
+
+def test_gives_up_after_max_attempts(no_sleep):
+    client = FakeS3Client()
+    client.fail("put_object", times=3)
+    store = make_store(client, max_attempts=3)
+
+    with pytest.raises(ConnectionError):
+        store.upload_fileobj(io.BytesIO(b"data"), "failed.bin")
+
+    assert client.calls["put_object"] == 3
+    assert "failed.bin" not in client.objects
+
+def test_non_retryable_error_is_raised_immediately(no_sleep):
+    client = FakeS3Client()
+    client.fail("copy_object", exc=lambda message: FakeClientError("AccessDenied", message))
+    store = make_store(client)
+
+    with pytest.raises(FakeClientError):
+        store.copy("src", "dst")
+
+    assert client.calls["copy_object"] == 1
+    assert no_sleep == []
+
+def test_failed_part_aborts_multipart_upload(no_sleep):
+    client = FakeS3Client()
+    client.fail("upload_part", times=10)
+    store = make_store(client, max_attempts=2)
+
+    with pytest.raises(ConnectionError):
+        store.upload_fileobj(io.BytesIO(os.urandom(PART_SIZE * 4)), "aborted.bin")
+
+    assert len(client.aborted) == 1
+    assert not client.uploads
+    assert "aborted.bin" not in client.objects
+    store.close()
+
+def test_failed_complete_aborts_multipart_upload(no_sleep):
+    client = FakeS3Client()
+    client.fail("complete_multipart_upload", times=1, exc=lambda message: FakeClientError("InvalidPart", message))
+    store = make_store(client)
+
+    with pytest.raises(FakeClientError):
+        store.upload_fileobj(io.BytesIO(os.urandom(PART_SIZE * 2)), "aborted.bin")
+
+    assert len(client.aborted) == 1
+    assert not client.uploads
+    store.close()
+
+def test_cancelled_upload_is_aborted():
+    client = FakeS3Client()
+    store = make_store(client)
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(s3.UploadCancelled):
+        store.upload_fileobj(io.BytesIO(os.urandom(PART_SIZE * 3)), "cancelled.bin", cancel=cancel)
+
+    assert client.calls["upload_part"] == 0
+    assert len(client.aborted) == 1
+    assert "cancelled.bin" not in client.objects
+    store.close()
+
+def test_read_range_is_inclusive():
+    client = FakeS3Client()
+    client.objects["range.bin"] = bytes(range(256))
+    store = make_store(client)
+
+    assert store.read_range("range.bin", 10, 19) == bytes(range(10, 20))
+
+def test_open_reader_reads_only_requested_ranges():
+    client = FakeS3Client()
+    data = os.urandom(1024 * 1024)
+    client.objects["audio.wav"] = data
+    store = make_store(client)
+
+    with store.open_reader("audio.wav") as reader:
+        assert reader.read(44) == data[:44]
+        reader.seek(-100, os.SEEK_END)
+        assert reader.read() == data[-100:]
+        reader.seek(500_000)
+        assert reader.read(10) == data[500_000:500_010]
+
+    # 每次未命中缓冲区只读取一个 READ_BUFFER_SIZE 的范围，不下载整个对象
+    assert client.calls["get_object"] == 3
+
+def test_open_reader_missing_object():
+    store = make_store(FakeS3Client())
+
+    with pytest.raises(FileNotFoundError):
+        store.open_reader("missing.bin")
+
+def test_delete_many_batches_requests():
+    client = FakeS3Client()
+    keys = [f"k/{i}" for i in range(s3.DELETE_BATCH_SIZE + 5)]
+    client.objects.update((key, b"") for key in keys)
+    client.objects["keep"] = b""
+    store = make_store(client)
+
+    store.delete_many(keys)
+
+    assert client.calls["delete_objects"] == 2
+    assert list(client.objects) == ["keep"]
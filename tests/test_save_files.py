@@ -0,0 +1,65 @@
+"""并发保存多个上传：任一失败或调用方被取消时，删除已经保存好的和写到一半的暂存文件"""
+import asyncio
+import io
+import os
+import threading
+
+import pytest
+from fastapi import UploadFile
+
+from backend import storage
+from backend.storage import FileTooLarge, save_files
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(4096)
+
+def staged_files():
+    return os.listdir(storage.STAGING_DIR) if os.path.isdir(storage.STAGING_DIR) else []
+
+class StalledFile(io.BytesIO):
+    """读完数据后阻塞，直到 release 被设置，模拟一直没传完的上传"""
+
+    def __init__(self, data, release):
+        super().__init__(data)
+        self.release = release
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        if not chunk:
+            self.release.wait(5)
+        return chunk
+
+def test_cancelled_save_removes_staged_files(workdir):
+    async def scenario():
+        release = threading.Event()
+        uploads = [
+            (UploadFile(io.BytesIO(AUDIO), filename="episode.mp3"), "audio"),
+            (UploadFile(StalledFile(make_png(1), release), filename="cover.png"), "images"),
+        ]
+        task = asyncio.ensure_future(save_files(uploads))
+        # 等音频保存完、封面写到一半
+        while {os.path.splitext(name)[1] for name in staged_files()} != {".upload", ".part"}:
+            await asyncio.sleep(0.01)
+
+        task.cancel()
+        try:
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        finally:
+            release.set()
+
+    asyncio.run(scenario())
+
+    assert staged_files() == []
+
+def test_failed_save_removes_the_other_staged_files(workdir, monkeypatch):
+    monkeypatch.setitem(storage.MAX_FILE_BYTES, "images", 10)
+    uploads = [
+        (UploadFile(io.BytesIO(AUDIO), filename="episode.mp3"), "audio"),
+        (UploadFile(io.BytesIO(make_png(1)), filename="cover.png"), "images"),
+    ]
+
+    with pytest.raises(FileTooLarge):
+        asyncio.run(save_files(uploads))
+
+    assert staged_files() == []
@@ -0,0 +1,141 @@
+"""全文搜索（FTS5 trigram）和游标分页：短词、特殊字符，以及被篡改的游标返回 400"""
+import base64
+import json
+
+import pytest
+
+from backend import catalog, repository
+from backend.db import db_connection
+
+TITLES = [
+    ("Robots in Paris", "A chat about robotics startups"),
+    ("Cooking with friends", "Robot vacuum cleaners and kitchen gadgets"),
+    ("Garden talk", "Tomatoes, compost and rain barrels"),
+    ('Quotes "and" stars*', "Punctuation in titles"),
+]
+
+def cursor_of(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+def insert(count_or_titles):
+    """直接插入播客记录（文件不参与搜索和分页）"""
+    items = count_or_titles if isinstance(count_or_titles, list) else [
+        (f"Robot episode {i}", f"robot description {i}") for i in range(count_or_titles)
+    ]
+    with db_connection() as conn:
+        for i, (title, description) in enumerate(items):
+            conn.execute(
+                "INSERT INTO episodes (title, description, audio_path, image_path, created_at, image_variants)"
+                " VALUES (?, ?, ?, ?, ?, '[]')",
+                (title, description, f"audio/{i}.mp3", f"images/{i}.png", f"2026-01-01T00:00:00.{i:06d}"),
+            )
+        conn.commit()
+
+def search(client, q, **params):
+    return client.get("/api/episodes/search", params={"q": q, **params})
+
+def titles(response):
+    assert response.status_code == 200, response.text
+    return [item["title"] for item in response.json()["items"]]
+
+def test_trigram_search_matches_substrings_in_title_and_description(client):
+    insert(TITLES)
+
+    # 标题匹配权重更高，排在只有描述匹配的结果之前
+    assert titles(search(client, "robot")) == ["Robots in Paris", "Cooking with friends"]
+    assert titles(search(client, "obo")) == ["Robots in Paris", "Cooking with friends"]
+    assert titles(search(client, "robot paris")) == ["Robots in Paris"]
+    assert titles(search(client, "ROBOT")) == ["Robots in Paris", "Cooking with friends"]
+
+    hit = search(client, "paris").json()["items"][0]
+    assert hit["title_highlight"] == "Robots in <mark>Paris</mark>"
+
+@pytest.mark.parametrize("q", ["ro", "robot ab", "  a  "])
+def test_terms_shorter_than_three_characters_are_rejected(client, q):
+    insert(TITLES)
+
+    assert search(client, q).status_code == 400
+
+@pytest.mark.parametrize("q, expected", [
+    ('"and"', ['Quotes "and" stars*']),  # 引号作为普通字符匹配
+    ("stars*", ['Quotes "and" stars*']),  # * 不是前缀运算符
+    ("rob*", []),
+    ('rob"ots', []),
+    ("AND NOT", []),  # FTS5 运算符按普通词处理
+    ("robot NEAR(paris)", []),
+])
+def test_special_characters_are_matched_literally(client, q, expected):
+    insert(TITLES)
+
+    assert titles(search(client, q)) == expected
+
+def test_search_pagination_visits_every_hit_once(client):
+    insert(25)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+        page = search(client, "robot", **params).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(1, 26))
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+def test_list_pagination_visits_every_episode_once(client, monkeypatch, cache_enabled):
+    monkeypatch.setattr(catalog, "CATALOG_CACHE_ENABLED", cache_enabled)
+    insert(25)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 10, "include_total": "true", **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/episodes", params=params).json()
+        assert page["total"] == 25
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    # 最新的在前
+    assert seen == list(range(25, 0, -1))
+
+TAMPERED_CURSORS = [
+    "!!!not-base64!!!",
+    "é",
+    cursor_of({"created_at": "x", "id": 1}),
+    cursor_of([1]),
+    cursor_of(["2026-01-01", 1, 2]),
+    cursor_of([0.5, True]),
+    cursor_of(["2026-01-01", True]),
+    cursor_of([0.5, 2 ** 70]),  # 超出 SQLite 整数范围
+    cursor_of([10 ** 400, 1]),  # 无法转换为浮点数
+    cursor_of(["2026-01-01", 2 ** 70]),
+    base64.urlsafe_b64encode(b"[1e999, 1]").decode(),  # 无穷大
+    base64.urlsafe_b64encode(b"[NaN, 1]").decode(),
+]
+
+@pytest.mark.parametrize("cursor", TAMPERED_CURSORS)
+def test_tampered_search_cursor_is_rejected(client, cursor):
+    insert(TITLES)
+
+    response = search(client, "robot", cursor=cursor)
+
+    assert response.status_code == 400, response.text
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+@pytest.mark.parametrize("cursor", TAMPERED_CURSORS)
+def test_tampered_list_cursor_is_rejected(client, monkeypatch, cache_enabled, cursor):
+    monkeypatch.setattr(catalog, "CATALOG_CACHE_ENABLED", cache_enabled)
+    insert(TITLES)
+
+    response = client.get("/api/episodes", params={"cursor": cursor})
+
+    assert response.status_code == 400, response.text
+
+def test_cursor_round_trip():
+    cursor = repository.encode_cursor("2026-01-01T00:00:00", 42)
+
+    assert repository.decode_episode_cursor(cursor) == ("2026-01-01T00:00:00", 42)
+    assert repository.decode_search_cursor(repository.encode_cursor(-1.5, 7)) == (-1.5, 7)
@@ -0,0 +1,153 @@
+"""媒体流式响应：Range 解析、If-Range 条件、按字节范围发送文件，以及音频接口的 206 / 416"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from backend import streaming
+from backend.streaming import FileRangeResponse, RangeNotSatisfiable, if_range_matches, parse_range
+from bench.seed import make_png
+
+LAST_MODIFIED = "Sun, 15 Nov 2026 12:00:00 GMT"
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),  # 开放结尾
+    ("bytes=-100", (900, 999)),  # 后缀范围
+    ("bytes=-5000", (0, 999)),  # 后缀超过文件大小时返回整个文件
+    ("bytes=900-5000", (900, 999)),  # 结尾越界时截断
+    ("BYTES = 0-0", (0, 0)),
+    ("items=0-99", None),  # 不支持的单位，忽略 Range
+    ("bytes=abc-def", None),
+    ("bytes=50-10", None),  # 起始大于结尾，语法无效
+    ("bytes=0", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=0-99,200-299", 1000),  # 多段
+    ("bytes=1000-", 1000),  # 起始越界
+    ("bytes=-0", 1000),
+    ("bytes=-10", 0),  # 空文件没有可满足的后缀
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+@pytest.mark.parametrize("header, expected", [
+    (None, True),
+    ('"abc"', True),
+    ('"xyz"', False),  # ETag 不一致：忽略 Range
+    ('W/"abc"', False),  # 强比较，弱 ETag 不匹配
+    (LAST_MODIFIED, True),
+    ("Sun, 15 Nov 2026 11:59:59 GMT", False),
+    ("not a date", False),
+])
+def test_if_range_matches(header, expected):
+    assert if_range_matches(header, '"abc"', LAST_MODIFIED) is expected
+
+def test_if_range_date_without_last_modified():
+    assert not if_range_matches(LAST_MODIFIED, '"abc"', None)
+
+def send_file(path, start, length, method="GET", zerocopy=False):
+    messages = []
+    scope = {"type": "http", "method": method, "extensions": {"http.response.zerocopy": {}} if zerocopy else {}}
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopy":
+            f = message["file"]
+            f.seek(message["offset"])
+            message = {**message, "data": f.read(message["count"])}
+        messages.append(message)
+
+    asyncio.run(FileRangeResponse(str(path), start, length, 206, {}, "audio/mpeg")(scope, receive, send))
+    return messages
+
+@pytest.fixture
+def media(workdir):
+    path = workdir / "audio.bin"
+    path.write_bytes(os.urandom(1000))
+    return path
+
+def test_range_response_reads_in_chunks(media, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_SIZE", 64)
+
+    start, *bodies = send_file(media, 100, 300)
+
+    assert start["status"] == 206
+    assert dict(start["headers"])[b"content-length"] == b"300"
+    assert all(len(body["body"]) <= 64 for body in bodies)
+    assert b"".join(body["body"] for body in bodies) == media.read_bytes()[100:400]
+    assert [body["more_body"] for body in bodies][-1] is False
+
+def test_range_response_uses_zerocopy_when_available(media):
+    start, message = send_file(media, 900, 100, zerocopy=True)
+
+    assert message["type"] == "http.response.zerocopy"
+    assert message["data"] == media.read_bytes()[900:]
+
+def test_range_response_to_head_has_no_body(media):
+    start, message = send_file(media, 0, 1000, method="HEAD")
+
+    assert dict(start["headers"])[b"content-length"] == b"1000"
+    assert message == {"type": "http.response.body", "body": b"", "more_body": False}
+
+def test_range_response_ends_early_when_file_is_truncated(media):
+    # 文件在发送过程中变短：结束响应而不是一直等待
+    *_, last = send_file(media, 500, 1000)
+
+    assert last["more_body"] is False
+
+AUDIO = b"ID3" + os.urandom(10_000 - 3)
+
+@pytest.fixture
+def audio_episode(client):
+    response = client.post(
+        "/api/episodes",
+        data={"title": "Episode", "description": "range test"},
+        files={"audio_file": ("episode.mp3", AUDIO, "audio/mpeg"), "image_file": ("cover.png", make_png(1), "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["audio_url"]
+
+def test_audio_range_requests(client, audio_episode):
+    etag = f'"{hashlib.sha256(AUDIO).hexdigest()}"'
+
+    full = client.get(audio_episode)
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["etag"] == etag
+    assert full.content == AUDIO
+
+    suffix = client.get(audio_episode, headers={"Range": "bytes=-100"})
+    assert suffix.status_code == 206
+    assert suffix.headers["content-range"] == "bytes 9900-9999/10000"
+    assert suffix.content == AUDIO[-100:]
+
+    open_ended = client.get(audio_episode, headers={"Range": "bytes=9000-"})
+    assert open_ended.status_code == 206
+    assert open_ended.content == AUDIO[9000:]
+
+    matching = client.get(audio_episode, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert matching.status_code == 206
+    assert matching.content == AUDIO[:10]
+
+def test_audio_range_not_satisfiable(client, audio_episode):
+    for header in ("bytes=0-9,20-29", "bytes=10000-"):
+        response = client.get(audio_episode, headers={"Range": header})
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */10000"
+
+def test_audio_if_range_with_mismatched_etag_returns_full_content(client, audio_episode):
+    response = client.get(audio_episode, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert "content-range" not in response.headers
+    assert response.content == AUDIO
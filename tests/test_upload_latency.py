@@ -0,0 +1,69 @@
+"""上传大文件时其他请求的延迟：数据库和文件操作在 I/O 线程池中执行，GET 不被上传阻塞"""
+import asyncio
+import io
+import os
+import statistics
+import time
+
+import httpx
+
+from bench.seed import make_png
+
+UPLOAD_MB = 32
+EPISODES = 20
+BASELINE_REQUESTS = 30
+
+def mp3(size: int) -> bytes:
+    """以 ID3 标签开头的随机数据（识别为 audio/mpeg，不生成预压缩变体）"""
+    return b"ID3" + os.urandom(size - 3)
+
+def episode_form(index: int, audio: bytes):
+    # 文件对象按块发送请求体（与真实上传一样逐块到达），bytes 会被一次性交给应用
+    data = {"title": f"Episode {index}", "description": "latency test"}
+    files = {
+        "audio_file": (f"episode{index}.mp3", io.BytesIO(audio), "audio/mpeg"),
+        "image_file": (f"cover{index}.png", io.BytesIO(make_png(index)), "image/png"),
+    }
+    return data, files
+
+async def list_latency(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    response = await client.get("/api/episodes", params={"limit": 20})
+    assert response.status_code == 200
+    return time.perf_counter() - start
+
+async def measure(app) -> tuple:
+    """返回 (空闲时的 GET 延迟, 上传期间的 GET 延迟)"""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            for i in range(EPISODES):
+                data, files = episode_form(i, mp3(4096))
+                assert (await client.post("/api/episodes", data=data, files=files)).status_code == 200
+
+            baseline = [await list_latency(client) for _ in range(BASELINE_REQUESTS)]
+
+            data, files = episode_form(EPISODES, mp3(UPLOAD_MB * 1024 * 1024))
+            upload = asyncio.create_task(client.post("/api/episodes", data=data, files=files))
+            loaded = []
+            while not upload.done():
+                loaded.append(await list_latency(client))
+            response = await upload
+            assert response.status_code == 200, response.text
+    return baseline, loaded
+
+def test_list_latency_stays_flat_during_large_upload(workdir):
+    # main 在导入时按 ./storage 是否存在决定是否挂载静态目录
+    os.makedirs("storage")
+    from backend.main import app
+
+    baseline, loaded = asyncio.run(measure(app))
+
+    baseline_median = statistics.median(baseline)
+    loaded_median = statistics.median(loaded)
+    # 上传期间 GET 持续得到响应，而不是排在上传之后
+    assert len(loaded) >= 10, f"上传期间只完成了 {len(loaded)} 个 GET"
+    # 请求体解析仍在事件循环中逐块进行，允许一定的抖动，但不能随上传大小增长
+    assert loaded_median <= max(3 * baseline_median, baseline_median + 0.02), (
+        f"上传期间 GET 中位延迟 {loaded_median * 1000:.1f}ms，空闲时 {baseline_median * 1000:.1f}ms"
+    )
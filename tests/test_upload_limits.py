@@ -0,0 +1,128 @@
+"""上传的大小和类型校验：请求体上限（413）、写入时的单文件上限，以及按文件头识别类型"""
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from backend.storage import FileTooLarge, stream_to_disk
+from backend.validation import EPISODE_UPLOAD_MAX_BYTES, RequestSizeLimitMiddleware
+from bench.seed import make_png
+
+AUDIO = b"ID3" + os.urandom(4096)
+
+def call(app, headers, chunks, path="/upload"):
+    """以给定请求头和请求体分块调用 POST 请求，返回 (发出的消息, 读取的分块数)"""
+    sent = []
+    received = []
+    bodies = list(chunks)
+
+    async def receive():
+        if not bodies:
+            return {"type": "http.disconnect"}
+        body = bodies.pop(0)
+        received.append(body)
+        return {"type": "http.request", "body": body, "more_body": bool(bodies)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    asyncio.run(app(scope, receive, send))
+    return sent, len(received)
+
+async def reading_app(scope, receive, send):
+    """读完整个请求体后返回 200"""
+    while (await receive()).get("more_body"):
+        pass
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def test_declared_content_length_over_limit_is_rejected_without_reading():
+    middleware = RequestSizeLimitMiddleware(reading_app, limits={"/upload": 100})
+
+    sent, reads = call(middleware, [(b"content-length", b"101")], [b"x" * 101])
+
+    assert sent[0]["status"] == 413
+    assert reads == 0
+
+def test_chunked_body_is_cut_off_once_it_crosses_the_limit():
+    middleware = RequestSizeLimitMiddleware(reading_app, limits={"/upload": 100})
+
+    sent, reads = call(middleware, [], [b"x" * 60] * 10)
+
+    assert sent[0]["status"] == 413
+    assert reads == 2  # 第二块越过上限后不再接收
+
+def test_body_within_limit_passes_through():
+    middleware = RequestSizeLimitMiddleware(reading_app, limits={"/upload": 100})
+
+    sent, _ = call(middleware, [(b"content-length", b"100")], [b"x" * 50, b"x" * 50])
+
+    assert sent[0]["status"] == 200
+
+def test_invalid_content_length_is_rejected():
+    middleware = RequestSizeLimitMiddleware(reading_app, limits={"/upload": 100})
+
+    sent, _ = call(middleware, [(b"content-length", b"lots")], [b""])
+
+    assert sent[0]["status"] == 400
+
+def test_episode_upload_limit_is_applied_by_the_app(workdir):
+    os.makedirs("storage", exist_ok=True)
+    from backend.main import app
+
+    headers = [
+        (b"content-length", str(EPISODE_UPLOAD_MAX_BYTES + 1).encode()),
+        (b"content-type", b"multipart/form-data; boundary=x"),
+    ]
+    sent, reads = call(app, headers, [b"x"], path="/api/episodes")
+
+    assert sent[0]["status"] == 413
+    assert reads == 0
+
+@pytest.mark.parametrize("audio, image, error", [
+    (("episode.mp3", make_png(1), "audio/mpeg"), ("cover.png", make_png(2), "image/png"), "音频文件无效"),
+    (("episode.mp3", b"not audio at all" * 10, "audio/mpeg"), ("cover.png", make_png(2), "image/png"), "音频文件无效"),
+    (("episode.mp3", AUDIO, "audio/mpeg"), ("cover.png", AUDIO, "image/png"), "图片文件无效"),
+    (("episode.mp3", b"", "audio/mpeg"), ("cover.png", make_png(2), "image/png"), "音频文件无效"),
+])
+def test_mislabelled_files_are_rejected(client, audio, image, error):
+    response = client.post(
+        "/api/episodes",
+        data={"title": "Episode", "description": "type test"},
+        files={"audio_file": audio, "image_file": image},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(error)
+    assert client.get("/api/episodes").json()["items"] == []
+
+def test_correctly_sniffed_file_is_accepted_regardless_of_declared_type(client):
+    # 类型按文件头识别，客户端声明的 Content-Type 不影响结果
+    response = client.post(
+        "/api/episodes",
+        data={"title": "Episode", "description": "type test"},
+        files={"audio_file": ("episode.bin", AUDIO, "application/octet-stream"), "image_file": ("cover", make_png(1), "text/plain")},
+    )
+
+    assert response.status_code == 200, response.text
+
+def test_stream_to_disk_stops_at_the_size_cap(workdir):
+    dest = workdir / "dest.bin"
+    upload = UploadFile(io.BytesIO(b"x" * 1000), filename="big.mp3")
+
+    with pytest.raises(FileTooLarge):
+        asyncio.run(stream_to_disk(upload, str(dest), chunk_size=64, max_bytes=100))
+
+    assert os.listdir(workdir) == []
+
+def test_stream_to_disk_accepts_file_at_the_cap(workdir):
+    dest = workdir / "dest.bin"
+    upload = UploadFile(io.BytesIO(b"x" * 100), filename="exact.mp3")
+
+    size, _ = asyncio.run(stream_to_disk(upload, str(dest), chunk_size=64, max_bytes=100))
+
+    assert size == 100
+    assert dest.read_bytes() == b"x" * 100